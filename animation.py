@@ -0,0 +1,41 @@
+import pygame
+
+# --- ANIMATION CLIPS ---
+class AnimationClip:
+    """
+    The frames of one named animation, plus mirrored copies made once when the
+    clip is built, so drawing either facing is a lookup with no per-frame flip.
+    Each frame shows for `frame_ticks` game ticks.
+    """
+    def __init__(self, frames, frame_ticks=10):
+        self.frames = tuple(frames)
+        self.mirrored = tuple(pygame.transform.flip(frame, True, False) for frame in self.frames)
+        self.frame_ticks = frame_ticks
+    def frame(self, ticks, mirrored=False):
+        frames = self.mirrored if mirrored else self.frames
+        return frames[(ticks // self.frame_ticks) % len(frames)]
+
+class AnimationSet:
+    """
+    Named clips for one sprite set (a character, an enemy type), shared by
+    every entity drawn from it. Entities keep only a clip name and a tick
+    count within the clip and ask the set for the surface to draw.
+    """
+    def __init__(self, clips):
+        self.clips = clips
+    def frame(self, clip, ticks, mirrored=False):
+        return self.clips[clip].frame(ticks, mirrored)
+
+# --- CACHE ---
+_animation_sets = {}
+
+def get_animation_set(key, build):
+    # One AnimationSet per key, built by build() on first use
+    animations = _animation_sets.get(key)
+    if animations is None:
+        animations = _animation_sets[key] = build()
+    return animations
+
+def clear_animation_sets():
+    # Frames are tied to the render resolution; called when the sprite cache is rebuilt
+    _animation_sets.clear()
@@ -0,0 +1,294 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+# --- CONFIG ---
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets_manifest.json')
+LOADER_WORKERS = min(8, os.cpu_count() or 1)
+BAKE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'sprites')
+BAKE_VERSION = 3          # Bumped when baked pixels change; older bakes are ignored
+
+# --- MANIFEST ---
+# Every asset the game loads: sprites as [path, [w, h], fallback colour] at their
+# logical size (load_sprite scales them to the render resolution), sounds by
+# SOUND_MAP name, and spritesheets by path.
+def load_manifest(path=MANIFEST_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+def build_manifest(path=MANIFEST_PATH):
+    """
+    Regenerate the manifest by recording every load_sprite call while the game
+    builds each character, level object and tile set, and replays the shipped
+    level traces (which covers the HUD buttons and generated levels too).
+    """
+    from game_sim import load_headless_game
+    from replay import TRACE_DIR, ReplayInput
+    game = load_headless_game()
+    recorded = {}
+    load_sprite = game.load_sprite
+    def recording_load_sprite(sprite_path, size, fallback_color=(255, 0, 255)):
+        recorded.setdefault((sprite_path, tuple(size)), list(fallback_color))
+        return load_sprite(sprite_path, size, fallback_color)
+    game.load_sprite = recording_load_sprite
+    try:
+        game._sprite_cache.clear()
+        game.init_display()
+        for _, char_img_path in game.CHARACTER_OPTIONS:
+            game.load_sprite(char_img_path, (game.PLAYER_SIZE, game.PLAYER_SIZE), (200, 200, 200))
+            game.Player(0, 0, char_img_path)
+        for platform_type in game.PLATFORM_TYPES:
+            for height in (40, 100):
+                game.Platform(0, 0, 4 * game.TILE_SIZE, height, platform_type)
+        for color in game.LOCK_COLORS:
+            game.Lock(0, 0, f'lock_{color}')
+            game.ExclamationBlock(0, 0, f'key_{color}')
+            game.FallingKey(0, 0, f'key_{color}')
+        for enemy_type in ('slime', 'bee'):
+            game.Enemy(0, 0, enemy_type)
+        game.Snail(0, 0)
+        game.Coin(0, 0)
+        game.CoinBlock(0, 0)
+        game.Flag(0, 0)
+        for trace_path in sorted(glob.glob(os.path.join(TRACE_DIR, '*.json.gz'))):
+            replay_input = ReplayInput.load(trace_path)
+            game.main(replay_input, replay_input.level_num, replay_input.seed, frame_limit=False)
+    finally:
+        game.load_sprite = load_sprite
+    manifest = {
+        'sprites': [[sprite_path, list(size), fallback] for (sprite_path, size), fallback in sorted(recorded.items())],
+        'sounds': dict(game.SOUND_MAP),
+        'spritesheets': [],  # The game draws from individual sprite files only
+    }
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    print(f"Wrote {len(manifest['sprites'])} sprites and {len(manifest['sounds'])} sounds to {path}")
+    return manifest
+
+# --- SPRITE BAKE ---
+# A bake is one packed file of raw RGBA pixels per render scale plus a JSON
+# index of (path, logical size) -> offset, pixel size and the source files it
+# was made from. Sources are checked by mtime, then by SHA-1 if the mtime moved,
+# so touching a file does not invalidate it but editing one does.
+def _bake_paths(render_scale):
+    stem = os.path.join(BAKE_DIR, f'sprites_{render_scale:g}')
+    return stem + '.pack', stem + '.json'
+
+def _sprite_sources(path):
+    # Both asset tiers, since which one decode_sprite picks depends on the target size
+    sources = [path]
+    if '/Default/' in path and os.path.exists(path.replace('/Default/', '/Double/')):
+        sources.append(path.replace('/Default/', '/Double/'))
+    return sources
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def bake_sprites(game, manifest=None):
+    """
+    Pre-scale every manifest sprite to the current render scale with the
+    game's own decode and smooth filter, and write the pack and index. Missing
+    files are left out, so they keep their runtime fallback colour.
+    """
+    manifest = manifest or load_manifest()
+    pack_path, index_path = _bake_paths(game.RENDER_SCALE)
+    os.makedirs(BAKE_DIR, exist_ok=True)
+    entries = []
+    start = time.perf_counter()
+    with open(pack_path, 'wb') as pack:
+        for path, size, _ in manifest['sprites']:
+            if not os.path.exists(path):
+                continue
+            pixel_size = game.render_size(size)
+            pixels = pygame.image.tobytes(game.decode_sprite(path, pixel_size), 'RGBA')
+            entries.append({
+                'path': path,
+                'size': size,
+                'pixel_size': list(pixel_size),
+                'offset': pack.tell(),
+                'length': len(pixels),
+                'sources': [[source, os.path.getmtime(source), _file_hash(source)] for source in _sprite_sources(path)],
+            })
+            pack.write(pixels)
+    with open(index_path, 'w') as f:
+        json.dump({'version': BAKE_VERSION, 'render_scale': game.RENDER_SCALE, 'entries': entries}, f)
+    print(f"Baked {len(entries)} sprites at render scale {game.RENDER_SCALE:g} into {pack_path} "
+          f"({os.path.getsize(pack_path) / 2**20:.1f} MB) in {time.perf_counter() - start:.2f}s")
+    return len(entries)
+
+def _source_current(source, mtime, sha1):
+    try:
+        return os.path.getmtime(source) == mtime or _file_hash(source) == sha1
+    except OSError:
+        return False
+
+def load_sprite_pack(render_scale):
+    """
+    Return {(path, logical size): Surface} from the bake for `render_scale`,
+    skipping entries whose sources changed. Surfaces are built straight from
+    the packed pixels, so no decoding or scaling happens.
+    Returns an empty dict when there is no usable bake.
+    """
+    pack_path, index_path = _bake_paths(render_scale)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        with open(pack_path, 'rb') as f:
+            pack = f.read()
+    except (OSError, ValueError):
+        return {}
+    if index.get('version') != BAKE_VERSION:
+        return {}
+    convert = pygame.display.get_surface() is not None
+    pack = memoryview(pack)
+    sprites = {}
+    stale = 0
+    for entry in index['entries']:
+        if not all(_source_current(*source) for source in entry['sources']):
+            stale += 1
+            continue
+        # frombuffer wraps the packed pixels without copying; the one copy is the conversion to
+        # display format (which blits faster than raw RGBA), or a plain copy with no display
+        sprite = pygame.image.frombuffer(pack[entry['offset']:entry['offset'] + entry['length']],
+                                         tuple(entry['pixel_size']), 'RGBA')
+        sprites[entry['path'], tuple(entry['size'])] = sprite.convert_alpha() if convert else sprite.copy()
+    if stale:
+        print(f"{stale} baked sprites are out of date; run `python assets.py --bake` to refresh them")
+    return sprites
+
+def measure_startup(game):
+    """
+    Time getting every manifest sprite into memory at the current render
+    scale the way the game starts up: init_display() (which runs at import
+    and loads the background) followed by the rest of the manifest, with
+    every sprite decoded and scaled (the unbaked path) against with the bake
+    installed. Counts the scale calls made by each.
+    """
+    manifest = load_manifest()
+    transform = pygame.transform
+    calls = [0]
+    def counting(fn):
+        def wrapper(*args, **kwargs):
+            calls[0] += 1
+            return fn(*args, **kwargs)
+        return wrapper
+    scale, smoothscale = transform.scale, transform.smoothscale
+    transform.scale, transform.smoothscale = counting(scale), counting(smoothscale)
+    try:
+        results = {}
+        for mode in ('decode', 'baked'):
+            calls[0] = 0
+            # Without the bake, init_display() finds no pack and decodes the background itself
+            game.load_sprite_pack = load_sprite_pack if mode == 'baked' else lambda render_scale: {}
+            start = time.perf_counter()
+            game.init_display()
+            sprites = game._sprite_cache
+            for path, size, fallback in manifest['sprites']:
+                key = (path, tuple(size))
+                if key not in sprites:
+                    sprites[key] = game.decode_sprite(path, game.render_size(size), tuple(fallback))
+            elapsed = time.perf_counter() - start
+            results[mode] = elapsed
+            print(f"{mode:>7}: {len(sprites)} sprites in {elapsed * 1000:.1f} ms, {calls[0]} scale calls")
+    finally:
+        transform.scale, transform.smoothscale = scale, smoothscale
+        game.load_sprite_pack = load_sprite_pack
+    print(f"baked sprites load {results['decode'] / results['baked']:.1f}x faster")
+    return results
+
+# --- BACKGROUND LOADER ---
+class AssetLoader:
+    """
+    Decodes assets on a thread pool while the main thread keeps drawing.
+
+    submit(key, fn, *args) queues one decode; poll() hands back the (key,
+    result) pairs finished since the last call, so results are installed into
+    the game's caches on the main thread only. Tracks bytes read from disk,
+    bytes decoded and wall time for the load report.
+    """
+    def __init__(self, workers=LOADER_WORKERS):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asset')
+        self.finished = queue.SimpleQueue()
+        self.total = 0
+        self.completed = 0
+        self.disk_bytes = 0
+        self.decoded_bytes = 0
+        self.errors = 0
+        self.start_time = time.perf_counter()
+        self.end_time = None
+    def submit(self, key, fn, *args, path=None):
+        if path is not None and os.path.exists(path):
+            self.disk_bytes += os.path.getsize(path)
+        self.total += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self.finished.put((key, f)))
+    def poll(self):
+        results = []
+        while True:
+            try:
+                key, future = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.completed += 1
+            if future.exception() is not None:
+                self.errors += 1
+                continue
+            result = future.result()
+            self.decoded_bytes += decoded_size(result)
+            results.append((key, result))
+        if self.done and self.end_time is None:
+            self.end_time = time.perf_counter()
+            self.executor.shutdown(wait=False)
+        return results
+    @property
+    def done(self):
+        return self.completed >= self.total
+    @property
+    def progress(self):
+        return self.completed / self.total if self.total else 1.0
+    @property
+    def wall_time(self):
+        return (self.end_time or time.perf_counter()) - self.start_time
+    def report(self):
+        return (f"Loaded {self.completed} assets ({self.disk_bytes / 2**20:.1f} MB on disk, "
+                f"{self.decoded_bytes / 2**20:.1f} MB decoded) in {self.wall_time * 1000:.0f} ms "
+                f"on {self.workers} threads" + (f", {self.errors} failed" if self.errors else ""))
+
+def decoded_size(asset):
+    # Bytes held in memory by a decoded Surface or Sound
+    if asset is None:
+        return 0
+    if hasattr(asset, 'get_bytesize'):
+        return asset.get_width() * asset.get_height() * asset.get_bytesize()
+    if hasattr(asset, 'get_raw'):
+        return len(asset.get_raw())
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asset manifest and sprite bake tools")
+    parser.add_argument('--bake', action='store_true', help="pre-scale the manifest sprites into .cache/sprites")
+    parser.add_argument('--render-scale', type=float, nargs='+', default=None,
+                        help="render scales to bake (default: the game's current one)")
+    parser.add_argument('--measure', action='store_true', help="compare startup sprite loading with and without the bake")
+    args = parser.parse_args()
+    if not args.bake and not args.measure:
+        build_manifest()
+    else:
+        from game_sim import load_headless_game
+        game = load_headless_game()
+        for render_scale in args.render_scale or [game.RENDER_SCALE]:
+            if render_scale != game.RENDER_SCALE:
+                game.init_display(render_scale)
+            if args.bake:
+                bake_sprites(game)
+            if args.measure:
+                measure_startup(game)
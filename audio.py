@@ -0,0 +1,196 @@
+import os
+import statistics
+import time
+
+import pygame
+
+# --- CONFIG ---
+MIXER_FREQUENCY = 44100
+MIXER_SIZE = -16
+MIXER_CHANNELS = 2
+# Samples per mixer callback; pygame's default (512-4096 depending on version) adds tens of ms
+MIXER_BUFFER = int(os.environ.get('MSB_AUDIO_BUFFER', '256'))
+VOICES = 8                # Channels reserved for sound effects
+PCM_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'audio')
+
+# Per-sound (priority, minimum ms between plays, volume). A sound may take over
+# the voice of a lower- or equal-priority sound when every voice is busy.
+SOUND_SETTINGS = {
+    'hurt': (3, 100, 1.0),
+    'game_over': (3, 250, 1.0),
+    'select': (2, 60, 1.0),
+    'magic': (2, 60, 1.0),
+    'jump': (1, 60, 0.8),
+    'long_jump': (1, 60, 0.8),
+    'coin': (1, 30, 0.7),
+    'enemy_bump': (0, 50, 0.8),
+}
+DEFAULT_SETTINGS = (1, 50, 1.0)
+
+def pre_init_mixer():
+    # Must run before pygame.init(), which otherwise opens the mixer with the default buffer
+    pygame.mixer.pre_init(MIXER_FREQUENCY, MIXER_SIZE, MIXER_CHANNELS, MIXER_BUFFER)
+
+# --- PCM CACHE ---
+def _cache_path(name, mixer_format):
+    frequency, size, channels = mixer_format
+    return os.path.join(PCM_CACHE_DIR, f'{name}-{frequency}-{abs(size)}-{channels}.pcm')
+
+def load_pcm(name, path):
+    """
+    Load a sound as raw PCM in the mixer's format. The compressed file is
+    decoded once and the samples cached on disk; later runs skip decoding and
+    hand the bytes straight to the mixer. Returns None if it cannot be loaded.
+    """
+    mixer_format = pygame.mixer.get_init()
+    if mixer_format is None:
+        return None
+    cache_path = _cache_path(name, mixer_format)
+    try:
+        if os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            with open(cache_path, 'rb') as f:
+                return pygame.mixer.Sound(buffer=f.read())
+    except OSError:
+        pass
+    try:
+        sound = pygame.mixer.Sound(path)
+    except Exception:
+        return None
+    try:
+        os.makedirs(PCM_CACHE_DIR, exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            f.write(sound.get_raw())
+    except OSError:
+        pass  # A read-only checkout still plays, it just decodes every run
+    return sound
+
+# --- AUDIO ENGINE ---
+class AudioEngine:
+    """
+    Sound effects on a fixed pool of reserved mixer channels.
+
+    play(name) drops the sound if it was played less than its minimum interval
+    ago (rapid coin pickups would otherwise stack up), then starts it on a free
+    voice, or on the oldest voice playing something of lower or equal
+    priority. Sounds with no free voice and nothing to take over are dropped.
+    Without a working mixer every call is a no-op. With preload off, sounds are
+    loaded on first play unless the asset preloader has filled `sounds` already.
+    """
+    def __init__(self, sound_map, voices=VOICES, preload=True):
+        self.sound_map = sound_map
+        self.sounds = {}
+        self.voices = []
+        self.voice_priority = []
+        self.voice_started = []
+        self.last_played = {}
+        self.played = 0
+        self.dropped = 0
+        if pygame.mixer.get_init() is None:
+            return
+        if preload:
+            for name, path in sound_map.items():
+                self.sounds[name] = load_pcm(name, path)
+        pygame.mixer.set_num_channels(max(voices, pygame.mixer.get_num_channels()))
+        # Reserved channels are never picked by a bare Sound.play(), so nothing outside the pool steals them
+        pygame.mixer.set_reserved(voices)
+        self.voices = [pygame.mixer.Channel(i) for i in range(voices)]
+        self.voice_priority = [0] * voices
+        self.voice_started = [0.0] * voices
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            if name in self.sounds or not self.voices or name not in self.sound_map:
+                return None
+            sound = self.sounds[name] = load_pcm(name, self.sound_map[name])
+            if sound is None:
+                return None
+        priority, min_interval, volume = SOUND_SETTINGS.get(name, DEFAULT_SETTINGS)
+        now = time.perf_counter()
+        if (now - self.last_played.get(name, -1.0)) * 1000 < min_interval:
+            self.dropped += 1
+            return None
+        index = self._free_voice(priority)
+        if index is None:
+            self.dropped += 1
+            return None
+        channel = self.voices[index]
+        channel.set_volume(volume)
+        channel.play(sound)
+        self.voice_priority[index] = priority
+        self.voice_started[index] = now
+        self.last_played[name] = now
+        self.played += 1
+        return channel
+    def _free_voice(self, priority):
+        steal = None
+        for i, channel in enumerate(self.voices):
+            if not channel.get_busy():
+                return i
+            if self.voice_priority[i] <= priority and (steal is None or
+                                                       self.voice_started[i] < self.voice_started[steal]):
+                steal = i
+        return steal
+    def stop(self):
+        for channel in self.voices:
+            channel.stop()
+
+# --- LATENCY ---
+def buffer_latency_ms():
+    # Lower bound set by the mixer buffer: one callback's worth of samples
+    mixer_format = pygame.mixer.get_init()
+    return MIXER_BUFFER / mixer_format[0] * 1000 if mixer_format else None
+
+def measure_latency(engine, name='select', trials=10):
+    """
+    Estimate mixer queueing delay: play `name` with an end event and time how
+    much longer than the sound itself it takes the mixer to finish it. The
+    overrun approximates how long samples wait in the mixer after play(); it
+    is not the device's output latency. Trials with no end event in time, and
+    non-positive overruns (drivers that drain faster than real time), are
+    dropped. Returns the median in ms, or None if nothing was measurable.
+    """
+    sound = engine.sounds.get(name)
+    if sound is None:
+        return None
+    end_event = pygame.USEREVENT + 7
+    delays = []
+    for _ in range(trials):
+        engine.last_played.clear()
+        start = time.perf_counter()
+        channel = engine.play(name)
+        if channel is None:
+            continue
+        channel.set_endevent(end_event)
+        overrun = None
+        while time.perf_counter() - start <= sound.get_length() + 1.0:
+            if any(e.type == end_event for e in pygame.event.get(end_event)):
+                overrun = (time.perf_counter() - start - sound.get_length()) * 1000
+                break
+            time.sleep(0.0005)
+        channel.set_endevent()
+        if overrun is not None and overrun > 0:
+            delays.append(overrun)
+    return statistics.median(delays) if delays else None
+
+def report_latency(trials=10):
+    # Importing the game runs pre_init_mixer() and opens the mixer exactly as a real session does
+    import mustafa_super_bros as game
+    start = time.perf_counter()
+    engine = AudioEngine(game.SOUND_MAP)
+    load_time = time.perf_counter() - start
+    if not engine.voices:
+        print("No audio device; nothing to measure")
+        return
+    print(f"mixer {pygame.mixer.get_init()}, buffer {MIXER_BUFFER} samples, {len(engine.voices)} voices, "
+          f"driver {os.environ.get('SDL_AUDIODRIVER', 'default')}")
+    print(f"loaded {len(engine.sounds)} sounds in {load_time * 1000:.1f} ms")
+    latency = measure_latency(engine, trials=trials)
+    if latency is None:
+        print(f"buffer latency {buffer_latency_ms():.1f} ms, mixer queueing could not be measured")
+        print("(no trial finished in time, or the driver drains faster than real time, e.g. SDL's dummy driver)")
+        return
+    print(f"buffer latency {buffer_latency_ms():.1f} ms, mixer queueing ~{latency:.1f} ms "
+          f"(estimated from sound end overrun, median of up to {trials} trials)")
+
+if __name__ == "__main__":
+    report_latency()
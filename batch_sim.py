@@ -0,0 +1,334 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from game_sim import ACTIONS, PROGRESS_REWARD, SCORE_REWARD, DEATH_PENALTY, COMPLETION_REWARD
+from level_validator import JUMP_POWER, GRAVITY, SPEED, TERMINAL_VELOCITY, PLAYER_SIZE
+
+# --- PHYSICS (mirrors mustafa_super_bros.py) ---
+SCREEN_HEIGHT = 800
+SPAWN_X, SPAWN_Y = 100.0, 400.0
+GROUND_HEIGHT = 100
+ENEMY_SIZE = 48
+ENEMY_SPEED = -1.0
+ENEMY_HITBOX_INSET = ENEMY_SIZE * (1 - 0.5) / 2  # Enemy.check_collision shrinks its box to 50%
+ENEMY_HITBOX = ENEMY_SIZE * 0.5
+COIN_SIZE = 32
+FLAG_SIZE = 64
+COIN_SCORE = 100
+
+NEAREST_ENEMIES = 4
+OBS_SIZE = 8 + 2 * NEAREST_ENEMIES
+
+# --- LEVEL TABLES ---
+class LevelPool:
+    """
+    Padded NumPy tables for a list of levels in the vae_sample format.
+
+    Platforms keep the order build_level_objects creates them in (ground
+    first), since collision resolution depends on it. Shorter tables are
+    padded and masked out.
+    """
+    def __init__(self, levels):
+        count = len(levels)
+        max_platforms = max(1 + len(level['platforms']) for level in levels)
+        max_enemies = max(NEAREST_ENEMIES, max(len(level['enemies']) for level in levels))
+        max_coins = max(1, max(len(level['coins']) for level in levels))
+        self.platforms = np.zeros((count, max_platforms, 4))
+        self.platform_mask = np.zeros((count, max_platforms), dtype=bool)
+        self.enemies = np.zeros((count, max_enemies, 2))
+        self.enemy_mask = np.zeros((count, max_enemies), dtype=bool)
+        self.coins = np.zeros((count, max_coins, 2))
+        self.coin_mask = np.zeros((count, max_coins), dtype=bool)
+        self.flags = np.zeros((count, 2))
+        for i, level in enumerate(levels):
+            platforms = [(0, level['ground_y'], level['ground_length'], GROUND_HEIGHT)]
+            platforms += [p[:4] for p in level['platforms']]
+            self.platforms[i, :len(platforms)] = platforms
+            self.platform_mask[i, :len(platforms)] = True
+            if level['enemies']:
+                self.enemies[i, :len(level['enemies'])] = [e[:2] for e in level['enemies']]
+                self.enemy_mask[i, :len(level['enemies'])] = True
+            if level['coins']:
+                self.coins[i, :len(level['coins'])] = level['coins']
+                self.coin_mask[i, :len(level['coins'])] = True
+            self.flags[i] = level['flag']
+    def __len__(self):
+        return len(self.flags)
+
+def load_levels(path):
+    """
+    Read levels written by generate_levels.py: a .jsonl file or a directory of .json files.
+    """
+    if os.path.isdir(path):
+        levels = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.json'):
+                with open(os.path.join(path, name)) as f:
+                    levels.append(json.load(f))
+        return levels
+    with open(path) as f:
+        return [json.loads(line)['level'] for line in f if line.strip()]
+
+def sample_levels(count, level_num=1, model_path='vae_model_final.pth'):
+    """
+    Sample `count` playable VAE levels, or fallback levels if the model is missing.
+    """
+    from vae_sample import load_vae_model, sample_playable_grids, convert_grid_to_game_format, generate_fallback_level
+    model = load_vae_model(model_path)
+    if model is None:
+        return [generate_fallback_level(level_num) for _ in range(count)]
+    grids, _ = sample_playable_grids(model, count, level_num)
+    levels = [convert_grid_to_game_format(grid, level_num) for grid in grids]
+    while len(levels) < count:
+        levels.append(generate_fallback_level(level_num))
+    return levels
+
+# --- BATCHED SIMULATOR ---
+class BatchSim:
+    """
+    Steps `num_envs` independent games at once with the game's physics on NumPy arrays.
+
+    Each environment plays a level drawn from `levels` and is reset to a new
+    random level when it dies, reaches the flag or hits `max_steps`. Player,
+    enemy, coin and flag rules follow GameWorld.tick step for step; blocks,
+    keys, locks and liquids only exist in hand-built levels and are not simulated.
+
+    Actions are indices into game_sim.ACTIONS. Observations are (num_envs,
+    OBS_SIZE) float32 rows: player x, y, vel_x, vel_y, on_ground, flag dx, dy,
+    coins left, then dx, dy of the nearest enemies. Rewards match GameSim.
+    """
+    def __init__(self, levels, num_envs, seed=0, max_steps=3600):
+        self.pool = levels if isinstance(levels, LevelPool) else LevelPool(levels)
+        self.num_envs = num_envs
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        self.actions = np.array(ACTIONS, dtype=bool)
+        n = num_envs
+        pool = self.pool
+        self.level = np.zeros(n, dtype=np.int64)
+        self.platforms = np.zeros((n,) + pool.platforms.shape[1:])
+        self.platform_mask = np.zeros((n,) + pool.platform_mask.shape[1:], dtype=bool)
+        self.player = np.zeros((n, 4))  # x, y, vel_x, vel_y
+        self.on_ground = np.zeros(n, dtype=bool)
+        self.enemies = np.zeros((n,) + pool.enemies.shape[1:2] + (4,))  # x, y, vel_x, vel_y
+        self.enemy_mask = np.zeros((n,) + pool.enemy_mask.shape[1:], dtype=bool)
+        self.coins = np.zeros((n,) + pool.coins.shape[1:])
+        self.coins_alive = np.zeros((n,) + pool.coin_mask.shape[1:], dtype=bool)
+        self.flags = np.zeros((n, 2))
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.best_x = np.zeros(n)
+        self.score = np.zeros(n)
+        self.episode_return = np.zeros(n)
+    def reset(self, levels=None):
+        self._reset_envs(np.arange(self.num_envs), levels)
+        return self.observe()
+    def _reset_envs(self, idx, levels=None):
+        pool = self.pool
+        level = self.rng.integers(len(pool), size=len(idx)) if levels is None else np.asarray(levels)
+        self.level[idx] = level
+        self.platforms[idx] = pool.platforms[level]
+        self.platform_mask[idx] = pool.platform_mask[level]
+        self.player[idx] = (SPAWN_X, SPAWN_Y, 0.0, 0.0)
+        self.on_ground[idx] = False
+        self.enemies[idx, :, :2] = pool.enemies[level]
+        self.enemies[idx, :, 2] = ENEMY_SPEED
+        self.enemies[idx, :, 3] = 0.0
+        self.enemy_mask[idx] = pool.enemy_mask[level]
+        self.coins[idx] = pool.coins[level]
+        self.coins_alive[idx] = pool.coin_mask[level]
+        self.flags[idx] = pool.flags[level]
+        self.steps[idx] = 0
+        self.best_x[idx] = SPAWN_X
+        self.score[idx] = 0.0
+        self.episode_return[idx] = 0.0
+    def step(self, actions):
+        """
+        Advance every environment one tick. Returns (obs, reward, done, info);
+        finished environments are already reset in `obs`, and info holds their
+        final return, score and outcome.
+        """
+        left, right, jump = self.actions[np.asarray(actions)].T
+        x, y, vel_x, vel_y = self.player.T.copy()
+        on_ground = self.on_ground
+
+        # Coins are collected against the position before this tick's move, as in GameWorld.tick
+        hit = self.coins_alive & self._overlap(x[:, None], y[:, None], PLAYER_SIZE, PLAYER_SIZE,
+                                               self.coins[..., 0], self.coins[..., 1], COIN_SIZE, COIN_SIZE)
+        self.coins_alive &= ~hit
+        gained = hit.sum(axis=1) * COIN_SCORE
+        self.score += gained
+
+        # Player.update
+        vel_x = np.where(left, -SPEED, np.where(right, SPEED, 0.0))
+        jumping = jump & on_ground
+        vel_y = np.where(jumping, JUMP_POWER, vel_y)
+        airborne = ~on_ground | jumping
+        vel_y = np.where(airborne, np.minimum(vel_y + GRAVITY, TERMINAL_VELOCITY), vel_y)
+        x = x + vel_x
+        y = y + vel_y
+        # Every resolution zeroes vel_y, which makes later contacts no-ops, so only the
+        # first overlapping platform in list order matters, exactly as in the sequential loop
+        px, py, pw, ph = np.moveaxis(self.platforms, 2, 0)
+        hit = self.platform_mask & self._overlap(x[:, None], y[:, None], PLAYER_SIZE, PLAYER_SIZE, px, py, pw, ph)
+        first = hit.argmax(axis=1)[:, None]
+        touching = hit.any(axis=1)
+        down = touching & (vel_y > 0)
+        up = touching & (vel_y < 0)
+        first_y = np.take_along_axis(py, first, 1)[:, 0]
+        first_h = np.take_along_axis(ph, first, 1)[:, 0]
+        y = np.where(down, first_y - PLAYER_SIZE, np.where(up, first_y + first_h, y))
+        vel_y = np.where(down | up, 0.0, vel_y)
+        on_ground = down
+        self.player = np.stack([x, y, vel_x, vel_y], axis=1)
+        self.on_ground = on_ground
+
+        # Enemy.update: the first overlapping platform moves the enemy and zeroes vel_y;
+        # every later overlap at the new position (vel_y == 0) flips its direction
+        ex, ey, evx, evy = np.moveaxis(self.enemies, 2, 0)
+        evy = evy + GRAVITY
+        ex = ex + evx
+        ey = ey + evy
+        px, py, pw, ph = (v[:, None, :] for v in (px, py, pw, ph))
+        live = self.platform_mask[:, None, :] & self.enemy_mask[:, :, None]
+        hit = live & self._overlap(px, py, pw, ph, (ex + ENEMY_HITBOX_INSET)[..., None],
+                                   (ey + ENEMY_HITBOX_INSET)[..., None], ENEMY_HITBOX, ENEMY_HITBOX)
+        first = hit.argmax(axis=2)[..., None]
+        touching = hit.any(axis=2)
+        down = touching & (evy > 0)
+        up = touching & (evy < 0)
+        first_y = np.take_along_axis(np.broadcast_to(py, hit.shape), first, 2)[..., 0]
+        first_h = np.take_along_axis(np.broadcast_to(ph, hit.shape), first, 2)[..., 0]
+        ey = np.where(down, first_y - ENEMY_SIZE, np.where(up, first_y + first_h, ey))
+        moved = down | up
+        evy = np.where(moved, 0.0, evy)
+        later = (np.arange(hit.shape[2]) > first) & live & self._overlap(
+            px, py, pw, ph, (ex + ENEMY_HITBOX_INSET)[..., None], (ey + ENEMY_HITBOX_INSET)[..., None],
+            ENEMY_HITBOX, ENEMY_HITBOX)
+        flips = np.where(moved, (later & moved[..., None]).sum(axis=2), np.where(touching, hit.sum(axis=2), 0))
+        evx = np.where(flips % 2 == 1, -evx, evx)
+        self.enemies = np.stack([ex, ey, evx, evy], axis=2)
+
+        # Outcomes
+        caught = (self.enemy_mask & self._overlap(x[:, None], y[:, None], PLAYER_SIZE, PLAYER_SIZE,
+                                                  ex, ey, ENEMY_SIZE, ENEMY_SIZE)).any(axis=1)
+        completed = self._overlap(x, y, PLAYER_SIZE, PLAYER_SIZE,
+                                  self.flags[:, 0], self.flags[:, 1], FLAG_SIZE, FLAG_SIZE)
+        game_over = caught | (y > SCREEN_HEIGHT)
+        self.steps += 1
+
+        reward = gained * SCORE_REWARD
+        progress = np.maximum(x - self.best_x, 0.0)
+        reward += progress * PROGRESS_REWARD
+        self.best_x += progress
+        reward += np.where(game_over, DEATH_PENALTY, np.where(completed, COMPLETION_REWARD, 0.0))
+        self.episode_return += reward
+        done = game_over | completed | (self.steps >= self.max_steps)
+
+        info = {}
+        if done.any():
+            idx = np.flatnonzero(done)
+            info = {
+                'env': idx,
+                'episode_return': self.episode_return[idx].copy(),
+                'score': self.score[idx].copy(),
+                'completed': completed[idx] & ~game_over[idx],
+                'steps': self.steps[idx].copy(),
+            }
+            self._reset_envs(idx)
+        return self.observe(), reward, done, info
+    @staticmethod
+    def _overlap(ax, ay, aw, ah, bx, by, bw, bh):
+        # Strict AABB overlap, the test every check_collision in the game uses
+        return (ax < bx + bw) & (ax + aw > bx) & (ay < by + bh) & (ay + ah > by)
+    def observe(self):
+        x, y, vel_x, vel_y = self.player.T
+        obs = np.zeros((self.num_envs, OBS_SIZE), dtype=np.float32)
+        obs[:, 0] = x
+        obs[:, 1] = y
+        obs[:, 2] = vel_x
+        obs[:, 3] = vel_y
+        obs[:, 4] = self.on_ground
+        obs[:, 5] = self.flags[:, 0] - x
+        obs[:, 6] = self.flags[:, 1] - y
+        obs[:, 7] = self.coins_alive.sum(axis=1)
+        dx = self.enemies[..., 0] - x[:, None]
+        dy = self.enemies[..., 1] - y[:, None]
+        distance = np.where(self.enemy_mask, np.abs(dx), np.inf)
+        nearest = np.argsort(distance, axis=1)[:, :NEAREST_ENEMIES]
+        valid = np.take_along_axis(self.enemy_mask, nearest, axis=1)
+        obs[:, 8::2] = np.where(valid, np.take_along_axis(dx, nearest, axis=1), 0.0)
+        obs[:, 9::2] = np.where(valid, np.take_along_axis(dy, nearest, axis=1), 0.0)
+        return obs
+
+# --- CHECKS ---
+def test_matches_game(levels=None, num_envs=8, steps=600, seed=0):
+    """
+    Step BatchSim and the real Player/Enemy objects side by side with the same
+    random actions and check positions and score stay identical.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import mustafa_super_bros as game
+
+    levels = levels or sample_levels(num_envs)
+    sim = BatchSim(levels, num_envs, max_steps=steps + 1)
+    sim.reset(levels=np.arange(num_envs) % len(levels))
+    worlds = []
+    for i in range(num_envs):
+        platforms, enemies, coins, _ = game.build_level_objects(levels[sim.level[i]])
+        worlds.append((game.Player(SPAWN_X, SPAWN_Y, game.CHARACTER_OPTIONS[0][1]), platforms, enemies, coins))
+    rng = np.random.default_rng(seed)
+    live = np.ones(num_envs, dtype=bool)
+    score = np.zeros(num_envs)
+    for t in range(steps):
+        # Biased towards running right so episodes meet enemies, gaps and the flag
+        actions = rng.choice(len(ACTIONS), size=num_envs, p=[0.05, 0.1, 0.35, 0.1, 0.05, 0.35])
+        _, _, done, _ = sim.step(actions)
+        for i, (player, platforms, enemies, coins) in enumerate(worlds):
+            if not live[i]:
+                continue
+            for coin in coins:
+                if not coin.collected and coin.check_collision(player):
+                    coin.collected = True
+                    score[i] += COIN_SCORE
+            player.update(platforms, ACTIONS[actions[i]])
+            for enemy in enemies:
+                enemy.update(platforms)
+            if done[i]:
+                live[i] = False
+                continue
+            assert np.allclose(sim.player[i], (player.x, player.y, player.vel_x, player.vel_y)), (t, i)
+            assert sim.on_ground[i] == player.on_ground, (t, i)
+            for j, enemy in enumerate(enemies):
+                assert np.allclose(sim.enemies[i, j], (enemy.x, enemy.y, enemy.vel_x, enemy.vel_y)), (t, i, j)
+            assert sim.score[i] == score[i], (t, i)
+    print(f"BatchSim matched Player/Enemy for {num_envs} envs over {steps} steps "
+          f"({int((~live).sum())} episodes ended early)")
+
+def benchmark(env_counts=(1, 16, 256, 1024, 4096), steps=200, levels=None):
+    """
+    Report env-steps/second as the number of batched environments grows.
+    """
+    levels = levels or sample_levels(64)
+    rng = np.random.default_rng(0)
+    results = {}
+    for num_envs in env_counts:
+        sim = BatchSim(levels, num_envs)
+        sim.reset()
+        actions = rng.integers(len(ACTIONS), size=(steps, num_envs))
+        start = time.perf_counter()
+        for t in range(steps):
+            sim.step(actions[t])
+        elapsed = time.perf_counter() - start
+        results[num_envs] = num_envs * steps / elapsed
+        print(f"{num_envs:>6} envs: {results[num_envs]:>12,.0f} env-steps/s ({elapsed / steps * 1000:.2f} ms/step)")
+    return results
+
+if __name__ == "__main__":
+    pool = sample_levels(64)
+    test_matches_game(pool[:8])
+    benchmark(levels=pool, steps=int(sys.argv[1]) if len(sys.argv) > 1 else 200)
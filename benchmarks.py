@@ -0,0 +1,292 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+
+from game_sim import load_headless_game
+from level_compiler import clear_compiled_levels, has_level_definition
+
+# --- CONFIG ---
+TARGET_REPEAT_TIME = 0.05   # Seconds per timing repeat; the call count per repeat is calibrated to it
+REPEATS = 7
+DEFAULT_THRESHOLD = 0.10    # Relative slowdown of the median flagged as a regression by --compare
+
+# --- REGISTRY ---
+# Each benchmark is a factory that does its setup and returns the zero-argument
+# callable to time, so setup never counts towards the measurement.
+BENCHMARKS = []
+
+def benchmark(name):
+    def register(factory):
+        BENCHMARKS.append((name, factory))
+        return factory
+    return register
+
+def measure(fn, repeats=REPEATS, target_time=TARGET_REPEAT_TIME):
+    """
+    Time `fn` like timeit: calibrate how many calls fill `target_time`, then
+    take `repeats` timings of that many calls. Returns per-call statistics in
+    microseconds.
+    """
+    fn()  # Warm-up, so caches and lazy imports are not billed to the first repeat
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target_time / 2 or number >= 1 << 20:
+            break
+        number *= 2
+    number = max(1, int(number * target_time / max(elapsed, 1e-9)))
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        'median_us': statistics.median(timings),
+        'min_us': min(timings),
+        'mean_us': statistics.fmean(timings),
+        'stdev_us': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'number': number,
+        'repeats': repeats,
+    }
+
+# --- LEVEL GENERATION ---
+def _generate_level_factory(level_num, cold):
+    def factory():
+        game = load_headless_game()
+        clear_compiled_levels()
+        if not cold:
+            return lambda: game.generate_level(level_num)
+        def run():
+            # Parse and compile levels/level_<n>.json every call, as on the first load of a level
+            clear_compiled_levels()
+            game.generate_level(level_num)
+        return run
+    return factory
+
+def _register_level_benchmarks():
+    level_num = 1
+    while has_level_definition(level_num):
+        benchmark(f'generate_level[{level_num},cold]')(_generate_level_factory(level_num, True))
+        benchmark(f'generate_level[{level_num},cached]')(_generate_level_factory(level_num, False))
+        level_num += 1
+
+def _vae_model():
+    from vae_sample import load_vae_model
+    model = load_vae_model(device=torch.device('cpu'))
+    if model is None:
+        raise RuntimeError("vae_model_final.pth is required for the VAE benchmarks")
+    return model
+
+@benchmark('generate_level_with_vae')
+def bench_generate_level_with_vae():
+    from vae_sample import generate_level_with_vae
+    model = _vae_model()
+    torch.manual_seed(0)
+    random.seed(0)
+    return lambda: generate_level_with_vae(level_num=7, model=model)
+
+@benchmark('post_process_level')
+def bench_post_process_level():
+    from vae_sample import sample_level_grid, post_process_level
+    torch.manual_seed(0)
+    random.seed(0)
+    grid = sample_level_grid(_vae_model())
+    # post_process_level edits the grid in place, so each call gets a fresh copy (included in the time)
+    return lambda: post_process_level([row[:] for row in grid])
+
+@benchmark('extract_horizontal_platforms')
+def bench_extract_horizontal_platforms():
+    from vae_sample import sample_level_grid, post_process_level, extract_horizontal_platforms
+    torch.manual_seed(0)
+    random.seed(0)
+    grid = post_process_level(sample_level_grid(_vae_model()))
+    return lambda: extract_horizontal_platforms(grid, 1800 / 20, 800 / 20, 700)
+
+# --- PHYSICS ---
+def _random_platforms(game, count, seed=0):
+    # Ground plus `count - 1` scattered ledges over a long level, like the streamed endless mode
+    rng = random.Random(seed)
+    platforms = [game.Platform(0, 700, 100 * count, 100, "grass")]
+    for _ in range(count - 1):
+        platforms.append(game.Platform(rng.randrange(0, 100 * count), rng.randrange(300, 650),
+                                       rng.randrange(100, 400), 40, "wood"))
+    return platforms
+
+def _player_update_factory(platform_count):
+    def factory():
+        game = load_headless_game()
+        platforms = _random_platforms(game, platform_count)
+        player = game.Player(100, 400, game.CHARACTER_OPTIONS[0][1])
+        controls = (False, True, False)
+        def run():
+            # Walk right along the ground; restart at the far end so the work per call stays the same
+            if player.x > 100 * platform_count - 200:
+                player.x = 100
+            player.update(platforms, controls)
+        return run
+    return factory
+
+def _register_player_benchmarks():
+    for count in (10, 100, 1000):
+        benchmark(f'Player.update[P={count}]')(_player_update_factory(count))
+
+@benchmark('Enemy.update[N=1000]')
+def bench_enemy_update():
+    game = load_headless_game()
+    platforms = _random_platforms(game, 50)
+    enemies = [game.Enemy(100 + i * 5, 652, 'slime') for i in range(1000)]
+    def run():
+        for enemy in enemies:
+            enemy.update(platforms)
+    return run
+
+# --- RENDERING ---
+@benchmark('draw_pass[level 3]')
+def bench_draw_pass():
+    game = load_headless_game()
+    random.seed(0)
+    world = game.GameWorld(3, game.CHARACTER_OPTIONS[0][1])
+    render_queue = game.RenderQueue()
+    def run():
+        game.screen.blit(game.background, (0, 0))
+        world.draw(render_queue)
+        render_queue.flush(game.screen)
+    return run
+
+@benchmark('load_sprite[cold]')
+def bench_load_sprite_cold():
+    game = load_headless_game()
+    def run():
+        # Decode and scale from disk every call, as on first use of a sprite
+        game._sprite_cache.pop(('Sprites/Enemies/Default/slime_normal_rest.png', (48, 48)), None)
+        game.load_sprite('Sprites/Enemies/Default/slime_normal_rest.png', (48, 48))
+    return run
+
+@benchmark('load_sprite[cached]')
+def bench_load_sprite_cached():
+    game = load_headless_game()
+    return lambda: game.load_sprite('Sprites/Enemies/Default/slime_normal_rest.png', (48, 48))
+
+_registered = False
+
+def register_benchmarks():
+    # Parametrized benchmarks are registered on demand rather than when the module is imported
+    global _registered
+    if not _registered:
+        _registered = True
+        _register_level_benchmarks()
+        _register_player_benchmarks()
+
+# --- RESULTS ---
+def machine_metadata():
+    game = load_headless_game()
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'pygame': game.pygame.version.ver,
+        'sdl_videodriver': os.environ.get('SDL_VIDEODRIVER'),
+        'render_scale': game.RENDER_SCALE,
+    }
+
+def run_benchmarks(name_filter=None, repeats=REPEATS, target_time=TARGET_REPEAT_TIME):
+    """
+    Run every registered benchmark whose name contains `name_filter` and
+    return {'metadata': ..., 'results': {name: stats}}.
+    """
+    register_benchmarks()
+    results = {}
+    for name, factory in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        stats = measure(factory(), repeats, target_time)
+        results[name] = stats
+        print(f"{name:<32}{stats['median_us']:>12.2f} us  (min {stats['min_us']:.2f}, "
+              f"stdev {stats['stdev_us']:.2f}, {stats['number']} x {stats['repeats']})")
+    return {'metadata': machine_metadata(), 'results': results}
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare per-benchmark medians and print the change of each. Returns the
+    names that got slower by more than `threshold` (0.1 = 10%).
+    """
+    regressions = []
+    print(f"{'benchmark':<32}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, stats in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<32}{'-':>12}{stats['median_us']:>12.2f}      new")
+            continue
+        change = stats['median_us'] / base['median_us'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{name:<32}{base['median_us']:>12.2f}{stats['median_us']:>12.2f}{change:>+9.1%}{flag}")
+    if baseline['metadata'].get('machine') != current['metadata'].get('machine') or \
+            baseline['metadata'].get('processor') != current['metadata'].get('processor'):
+        print("Warning: results come from different machines")
+    print(f"{len(regressions)} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the game's hot paths")
+    parser.add_argument('--output', '-o', default=None, help="write results as JSON to this path")
+    parser.add_argument('--filter', '-k', default=None, help="only run benchmarks whose name contains this")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help="BASELINE [CURRENT]: compare two result files, or a baseline against a fresh run")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (default 0.10)")
+    parser.add_argument('--list', action='store_true', help="list benchmark names and exit")
+    args = parser.parse_args()
+    register_benchmarks()
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        sys.exit(0)
+    if args.compare and len(args.compare) > 1:
+        current = load_results(args.compare[1])
+    else:
+        current = run_benchmarks(args.filter, args.repeats)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2)
+            print(f"Wrote {len(current['results'])} results to {args.output}")
+    if args.compare:
+        sys.exit(1 if compare_results(load_results(args.compare[0]), current, args.threshold) else 0)
+
+if __name__ == "__main__":
+    main()
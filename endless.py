@@ -0,0 +1,210 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import torch
+
+from vae_sample import (load_vae_model, sample_playable_grids, post_process_level, sample_level_grid,
+                        convert_grid_to_game_format, generate_fallback_level, level_base_length)
+from render_queue import RenderQueue
+
+# --- CONFIG ---
+CHUNK_LEVEL_NUM = 1  # Chunks use level 1 scaling: 20 columns of 80px
+CHUNK_WIDTH = level_base_length(CHUNK_LEVEL_NUM)
+CHUNKS_AHEAD = 2     # Chunks kept generated ahead of the camera's right edge
+CHUNKS_BEHIND = 1    # Chunks kept behind the camera before eviction
+STITCH_CANDIDATES = 8
+
+# --- CHUNK DATA ---
+class Chunk:
+    """
+    One streamed world segment: a 20x20 VAE grid placed at world x offset `x`.
+    Game objects are attached by ChunkStream once the chunk enters the window.
+    """
+    def __init__(self, index, grid, level_data):
+        self.index = index
+        self.x = index * CHUNK_WIDTH
+        self.grid = grid
+        self.level_data = level_data
+        self.platforms = []
+        self.enemies = []
+        self.coins = []
+        self.decorations = []
+
+def edge_score(left_grid, right_grid):
+    """
+    How well `right_grid` continues `left_grid`: rows that are solid on both
+    sides of the seam count for, rows solid on only one side count against.
+    """
+    left_edge = np.array([row[-1] == 'W' for row in left_grid[:-1]])
+    right_edge = np.array([row[0] == 'W' for row in right_grid[:-1]])
+    return int((left_edge & right_edge).sum()) - int((left_edge ^ right_edge).sum())
+
+# --- BACKGROUND GENERATOR ---
+class ChunkGenerator(threading.Thread):
+    """
+    Decodes chunks ahead of time on a background thread with a resident model.
+    Each new chunk is the playable candidate whose left edge best matches the
+    previous chunk's right edge. Finished chunks wait in a bounded queue.
+    """
+    def __init__(self, model_path='vae_model_final.pth', buffer_size=CHUNKS_AHEAD + 1):
+        super().__init__(daemon=True)
+        self.model_path = model_path
+        self.chunks = queue.Queue(maxsize=buffer_size)
+        self.stopped = threading.Event()
+        self.generate_time = 0.0
+        self.generated = 0
+        self.error = None
+    def run(self):
+        try:
+            self.generate()
+        except Exception as e:
+            # Kept for the game loop to re-raise; it would otherwise wait forever on an empty queue
+            self.error = e
+    def next_chunk(self, poll=0.1):
+        # Wait for the next chunk, re-raising the thread's exception if it died
+        while True:
+            try:
+                return self.chunks.get(timeout=poll)
+            except queue.Empty:
+                if not self.is_alive():
+                    if self.error is not None:
+                        raise self.error
+                    raise RuntimeError("chunk generator stopped")
+    def generate(self):
+        model = load_vae_model(self.model_path, device=torch.device("cpu"))
+        previous = None
+        index = 0
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            grid = self.next_grid(model, previous)
+            level_data = convert_grid_to_game_format(grid, CHUNK_LEVEL_NUM) if grid else generate_fallback_level(CHUNK_LEVEL_NUM)
+            chunk = Chunk(index, grid, level_data)
+            self.generate_time += time.perf_counter() - start
+            self.generated += 1
+            while not self.stopped.is_set():
+                try:
+                    self.chunks.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            previous = grid
+            index += 1
+    def next_grid(self, model, previous):
+        if model is None:
+            return None
+        candidates, _ = sample_playable_grids(model, STITCH_CANDIDATES, CHUNK_LEVEL_NUM,
+                                              batch_size=STITCH_CANDIDATES, max_batches=2)
+        if not candidates:
+            candidates = [post_process_level(sample_level_grid(model))]
+        if previous is None:
+            return candidates[0]
+        return max(candidates, key=lambda grid: edge_score(previous, grid))
+    def stop(self):
+        self.stopped.set()
+
+# --- STREAMING WORLD ---
+class ChunkStream:
+    """
+    Keeps a fixed window of chunks around the camera. Chunks are pulled from the
+    generator as the camera approaches them and evicted, with all their entities
+    and surfaces, once they fall far enough behind.
+
+    `build_objects(level_data, x_offset)` turns chunk data into game objects and
+    returns (platforms, enemies, coins, decorations).
+    """
+    def __init__(self, build_objects, model_path='vae_model_final.pth', view_width=1200):
+        self.build_objects = build_objects
+        self.view_width = view_width
+        self.generator = ChunkGenerator(model_path)
+        self.generator.start()
+        self.active = []
+        self.evicted = 0
+        self.stall_time = 0.0
+        self.platforms = []
+        self.enemies = []
+        self.coins = []
+        self.decorations = []
+    def update(self, camera_x):
+        changed = False
+        # Evict chunks that are well behind the camera
+        while self.active and self.active[0].x + CHUNK_WIDTH < camera_x - CHUNKS_BEHIND * CHUNK_WIDTH:
+            chunk = self.active.pop(0)
+            chunk.platforms = chunk.enemies = chunk.coins = chunk.decorations = []
+            self.evicted += 1
+            changed = True
+        # Attach chunks until the window reaches far enough ahead
+        horizon = camera_x + self.view_width + CHUNKS_AHEAD * CHUNK_WIDTH
+        while not self.active or self.active[-1].x + CHUNK_WIDTH < horizon:
+            start = time.perf_counter()
+            chunk = self.generator.next_chunk()
+            self.stall_time += time.perf_counter() - start
+            chunk.platforms, chunk.enemies, chunk.coins, chunk.decorations = self.build_objects(chunk.level_data, chunk.x)
+            self.active.append(chunk)
+            changed = True
+        if changed:
+            self.platforms = [p for c in self.active for p in c.platforms]
+            self.enemies = [e for c in self.active for e in c.enemies]
+            self.coins = [coin for c in self.active for coin in c.coins]
+            self.decorations = [d for c in self.active for d in c.decorations]
+        return changed
+    def close(self):
+        self.generator.stop()
+
+# --- SOAK TEST ---
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def soak_test(chunks=300, frames_per_chunk=60, max_growth_mb=16.0):
+    """
+    Run a long headless endless session and check that RSS and per-frame cost stay flat.
+    The camera scrolls right at a fixed speed while the real stream, enemy
+    updates and draw calls run every frame.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import mustafa_super_bros as game
+
+    stream = ChunkStream(game.build_level_objects)
+    render_queue = RenderQueue()
+    step = CHUNK_WIDTH / frames_per_chunk
+    camera_x = 0.0
+    samples = []
+    frame_times = []
+    for frame in range(chunks * frames_per_chunk):
+        start = time.perf_counter()
+        stream.update(camera_x)
+        for enemy in stream.enemies:
+            enemy.update(stream.platforms)
+        for obj in stream.platforms + stream.enemies + stream.coins + stream.decorations:
+            obj.draw(render_queue, camera_x)
+        render_queue.flush(game.screen)
+        frame_times.append(time.perf_counter() - start)
+        camera_x += step
+        if frame % frames_per_chunk == 0:
+            samples.append(_rss_bytes())
+    stream.close()
+
+    warmup = max(1, len(samples) // 10)
+    baseline = np.median(samples[warmup:warmup * 2])
+    final = np.median(samples[-warmup:])
+    growth_mb = (final - baseline) / (1024 * 1024)
+    early = np.mean(frame_times[warmup * frames_per_chunk:warmup * 2 * frames_per_chunk]) * 1000
+    late = np.mean(frame_times[-warmup * frames_per_chunk:]) * 1000
+    print(f"Streamed {chunks} chunks ({chunks * CHUNK_WIDTH / 1000:.0f}k px), evicted {stream.evicted}, "
+          f"active {len(stream.active)}")
+    print(f"RSS: {baseline / 2**20:.1f} MB -> {final / 2**20:.1f} MB ({growth_mb:+.1f} MB)")
+    print(f"Frame cost: {early:.3f} ms early, {late:.3f} ms late; generator stalls {stream.stall_time * 1000:.1f} ms")
+    assert growth_mb < max_growth_mb, f"RSS grew by {growth_mb:.1f} MB during soak test"
+    return growth_mb
+
+if __name__ == "__main__":
+    soak_test(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
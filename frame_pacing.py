@@ -0,0 +1,215 @@
+import statistics
+import time
+from collections import deque
+
+import numpy as np
+
+# --- CONFIG ---
+MAX_FRAME_SKIP = 4        # Consecutive renders that may be skipped before one is forced
+MAX_LAG_MS = 250.0        # Further behind than this (a level build, a window drag) and the schedule resets
+BUSY_LOOP_SLACK_MS = 2.0  # Sleep overshoot above this and waits switch to spinning, like Clock.tick_busy_loop
+BUSY_LOOP_EXIT_MS = 1.0   # ...and back to sleeping once it is under this, so a borderline timer does not flip-flop
+PROBE_SLEEP_MS = 1.0      # In busy-loop mode, each wait still sleeps this long first to keep measuring overshoot
+OVERSLEEP_SAMPLES = 32    # Overshoot samples kept; a run of bad wake-ups ages out after this many waits
+OVERSLEEP_PERCENTILE = 90 # Overshoot taken as this percentile of the samples, so one stray wake-up is ignored
+HISTORY_FRAMES = 600      # Rolling window for the jitter statistics (10s at 60 FPS)
+
+# --- FRAME PACER ---
+class FramePacer:
+    """
+    Fixed-rate pacing for the game loop, replacing clock.tick(FPS).
+
+    Each loop iteration is one simulation tick. The loop calls begin_tick(),
+    runs the tick, draws and presents only if should_render() says so, then
+    calls end_tick(), which waits for the tick's deadline. Deadlines advance by
+    exactly one period, so a late frame does not push later ones back: while
+    behind, rendering is skipped (up to max_skip frames in a row) and ticks run
+    back to back until the loop catches up, so gameplay keeps its speed instead
+    of slowing down. A stall longer than MAX_LAG_MS resets the schedule rather
+    than fast-forwarding through it.
+
+    Waits sleep until just before the deadline and spin the rest. The margin
+    is a high percentile of how far sleep() has recently been overshooting; if
+    the OS timer is too coarse for that to work (margin above
+    BUSY_LOOP_SLACK_MS), waits spin, as Clock.tick_busy_loop does, after a
+    short probe sleep whose overshoot keeps the measurement current; once the
+    margin is back under BUSY_LOOP_EXIT_MS, waits sleep again. fps=0 disables
+    waiting and skipping.
+    """
+    def __init__(self, fps=60, max_skip=MAX_FRAME_SKIP, history=HISTORY_FRAMES):
+        self.max_skip = max_skip
+        self.history = history
+        self.reset(fps)
+    def reset(self, fps=None):
+        if fps is not None:
+            self.fps = fps
+            self.period = 1.0 / fps if fps else 0.0
+        self.deadline = None
+        self.tick_start = 0.0
+        self.skipped_in_row = 0
+        self.render_this_tick = True
+        self.oversleep = deque([0.0005], maxlen=OVERSLEEP_SAMPLES)
+        self.busy_loop = False
+        self.ticks = 0
+        self.rendered = 0
+        self.dropped = 0          # Ticks whose render was skipped to catch up
+        self.late = 0             # Ticks that finished after their deadline
+        self.resyncs = 0          # Stalls longer than MAX_LAG_MS
+        self.work_ms = deque(maxlen=self.history)
+        self.intervals_ms = deque(maxlen=self.history)
+        self.last_present = None
+    def begin_tick(self):
+        now = time.perf_counter()
+        self.tick_start = now
+        if self.deadline is None:
+            self.deadline = now
+        if not self.period:
+            self.render_this_tick = True
+            return
+        lag = now - self.deadline
+        if lag > MAX_LAG_MS / 1000:
+            self.resyncs += 1
+            self.deadline = now
+            lag = 0.0
+        # Behind by more than a frame: spend this tick on simulation only
+        self.render_this_tick = lag < self.period or self.skipped_in_row >= self.max_skip
+    def should_render(self):
+        return self.render_this_tick
+    def idle_ms(self):
+        # Time left before this tick's deadline; 0 when behind or unpaced
+        if not self.period or self.deadline is None:
+            return 0.0
+        return max(0.0, (self.deadline + self.period - time.perf_counter()) * 1000)
+    def end_tick(self):
+        now = time.perf_counter()
+        self.ticks += 1
+        self.work_ms.append((now - self.tick_start) * 1000)
+        if self.render_this_tick:
+            # The frame was presented just before end_tick(), so intervals run present to present
+            self.rendered += 1
+            self.skipped_in_row = 0
+            if self.last_present is not None:
+                self.intervals_ms.append((now - self.last_present) * 1000)
+            self.last_present = now
+        else:
+            self.dropped += 1
+            self.skipped_in_row += 1
+        if not self.period:
+            return
+        self.deadline += self.period
+        if now > self.deadline:
+            self.late += 1
+            return
+        self.wait_until(self.deadline)
+    def oversleep_margin(self):
+        samples = sorted(self.oversleep)
+        return samples[(len(samples) - 1) * OVERSLEEP_PERCENTILE // 100]
+    def wait_until(self, deadline):
+        margin = self.oversleep_margin()
+        if self.busy_loop:
+            self.busy_loop = margin * 1000 >= BUSY_LOOP_EXIT_MS
+        else:
+            self.busy_loop = margin * 1000 > BUSY_LOOP_SLACK_MS
+        remaining = deadline - time.perf_counter()
+        if self.busy_loop:
+            # Probe only when even a typical bad overshoot still makes the deadline
+            sleep_for = PROBE_SLEEP_MS / 1000 if remaining > PROBE_SLEEP_MS / 1000 + margin else 0.0
+        else:
+            sleep_for = remaining - margin if remaining > margin else 0.0
+        if sleep_for:
+            start = time.perf_counter()
+            time.sleep(sleep_for)
+            self.oversleep.append(max(0.0, time.perf_counter() - start - sleep_for))
+        while time.perf_counter() < deadline:
+            pass
+    # --- statistics ---
+    def stats(self):
+        """
+        Return dropped/late counts and, over the rolling window, presented
+        frame-interval percentiles and jitter (standard deviation of the
+        interval, and p95 distance from the target period), in milliseconds.
+        """
+        stats = {
+            'ticks': self.ticks,
+            'rendered': self.rendered,
+            'dropped': self.dropped,
+            'late': self.late,
+            'resyncs': self.resyncs,
+            'mode': 'busy loop' if self.busy_loop else 'sleep',
+        }
+        if self.work_ms:
+            stats['work_p95_ms'] = float(np.percentile(self.work_ms, 95))
+        if len(self.intervals_ms) >= 2:
+            intervals = np.array(self.intervals_ms)
+            stats['interval_p50_ms'] = float(np.percentile(intervals, 50))
+            stats['interval_p99_ms'] = float(np.percentile(intervals, 99))
+            stats['jitter_ms'] = float(intervals.std())
+            if self.period:
+                stats['jitter_p95_ms'] = float(np.percentile(np.abs(intervals - self.period * 1000), 95))
+        return stats
+    def report(self):
+        s = self.stats()
+        line = (f"{s['ticks']} ticks, {s['rendered']} rendered, {s['dropped']} dropped, {s['late']} late, "
+                f"{s['resyncs']} resyncs, waits by {s['mode']}")
+        if 'jitter_ms' in s:
+            line += (f"; frame interval p50 {s['interval_p50_ms']:.2f} / p99 {s['interval_p99_ms']:.2f} ms, "
+                     f"jitter {s['jitter_ms']:.2f} ms")
+        return line
+
+def test_pacing(fps=60, seconds=2.0, overload=1.5):
+    """
+    Run the pacer against a synthetic loop: first light work, then work
+    costing `overload` frame periods per tick. Ticks per second should stay at
+    `fps` in both, with renders dropped only under overload.
+    """
+    period = 1.0 / fps
+    for label, work in (('light', period * 0.2), ('overloaded', period * overload)):
+        pacer = FramePacer(fps)
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            pacer.begin_tick()
+            tick_end = time.perf_counter() + work * 0.1
+            while time.perf_counter() < tick_end:
+                pass
+            if pacer.should_render():
+                # Rendering is the expensive part, as in the game
+                time.sleep(work * 0.9)
+            pacer.end_tick()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>10}: {pacer.ticks / elapsed:.1f} ticks/s, {pacer.rendered / elapsed:.1f} frames/s, "
+              f"median work {statistics.median(pacer.work_ms):.1f} ms")
+        print(f"{'':>10}  {pacer.report()}")
+    # A run of late wake-ups switches waits to spinning; they must go back to sleeping once it ages out.
+    # sleep() is replaced by exact spins throughout, so the OS timer cannot make this flaky.
+    pacer = FramePacer(fps)
+    real_sleep = time.sleep
+    overshoot = 0.0
+    def stub_sleep(seconds):
+        wake = time.perf_counter() + seconds + overshoot
+        while time.perf_counter() < wake:
+            pass
+    time.sleep = stub_sleep
+    try:
+        overshoot = 0.005
+        pacer.begin_tick()
+        pacer.end_tick()
+        overshoot = 0.0
+        pacer.begin_tick()
+        pacer.end_tick()
+        assert not pacer.busy_loop, "a single 5 ms oversleep should not switch waits to spinning"
+        overshoot = 0.005
+        for _ in range(OVERSLEEP_SAMPLES // 4):
+            pacer.begin_tick()
+            pacer.end_tick()
+        assert pacer.busy_loop, "repeated 5 ms oversleeps should switch waits to spinning"
+        overshoot = 0.0
+        for _ in range(OVERSLEEP_SAMPLES * 2):
+            pacer.begin_tick()
+            pacer.end_tick()
+    finally:
+        time.sleep = real_sleep
+    assert pacer.stats()['mode'] == 'sleep', "waits stayed in busy-loop mode after the late wake-ups aged out"
+    print(f"{'recovery':>10}: busy loop after repeated 5 ms oversleeps, back to sleep within {OVERSLEEP_SAMPLES * 2} ticks")
+
+if __name__ == "__main__":
+    test_pacing()
@@ -0,0 +1,223 @@
+import gc
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+# --- CONFIG ---
+GEN0_BUDGET = 2000        # Net container allocations before a young collection is scheduled
+GEN0_HARD_LIMIT = 20000   # Collect now, idle or not, past this many; bounds memory if no frame is idle
+MIN_IDLE_MS = 2.0         # Frame slack needed to run a scheduled young collection
+HISTORY_PAUSES = 240
+PLAY_REASONS = ('idle', 'forced', 'automatic')   # Collections that happen while a level is being played
+ALLOC_TOP_SITES = 5
+
+# --- GC CONTROL ---
+class GCController:
+    """
+    Moves CPython's cyclic garbage collection out of the middle of frames.
+
+    start() turns off automatic collection for the play loop. After a level is
+    built, level_loaded() collects once and gc.freeze()s everything that
+    survives (sprites, compiled level, world objects), so later collections
+    never traverse it. Each frame, end_frame() runs a young collection only
+    when enough allocations have piled up and the frame has idle time left
+    before its deadline, or unconditionally past GEN0_HARD_LIMIT; full
+    collections wait for transitions (level complete, game over). Every
+    collection, scheduled or not, is timed through gc.callbacks and reported
+    to the profiler as a 'gc' phase.
+    """
+    def __init__(self, profiler=None, gen0_budget=GEN0_BUDGET, hard_limit=GEN0_HARD_LIMIT):
+        self.profiler = profiler
+        self.gen0_budget = gen0_budget
+        self.hard_limit = hard_limit
+        self.enabled = True       # False leaves automatic collection alone; pauses are then not timed either
+        self.active = False
+        self.was_enabled = True
+        self.pauses = deque(maxlen=HISTORY_PAUSES)   # (generation, ms, reason)
+        self.collections = [0, 0, 0]
+        self.pause_total_ms = 0.0
+        self.scheduled = 0
+        self.forced = 0
+        self.unscheduled = 0      # Automatic collections, i.e. ones that could land mid-frame
+        self.unscheduled_max_ms = 0.0
+        self.play_pause_max_ms = 0.0   # Over every in-play collection, like unscheduled_max_ms
+        self.frozen = 0
+        self.in_transition = False
+        self._reason = 'automatic'
+        self._start = 0.0
+    def start(self):
+        if self.active or not self.enabled:
+            return
+        self.was_enabled = gc.isenabled()
+        gc.disable()
+        gc.callbacks.append(self._on_gc)
+        self.active = True
+    def stop(self):
+        if not self.active:
+            return
+        gc.callbacks.remove(self._on_gc)
+        gc.unfreeze()
+        if self.was_enabled:
+            gc.enable()
+        self.active = False
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter()
+            return
+        end = time.perf_counter()
+        generation = info['generation']
+        ms = (end - self._start) * 1000
+        self.collections[generation] += 1
+        self.pause_total_ms += ms
+        self.pauses.append((generation, ms, self._reason))
+        if self._reason == 'automatic':
+            self.unscheduled += 1
+            self.unscheduled_max_ms = max(self.unscheduled_max_ms, ms)
+        if self._reason in PLAY_REASONS:
+            self.play_pause_max_ms = max(self.play_pause_max_ms, ms)
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.record('gc', self._start, end)
+    def _collect(self, generation, reason):
+        self._reason = reason
+        try:
+            gc.collect(generation)
+        finally:
+            self._reason = 'automatic'
+    # --- scheduling ---
+    def level_loaded(self):
+        if not self.active:
+            return
+        # Unfreeze first so the previous level's objects can be collected with this pass
+        gc.unfreeze()
+        self._collect(2, 'level load')
+        gc.freeze()
+        self.frozen = gc.get_freeze_count()
+    def end_frame(self, idle_ms, transition=False):
+        if not self.active:
+            return
+        if transition and not self.in_transition:
+            self._collect(2, 'transition')
+            self.scheduled += 1
+        self.in_transition = transition
+        pending = gc.get_count()[0]
+        if pending > self.hard_limit:
+            self._collect(1, 'forced')
+            self.forced += 1
+        elif pending > self.gen0_budget and idle_ms >= MIN_IDLE_MS:
+            self._collect(0, 'idle')
+            self.scheduled += 1
+    # --- reporting ---
+    def stats(self):
+        stats = {
+            'collections': list(self.collections),
+            'scheduled': self.scheduled,
+            'forced': self.forced,
+            'unscheduled': self.unscheduled,
+            'unscheduled_max_ms': self.unscheduled_max_ms,
+            'frozen_objects': self.frozen,
+            'pause_total_ms': self.pause_total_ms,
+        }
+        # The median is over the recent pauses only; the max, like unscheduled_max_ms, over all of them
+        in_play = [ms for _, ms, reason in self.pauses if reason in PLAY_REASONS]
+        if in_play:
+            stats['play_pause_p50_ms'] = float(np.percentile(in_play, 50))
+            stats['play_pause_max_ms'] = self.play_pause_max_ms
+        return stats
+    def report(self):
+        s = self.stats()
+        line = (f"gc: {sum(s['collections'])} collections (gen0/1/2 {'/'.join(map(str, s['collections']))}), "
+                f"{s['scheduled']} scheduled, {s['forced']} forced, {s['unscheduled']} automatic "
+                f"(max {s['unscheduled_max_ms']:.2f} ms), {s['pause_total_ms']:.1f} ms paused, "
+                f"{s['frozen_objects']} objects frozen")
+        if 'play_pause_max_ms' in s:
+            line += (f"; in-play pause p50 {s['play_pause_p50_ms']:.2f} (last {HISTORY_PAUSES}) "
+                     f"/ max {s['play_pause_max_ms']:.2f} ms")
+        return line
+
+# --- ALLOCATION SAMPLING ---
+class AllocationSampler:
+    """
+    Traces allocations on one frame in every `every` with tracemalloc, so the
+    cost of tracing is paid only on sampled frames. For a sampled frame it
+    keeps the peak bytes allocated during the frame, the blocks and bytes still
+    alive at its end, and the source lines that allocated the most of them.
+    Surviving blocks are what a per-frame leak or per-frame cache miss looks
+    like; the peak also covers short-lived garbage (temporary lists, surfaces).
+    """
+    def __init__(self, every=120, profiler=None, top=ALLOC_TOP_SITES):
+        self.every = every
+        self.profiler = profiler
+        self.top = top
+        self.frame_index = 0
+        self.sampling = False
+        self.samples = deque(maxlen=64)   # (frame, blocks, bytes, peak bytes)
+        self.top_sites = []
+    def begin_frame(self):
+        self.frame_index += 1
+        if not self.every or self.frame_index % self.every or tracemalloc.is_tracing():
+            return
+        tracemalloc.start(1)
+        self.sampling = True
+    def end_frame(self):
+        if not self.sampling:
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.sampling = False
+        statistics = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )).statistics('lineno')
+        blocks = sum(stat.count for stat in statistics)
+        size = sum(stat.size for stat in statistics)
+        self.samples.append((self.frame_index, blocks, size, peak))
+        self.top_sites = [(f"{stat.traceback[0].filename.rsplit('/', 1)[-1]}:{stat.traceback[0].lineno}",
+                           stat.count, stat.size) for stat in sorted(statistics, key=lambda s: -s.count)[:self.top]]
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.count('allocs/frame', blocks)
+            self.profiler.count('alloc peak KB', round(peak / 1024, 1))
+    def report(self):
+        if not self.samples:
+            return "allocations: no frames sampled"
+        blocks = [s[1] for s in self.samples]
+        peaks = [s[3] for s in self.samples]
+        lines = [f"allocations over {len(self.samples)} sampled frames: median {int(np.median(blocks))} blocks "
+                 f"alive at frame end, median peak {np.median(peaks) / 1024:.1f} KB per frame"]
+        lines.extend(f"  {site:<32}{count:>7} blocks {size / 1024:>8.1f} KB" for site, count, size in self.top_sites)
+        return '\n'.join(lines)
+
+def test_gc_control(frames=600, garbage=400):
+    """
+    Allocate reference cycles every frame, once with automatic collection and
+    once with GCController scheduling young collections into idle time, and
+    compare how many collections land in the middle of a frame.
+    """
+    class Node:
+        def __init__(self):
+            self.ref = self
+    live = [Node() for _ in range(200000)]  # A loaded level's worth of long-lived objects
+    for label in ('automatic', 'controlled'):
+        controller = GCController()
+        if label == 'controlled':
+            controller.start()
+            controller.level_loaded()
+        else:
+            gc.callbacks.append(controller._on_gc)
+        start = time.perf_counter()
+        for i in range(frames):
+            for _ in range(garbage):
+                Node()
+            controller.end_frame(idle_ms=8.0 if i % 2 else 0.0)
+        elapsed = time.perf_counter() - start
+        if label == 'controlled':
+            controller.stop()
+        else:
+            gc.callbacks.remove(controller._on_gc)
+        print(f"{label:>10}: {elapsed * 1000:.0f} ms, {controller.report()}")
+    del live
+
+if __name__ == "__main__":
+    test_gc_control()
@@ -0,0 +1,255 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+
+import torch
+
+from level_index import LevelIndex
+from vae_sample import (load_vae_model, sample_level_grid, sample_playable_grids, post_process_level,
+                        convert_grid_to_game_format, generate_fallback_level)
+
+# --- CONFIG ---
+DEDUPE_BATCH = 512   # Finished levels embedded and checked together in the parent with --dedupe
+
+# --- WORKER STATE ---
+# Each pool process loads the VAE exactly once and keeps it resident.
+_worker_model = None
+_worker_validate = False
+
+def _init_worker(model_path, torch_threads, validate=False):
+    """
+    Pool initializer: pin torch to a few threads and load the model once per process.
+    """
+    global _worker_model, _worker_validate
+    torch.set_num_threads(torch_threads)
+    _worker_validate = validate
+    _worker_model = load_vae_model(model_path, device=torch.device("cpu"))
+
+def _generate_one(task):
+    """
+    Generate a single level inside a worker process.
+    Seeding per level (not per worker) keeps output independent of --workers.
+    """
+    index, seed, level_num = task
+    start = time.perf_counter()
+    random.seed(seed)
+    torch.manual_seed(seed)
+    sampled = accepted = 1
+    if _worker_model is None:
+        grid = None
+        level_data = generate_fallback_level(level_num)
+    else:
+        grid = None
+        if _worker_validate:
+            # Rejection-sample until the reachability validator accepts a grid
+            grids, stats = sample_playable_grids(_worker_model, 1, level_num, batch_size=4)
+            sampled, accepted = stats['sampled'], stats['accepted']
+            grid = grids[0] if grids else None
+        if grid is None:
+            grid = post_process_level(sample_level_grid(_worker_model))
+        level_data = convert_grid_to_game_format(grid, level_num)
+    return index, grid, level_data, (sampled, accepted), time.perf_counter() - start
+
+# --- WRITER STAGE ---
+class LevelWriter(threading.Thread):
+    """
+    Drains finished levels from a bounded queue and writes them to disk,
+    so file I/O overlaps with generation instead of blocking it.
+    """
+    def __init__(self, out_queue, output_dir, fmt):
+        super().__init__(daemon=True)
+        self.out_queue = out_queue
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.write_time = 0.0
+        self.written = 0
+        self.no_grid = 0          # Fallback levels (no model) that have no grid to write in 'grid' format
+        self.error = None
+    def run(self):
+        jsonl_file = None
+        try:
+            if self.fmt == 'jsonl':
+                jsonl_file = open(os.path.join(self.output_dir, 'generated_levels.jsonl'), 'w')
+            while True:
+                item = self.out_queue.get()
+                if item is None:
+                    break
+                index, grid, level_data = item
+                start = time.perf_counter()
+                if self.fmt == 'json':
+                    with open(os.path.join(self.output_dir, f'generated_level_{index+1}.json'), 'w') as f:
+                        json.dump(level_data, f, indent=2)
+                elif self.fmt == 'jsonl':
+                    jsonl_file.write(json.dumps({'index': index, 'level': level_data}) + '\n')
+                elif self.fmt == 'grid':
+                    if grid is None:
+                        self.no_grid += 1
+                        continue
+                    with open(os.path.join(self.output_dir, f'generated_level_{index+1}.txt'), 'w') as f:
+                        f.write('\n'.join(''.join(row) for row in grid) + '\n')
+                self.write_time += time.perf_counter() - start
+                self.written += 1
+        except Exception as e:
+            self.error = e
+            # Keep draining so the producer never blocks on a dead writer
+            while self.out_queue.get() is not None:
+                pass
+        finally:
+            if jsonl_file:
+                jsonl_file.close()
+
+# --- BULK GENERATION ---
+def generate_levels_parallel(count, workers=None, seed=0, output_dir='generated_levels', fmt='json',
+                             model_path='vae_model_final.pth', level_num=None, queue_size=64, chunksize=4,
+                             validate=False, dedupe=False, index_path=None, max_rounds=5):
+    """
+    Generate `count` levels on a process pool and stream them to a writer thread.
+    With `dedupe`, finished levels are embedded in the parent in batches of
+    DEDUPE_BATCH and checked against a LevelIndex (loaded from and saved to
+    `index_path` if given); near-duplicates are regenerated with fresh seeds
+    for up to `max_rounds` rounds, after which whatever is left is kept.
+    Results are then consumed in task order so the output does not depend on
+    --workers.
+    Returns a dict of timing statistics.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(i, seed + i, level_num if level_num is not None else i + 1) for i in range(count)]
+    index = model = None
+    if dedupe:
+        model = load_vae_model(model_path, device=torch.device("cpu"))
+        if index_path and os.path.exists(os.path.join(index_path, 'index.json')):
+            index = LevelIndex.load(index_path)
+        else:
+            index = LevelIndex()
+
+    out_queue = queue.Queue(maxsize=queue_size)
+    writer = LevelWriter(out_queue, output_dir, fmt)
+    writer.start()
+
+    gen_time = 0.0
+    enqueue_wait = 0.0
+    sampled_total = accepted_total = 0
+    duplicates = rounds = n = 0
+    dedupe_time = 0.0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(model_path, 1, validate)) as pool:
+        pool_ready = time.perf_counter()
+        while tasks:
+            rounds += 1
+            retry = []
+            results = (pool.imap if index is not None else pool.imap_unordered)(_generate_one, tasks, chunksize=chunksize)
+            batch = []
+            for position, (result, task) in enumerate(zip(results, tasks)):
+                level_index, grid, level_data, (sampled, accepted), elapsed = result
+                gen_time += elapsed
+                sampled_total += sampled
+                accepted_total += accepted
+                batch.append((level_index, grid, level_data, task))
+                if index is None or model is None:
+                    keep = [True]
+                elif len(batch) < DEDUPE_BATCH and position < len(tasks) - 1:
+                    continue
+                else:
+                    # Embed and check the whole batch at once; fallback levels have no grid to embed
+                    dedupe_start = time.perf_counter()
+                    keep = [True] * len(batch)
+                    embedded = [i for i, item in enumerate(batch) if item[1] is not None]
+                    if embedded:
+                        grids = [batch[i][1] for i in embedded]
+                        vectors = index.embed(model, grids)
+                        if rounds < max_rounds:
+                            for i, novel in zip(embedded, index.add_novel(vectors, grids)):
+                                keep[i] = bool(novel)
+                        else:
+                            index.add(vectors, grids)
+                    dedupe_time += time.perf_counter() - dedupe_start
+                for (level_index, grid, level_data, task), kept in zip(batch, keep):
+                    if not kept:
+                        # Regenerate this slot with a seed no first-round level uses
+                        duplicates += 1
+                        retry.append((level_index, seed + count * rounds + level_index, task[2]))
+                        continue
+                    put_start = time.perf_counter()
+                    out_queue.put((level_index, grid, level_data))
+                    enqueue_wait += time.perf_counter() - put_start
+                    n += 1
+                    if n % max(1, count // 10) == 0:
+                        print(f"Generated {n}/{count} levels...")
+                batch = []
+            tasks = retry
+            if retry:
+                print(f"Regenerating {len(retry)} near-duplicate levels...")
+    if index is not None and index_path:
+        index.save(index_path)
+    out_queue.put(None)
+    writer.join()
+    total = time.perf_counter() - start
+    if writer.error:
+        raise writer.error
+
+    return {
+        'count': count,
+        'workers': workers,
+        'total_time': total,
+        'startup_time': pool_ready - start,
+        'generate_time': gen_time,
+        'write_time': writer.write_time,
+        'no_grid': writer.no_grid,
+        'queue_wait_time': enqueue_wait,
+        'levels_per_second': count / total if total > 0 else 0.0,
+        'sampled': sampled_total,
+        'acceptance_rate': accepted_total / sampled_total if sampled_total else 0.0,
+        'duplicates': duplicates,
+        'rounds': rounds,
+        'dedupe_time': dedupe_time,
+    }
+
+def print_stats(stats):
+    print(f"Generated {stats['count']} levels with {stats['workers']} workers in {stats['total_time']:.2f}s "
+          f"({stats['levels_per_second']:.1f} levels/s)")
+    print(f"  pool startup:        {stats['startup_time']:.3f}s")
+    print(f"  generate (sum):      {stats['generate_time']:.3f}s "
+          f"({stats['generate_time'] / max(1, stats['count']) * 1000:.2f} ms/level)")
+    print(f"  write (writer):      {stats['write_time']:.3f}s")
+    if stats['no_grid']:
+        print(f"  no grid to write:    {stats['no_grid']} fallback levels skipped")
+    print(f"  queue backpressure:  {stats['queue_wait_time']:.3f}s")
+    if stats['sampled'] > stats['count']:
+        print(f"  acceptance rate:     {stats['acceptance_rate']:.1%} ({stats['sampled']} grids sampled)")
+    if stats['duplicates']:
+        print(f"  near-duplicates:     {stats['duplicates']} regenerated over {stats['rounds']} rounds "
+              f"({stats['dedupe_time']:.3f}s embedding and search)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-generate VAE levels on all CPU cores.")
+    parser.add_argument('--count', type=int, default=100, help="number of levels to generate")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=0, help="base seed; level i uses seed + i")
+    parser.add_argument('--format', choices=['json', 'jsonl', 'grid'], default='json', dest='fmt',
+                        help="json: one file per level, jsonl: one combined file, grid: raw 20x20 text")
+    parser.add_argument('--output', default='generated_levels', help="output directory")
+    parser.add_argument('--model', default='vae_model_final.pth', help="path to the VAE weights")
+    parser.add_argument('--level-num', type=int, default=None,
+                        help="level number used for length scaling (default: index + 1)")
+    parser.add_argument('--queue-size', type=int, default=64, help="bounded writer queue size")
+    parser.add_argument('--validate', action='store_true',
+                        help="rejection-sample levels until they pass the reachability validator")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="regenerate levels whose VAE embedding is too close to one already generated")
+    parser.add_argument('--index', default=None,
+                        help="level index directory to check against and extend (implies --dedupe)")
+    args = parser.parse_args()
+
+    stats = generate_levels_parallel(args.count, args.workers, args.seed, args.output, args.fmt,
+                                     args.model, args.level_num, args.queue_size, validate=args.validate,
+                                     dedupe=args.dedupe or args.index is not None, index_path=args.index)
+    print_stats(stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import json
+import os
+
+# --- CONFIG ---
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels')
+BLOCK_GAP = 24
+BLOCK_SIZE = 48
+
+# --- COMPILED LEVEL ---
+class CompiledLevel:
+    """
+    Ready-to-instantiate form of a level definition.
+
+    Every list holds plain tuples with sprite paths already resolved, platforms
+    already split around water and blocks already placed, so building the game
+    objects is a straight loop. Lock and key colours are left open and filled
+    in at instantiation, since they are rolled on every load.
+    """
+    def __init__(self, level_num, ground_y, ground_length, has_lock, platforms, enemies, coins,
+                 decorations, water_tiles, lava_tiles, locks, coin_blocks, exclamation_blocks, flag):
+        self.level_num = level_num
+        self.ground_y = ground_y
+        self.ground_length = ground_length
+        self.has_lock = has_lock
+        self.platforms = platforms                    # (x, y, w, h, platform_type, sprite_path)
+        self.enemies = enemies                        # (x, y, enemy_type)
+        self.coins = coins                            # (x, y)
+        self.decorations = decorations                # (sprite_path, x, y, w, h)
+        self.water_tiles = water_tiles                # (x, y, w, h, top)
+        self.lava_tiles = lava_tiles                  # (x, y, w, h, top)
+        self.locks = locks                            # (x, y)
+        self.coin_blocks = coin_blocks                # (x, y)
+        self.exclamation_blocks = exclamation_blocks  # (x, y)
+        self.flag = flag                              # (x, y)
+
+# --- COMPILE PASSES ---
+def split_platforms_around_water(platforms, water_tiles):
+    """
+    Split any platform that overlaps a water tile horizontally at the same y.
+    """
+    new_platforms = []
+    for p in platforms:
+        x, y, w, h, platform_type = p
+        overlap = False
+        for wx, wy, ww, wh, _ in water_tiles:
+            if y == wy and x < wx + ww and x + w > wx:
+                overlap = True
+                # Left segment (if any)
+                if x < wx:
+                    new_platforms.append((x, y, wx - x, h, platform_type))
+                # Right segment (if any)
+                if x + w > wx + ww:
+                    new_platforms.append((wx + ww, y, (x + w) - (wx + ww), h, platform_type))
+                break
+        if not overlap:
+            new_platforms.append(p)
+    return new_platforms
+
+def place_blocks(platforms, has_lock):
+    """
+    Place blocks above platforms, always centered, never stacked or overlapped.
+    The first suitable platform gets the exclamation block when the level has a lock.
+    Returns (coin_blocks, exclamation_blocks).
+    """
+    coin_blocks = []
+    exclamation_blocks = []
+    block_platforms = [p for p in platforms if p[4] in ('stone', 'wood') and p[2] >= 48]
+    block_platforms.sort(key=lambda p: (p[1], p[0]))  # deterministic order
+    ex_block_placed = False
+    for x, y, w, h, _ in block_platforms:
+        block_y = y - 72 - BLOCK_GAP - 8  # Add 8px gap above platform
+        if block_y <= 0:
+            continue
+        if has_lock and not ex_block_placed:
+            # Place both blocks side by side if possible
+            if w >= 96:
+                start_x = x + w // 2 - 48
+                coin_blocks.append((start_x, block_y))
+                exclamation_blocks.append((start_x + BLOCK_SIZE, block_y))
+            else:
+                # Only exclamation block, centered
+                exclamation_blocks.append((x + w // 2 - 24, block_y))
+            ex_block_placed = True
+            continue
+        # Otherwise, only coin block, centered
+        coin_blocks.append((x + w // 2 - 24, block_y))
+    return coin_blocks, exclamation_blocks
+
+def resolve_sprite(path):
+    # Sprite paths are resolved once here; missing files fall back to a colored box at load time
+    return path if os.path.exists(path) else None
+
+def compile_level(definition, level_num, platform_sprites):
+    """
+    Compile a level definition dict (the vae_sample level format plus
+    'water', 'lava', 'locks' and 'lock') into a CompiledLevel.
+    `platform_sprites` maps platform types to sprite paths.
+    """
+    ground_y = definition['ground_y']
+    ground_length = definition['ground_length']
+    has_lock = definition.get('lock', False)
+    water_tiles = [(x, y, w, h, True) for x, y, w, h in definition.get('water', [])]
+    lava_tiles = [(x, y, w, h, True) for x, y, w, h in definition.get('lava', [])]
+
+    platforms = [(0, ground_y, ground_length, 100, "grass")]
+    platforms.extend(tuple(p) for p in definition['platforms'])
+    platforms = split_platforms_around_water(platforms, water_tiles)
+    coin_blocks, exclamation_blocks = place_blocks(platforms, has_lock)
+    fallback_sprite = platform_sprites['grass']
+    platforms = [(x, y, w, h, t, resolve_sprite(platform_sprites.get(t, fallback_sprite)))
+                 for x, y, w, h, t in platforms]
+
+    flag = tuple(definition.get('flag', (ground_length - 100, ground_y - 64)))
+    return CompiledLevel(
+        level_num, ground_y, ground_length, has_lock, platforms,
+        [tuple(e) for e in definition.get('enemies', [])],
+        [tuple(c) for c in definition.get('coins', [])],
+        [(resolve_sprite(path), x, y, w, h) for path, x, y, w, h in definition.get('decorations', [])],
+        water_tiles, lava_tiles,
+        [tuple(lock) for lock in definition.get('locks', [])],
+        coin_blocks, exclamation_blocks, flag)
+
+# --- CACHE ---
+_compiled_levels = {}
+
+def clear_compiled_levels():
+    _compiled_levels.clear()
+
+def level_definition_path(level_num):
+    return os.path.join(LEVELS_DIR, f'level_{level_num}.json')
+
+def has_level_definition(level_num):
+    return os.path.exists(level_definition_path(level_num))
+
+def get_compiled_level(level_num, platform_sprites):
+    """
+    Load and compile levels/level_<n>.json, caching the result in memory so
+    reloading or restarting a level skips parsing and every compile pass.
+    """
+    compiled = _compiled_levels.get(level_num)
+    if compiled is None:
+        with open(level_definition_path(level_num)) as f:
+            definition = json.load(f)
+        compiled = compile_level(definition, level_num, platform_sprites)
+        _compiled_levels[level_num] = compiled
+    return compiled
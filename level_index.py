@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+import torch
+
+from vae_sample import load_vae_model, post_process_level, sample_level_grids
+
+# --- CONFIG ---
+LATENT_DIM = 32
+ENCODE_BATCH = 4096
+CALIBRATION_SAMPLES = 4096
+# Near-duplicate candidate radius in whitened latent units. Grids 2-4 cells apart usually fall
+# inside it, but so does some neighbour of most new levels once the index holds thousands of
+# distinct layouts (those nearest neighbours still differ in 16-39 of 400 cells), so the radius
+# only picks candidates and the wall grids decide
+DUPLICATE_DISTANCE = 2.5
+DUPLICATE_CELLS = 6       # Candidates differing in at most this many wall cells are duplicates (random pairs: ~37)
+DUPLICATE_CANDIDATES = 16 # Nearest neighbours checked cell by cell per query
+SEARCH_CHUNK = 65536      # Index rows scored per matrix product, bounding temporary memory
+QUERY_CHUNK = 64          # Queries scored together; with SEARCH_CHUNK this caps the distance block at 16 MB
+
+# --- ENCODING ---
+def grids_to_array(grids):
+    """
+    Flatten 20x20 grids ('W' wall cells, or a (n, 20, 20) boolean array) into
+    the (n, 400) float32 input the VAE was trained on.
+    """
+    if isinstance(grids, np.ndarray):
+        return grids.reshape(len(grids), -1).astype(np.float32)
+    return np.array([[cell == 'W' for row in grid for cell in row] for grid in grids], dtype=np.float32)
+
+def encode_grids(model, grids, batch_size=ENCODE_BATCH):
+    """
+    Encode grids to their latent means `mu` (n, 32) in batches.
+    """
+    x = grids_to_array(grids)
+    device = next(model.parameters()).device
+    out = np.empty((len(x), LATENT_DIM), dtype=np.float32)
+    with torch.no_grad():
+        for start in range(0, len(x), batch_size):
+            mu, _ = model.encode(torch.from_numpy(x[start:start + batch_size]).to(device))
+            out[start:start + batch_size] = mu.cpu().numpy()
+    return out
+
+def sample_grids(model, count, generator=None, rng=random):
+    # Decoded and post-processed grids as the game gets them, from the given (or global) RNGs
+    walls = sample_level_grids(model, count, generator=generator)
+    return [post_process_level([['W' if wall else ' ' for wall in row] for row in grid], rng) for grid in walls]
+
+def pack_grids(grids):
+    # 400 wall bits per grid -> 50 bytes, for storage and exact-duplicate checks
+    return np.packbits(grids_to_array(grids).astype(bool), axis=1)
+
+def cell_differences(a, b):
+    # Wall cells that differ between packed grids, broadcasting over leading axes
+    return np.unpackbits(np.bitwise_xor(a, b), axis=-1).sum(axis=-1)
+
+def unpack_grid(packed):
+    walls = np.unpackbits(packed)[:400].reshape(20, 20)
+    return [['W' if wall else ' ' for wall in row] for row in walls]
+
+# --- INDEX ---
+class LevelIndex:
+    """
+    Latent embeddings of generated levels for duplicate rejection and
+    "levels like this one" queries.
+
+    Each level is stored as its VAE encoder mean, whitened with the per-dim
+    mean and spread of the generator's own output (the raw means are squeezed
+    into a narrow band, so plain distances barely separate different layouts),
+    plus its packed wall grid. Vectors live in one growable float32 matrix;
+    queries are exact brute-force nearest neighbours, one matrix product per
+    chunk of rows, which stays around a millisecond at 100k levels. A level
+    is a near-duplicate of a latent neighbour only if their wall grids also
+    differ in a handful of cells. save() writes .npy files that load() can
+    memory-map.
+    """
+    def __init__(self, mean=None, std=None, capacity=1024):
+        self.mean = mean
+        self.std = std
+        self.count = 0
+        self.next_id = 0          # Ids only ever increase, so they stay unique across saves and reloads
+        self.vectors = np.empty((capacity, LATENT_DIM), dtype=np.float32)
+        self.sq_norms = np.empty(capacity, dtype=np.float32)
+        self.grids = np.empty((capacity, 50), dtype=np.uint8)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.exact = {}           # Packed grid bytes -> id
+    def __len__(self):
+        return self.count
+    # --- embedding ---
+    def calibrate(self, model, samples=CALIBRATION_SAMPLES):
+        # Whitening statistics from a fixed sample of generated levels, drawn from private RNGs so
+        # the global ones are never touched (this can run on a service thread during play)
+        grids = sample_grids(model, samples, torch.Generator().manual_seed(0), random.Random(0))
+        mu = encode_grids(model, grids)
+        self.mean = mu.mean(axis=0)
+        self.std = mu.std(axis=0) + 1e-6
+    def embed(self, model, grids):
+        if self.mean is None:
+            self.calibrate(model)
+        return (encode_grids(model, grids) - self.mean) / self.std
+    # --- storage ---
+    def _reserve(self, extra):
+        needed = self.count + extra
+        if needed <= len(self.vectors):
+            return
+        capacity = max(needed, 2 * len(self.vectors))
+        for name in ('vectors', 'sq_norms', 'grids', 'ids'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+    def add(self, vectors, grids):
+        # Store levels under new ids, which are returned
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        ids = np.arange(self.next_id, self.next_id + n)
+        packed = pack_grids(grids)
+        self._reserve(n)
+        end = self.count + n
+        self.vectors[self.count:end] = vectors
+        self.sq_norms[self.count:end] = (vectors * vectors).sum(axis=1)
+        self.grids[self.count:end] = packed
+        self.ids[self.count:end] = ids
+        for row, level_id in zip(packed, ids):
+            self.exact.setdefault(row.tobytes(), int(level_id))
+        self.count = end
+        self.next_id += n
+        return ids
+    # --- queries ---
+    def search(self, queries, k=1):
+        """
+        Return (distances, ids), both (n, k), of the k nearest stored levels to
+        each query vector, nearest first. Missing neighbours have distance inf
+        and id -1.
+        """
+        distances, rows = self.search_rows(queries, k)
+        return distances, np.where(rows >= 0, self.ids[np.maximum(rows, 0)], -1)
+    def search_rows(self, queries, k=1):
+        # As search(), but returning storage rows (-1 if missing) instead of ids
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(queries) > QUERY_CHUNK:
+            parts = [self.search_rows(queries[i:i + QUERY_CHUNK], k) for i in range(0, len(queries), QUERY_CHUNK)]
+            return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+        n = len(queries)
+        best_d = np.full((n, k), np.inf, dtype=np.float32)
+        best_i = np.full((n, k), -1, dtype=np.int64)
+        q_norms = (queries * queries).sum(axis=1)[:, None]
+        for start in range(0, self.count, SEARCH_CHUNK):
+            end = min(self.count, start + SEARCH_CHUNK)
+            d2 = q_norms - 2 * queries @ self.vectors[start:end].T + self.sq_norms[start:end]
+            kk = min(k, end - start)
+            part = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+            cand_d = np.concatenate([best_d, np.take_along_axis(d2, part, axis=1)], axis=1)
+            cand_i = np.concatenate([best_i, part + start], axis=1)
+            order = np.argsort(cand_d, axis=1)[:, :k]
+            best_d = np.take_along_axis(cand_d, order, axis=1)
+            best_i = np.take_along_axis(cand_i, order, axis=1)
+        return np.sqrt(np.maximum(best_d, 0)), best_i
+    def is_novel(self, vectors, grids, threshold=DUPLICATE_DISTANCE, max_cells=DUPLICATE_CELLS):
+        """
+        Per vector: True unless one of its DUPLICATE_CANDIDATES nearest stored
+        levels is within `threshold` in latent space and its wall grid differs
+        in at most `max_cells` cells (or is identical).
+        """
+        packed = pack_grids(grids)
+        if not self.count:
+            return np.ones(len(packed), dtype=bool)
+        distances, rows = self.search_rows(vectors, DUPLICATE_CANDIDATES)
+        cells = cell_differences(self.grids[np.maximum(rows, 0)], packed[:, None])
+        duplicate = ((rows >= 0) & (distances <= threshold) & (cells <= max_cells)).any(axis=1)
+        return ~duplicate & np.array([row.tobytes() not in self.exact for row in packed], dtype=bool)
+    def add_novel(self, vectors, grids, threshold=DUPLICATE_DISTANCE, max_cells=DUPLICATE_CELLS):
+        """
+        Add the vectors that are not near-duplicates of the index or of an
+        earlier vector in the same batch. Returns the boolean accept mask.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        accepted = self.is_novel(vectors, grids, threshold, max_cells)
+        packed = pack_grids(grids)
+        # Within the batch, keep the first of any close group
+        for i in np.flatnonzero(accepted):
+            earlier = np.flatnonzero(accepted[:i])
+            if len(earlier):
+                near = earlier[np.linalg.norm(vectors[earlier] - vectors[i], axis=1) <= threshold]
+                if (cell_differences(packed[near], packed[i]) <= max_cells).any():
+                    accepted[i] = False
+        keep = np.flatnonzero(accepted)
+        if len(keep):
+            self.add(vectors[keep], [grids[i] for i in keep] if not isinstance(grids, np.ndarray) else grids[keep])
+        return accepted
+    def similar(self, model, grid, k=5):
+        """
+        The k stored levels most like `grid`: [(id, distance, grid)], nearest first.
+        """
+        distances, rows = self.search_rows(self.embed(model, [grid]), k)
+        return [(int(self.ids[row]), float(d), unpack_grid(self.grids[row]))
+                for d, row in zip(distances[0], rows[0]) if row >= 0]
+    # --- persistence ---
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'vectors.npy'), self.vectors[:self.count])
+        np.save(os.path.join(path, 'grids.npy'), self.grids[:self.count])
+        np.save(os.path.join(path, 'ids.npy'), self.ids[:self.count])
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'count': self.count, 'next_id': self.next_id, 'mean': self.mean.tolist(), 'std': self.std.tolist(),
+                       'duplicate_distance': DUPLICATE_DISTANCE, 'duplicate_cells': DUPLICATE_CELLS}, f)
+    @classmethod
+    def load(cls, path, mmap=False):
+        """
+        Load a saved index. With mmap the arrays stay on disk and are paged in
+        by queries; adding to a memory-mapped index copies them into memory.
+        """
+        with open(os.path.join(path, 'index.json')) as f:
+            meta = json.load(f)
+        index = cls(np.array(meta['mean'], dtype=np.float32), np.array(meta['std'], dtype=np.float32), capacity=0)
+        mode = 'r' if mmap else None
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode=mode)
+        index.grids = np.load(os.path.join(path, 'grids.npy'), mmap_mode=mode)
+        index.ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode=mode)
+        index.count = meta['count']
+        index.next_id = meta.get('next_id', int(np.max(index.ids)) + 1 if index.count else 0)
+        index.sq_norms = (np.asarray(index.vectors) ** 2).sum(axis=1).astype(np.float32)
+        index.exact = {row.tobytes(): int(level_id) for row, level_id in zip(index.grids, index.ids)}
+        return index
+
+# --- BENCHMARK ---
+def benchmark_index(count=100_000, queries=1000, dedupe_count=10_000, model_path='vae_model_final.pth'):
+    """
+    Generate `count` levels, then time batch encoding, duplicate rejection,
+    and single and batched nearest-neighbour queries against all of them.
+    """
+    model = load_vae_model(model_path, torch.device('cpu'))
+    if model is None:
+        return
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    grids = sample_grids(model, count)
+    walls = grids_to_array(grids).reshape(count, 20, 20) > 0
+    print(f"generated {count} grids in {time.perf_counter() - start:.2f}s")
+
+    index = LevelIndex()
+    index.calibrate(model)
+    start = time.perf_counter()
+    vectors = index.embed(model, walls)
+    encode_time = time.perf_counter() - start
+    print(f"encoded {count} grids in {encode_time:.2f}s ({count / encode_time:,.0f} levels/s, batch {ENCODE_BATCH})")
+
+    start = time.perf_counter()
+    accepted = index.add_novel(vectors[:dedupe_count], walls[:dedupe_count])
+    dedupe_time = time.perf_counter() - start
+    unique_layouts = len(np.unique(walls[:dedupe_count].reshape(dedupe_count, -1), axis=0))
+    print(f"deduplicated {dedupe_count} levels in {dedupe_time:.2f}s: kept {int(accepted.sum())}, "
+          f"{unique_layouts} distinct wall layouts among them")
+    index.add(vectors[dedupe_count:], walls[dedupe_count:])
+    print(f"index holds {len(index)} levels ({index.vectors[:len(index)].nbytes / 2**20:.1f} MB of vectors)")
+
+    latencies = []
+    for q in vectors[:queries]:
+        start = time.perf_counter()
+        index.search(q, 5)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"single query (k=5): p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms")
+    start = time.perf_counter()
+    index.search(vectors[:queries], 5)
+    batch_time = time.perf_counter() - start
+    print(f"batched {queries} queries (k=5): {batch_time * 1000:.1f} ms ({batch_time / queries * 1e6:.0f} us/query)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Level embedding index: benchmark, or find levels like a grid")
+    parser.add_argument('--count', type=int, default=100_000, help="levels to index in the benchmark")
+    parser.add_argument('--index', help="saved index directory (from generate_levels.py --dedupe)")
+    parser.add_argument('--like', type=int, metavar='ID', help="print the levels in --index most like level ID")
+    parser.add_argument('-k', type=int, default=3)
+    args = parser.parse_args()
+    if args.index and args.like is not None:
+        index = LevelIndex.load(args.index, mmap=True)
+        rows = np.flatnonzero(np.asarray(index.ids) == args.like)
+        if not len(rows):
+            parser.error(f"level {args.like} is not in {args.index}")
+        grid = unpack_grid(index.grids[int(rows[0])])
+        model = load_vae_model(device=torch.device('cpu'))
+        for level_id, distance, similar_grid in index.similar(model, grid, args.k + 1)[1:]:
+            print(f"level {level_id} (distance {distance:.2f}):")
+            print('\n'.join(''.join(row) for row in similar_grid))
+    else:
+        benchmark_index(args.count)
@@ -0,0 +1,262 @@
+import math
+import time
+from functools import lru_cache
+
+import numpy as np
+
+# --- PLAYER PHYSICS (mirrors Player in mustafa_super_bros.py) ---
+JUMP_POWER = -15
+GRAVITY = 0.8
+SPEED = 5
+TERMINAL_VELOCITY = 20
+PLAYER_SIZE = 48
+
+GRID_SIZE = 20
+SPAWN_X = 100
+SPAWN_ROW = 10  # Player spawns at y=400, i.e. row 10 of a 40px-row grid
+GROUND_Y = 700  # Top of the ground strip VAE levels get (vae_sample.convert_grid_to_game_format)
+MIN_RUN = 2     # Shortest run of wall tiles extract_horizontal_platforms turns into a platform
+
+# --- JUMP ENVELOPE ---
+def _arc_reach(initial_vel_y, scale_x, scale_y, max_rows):
+    """
+    Simulate one airborne arc frame by frame with the Player's update order
+    (vel_y += gravity, clamp, y += vel_y) and return {row_offset: column_reach}.
+
+    row_offset is the change in standing row (negative = higher) and column_reach
+    the largest column distance at which a platform can still be landed on,
+    allowing for the player's width overlapping both takeoff and landing cells.
+    """
+    reach = {}
+    vel_y = initial_vel_y
+    dy = 0.0
+    apex = 0.0
+    t = 0
+    while True:
+        t += 1
+        vel_y = min(vel_y + GRAVITY, TERMINAL_VELOCITY)
+        prev_dy = dy
+        dy += vel_y
+        apex = min(apex, dy)
+        if vel_y <= 0:
+            continue
+        # Descending: every row boundary crossed this frame is a landing height
+        lowest = math.floor(dy / scale_y)
+        highest = math.ceil(prev_dy / scale_y)
+        for di in range(highest, lowest + 1):
+            if di in reach or di * scale_y < apex:
+                continue
+            reach[di] = int(math.ceil((SPEED * t + PLAYER_SIZE) / scale_x))
+        if lowest >= max_rows:
+            return reach
+
+@lru_cache(maxsize=None)
+def jump_envelope(scale_x, scale_y=40.0):
+    """
+    Precompute the reachable (row offset, column reach) pairs for a grid scale.
+
+    Returns (jump, fall): two tuples of (reach, first_row, last_row) groups,
+    one for a full jump from standing and one for walking off a ledge.
+    Cached, so each grid scale is only simulated once.
+    """
+    jump = _arc_reach(JUMP_POWER, scale_x, scale_y, GRID_SIZE)
+    fall = _arc_reach(0, scale_x, scale_y, GRID_SIZE)
+    fall.pop(0, None)
+    return _group_by_reach(sorted(jump.items())), _group_by_reach(sorted(fall.items()))
+
+# --- GRID HELPERS ---
+def grids_to_arrays(grids):
+    """
+    Convert a list of 20x20 character grids into (solid, coins) boolean arrays
+    of shape (batch, 20, 20).
+    """
+    chars = np.array([[''.join(row) for row in grid] for grid in grids]).view('U1')
+    chars = chars.reshape(len(grids), GRID_SIZE, GRID_SIZE)
+    return chars == 'W', chars == 'C'
+
+FULL_ROW = (1 << GRID_SIZE) - 1
+_COLUMN_BITS = (1 << np.arange(GRID_SIZE, dtype=np.uint32)).astype(np.uint32)
+
+def pack_rows(mask):
+    """
+    Pack a (batch, 20, 20) boolean mask into (batch, 20) uint32 row bitboards,
+    with column j stored in bit j.
+    """
+    return (mask.astype(np.uint32) * _COLUMN_BITS).sum(axis=2, dtype=np.uint32)
+
+def unpack_rows(rows):
+    """
+    Inverse of pack_rows.
+    """
+    return (rows[:, :, None] & _COLUMN_BITS) != 0
+
+def game_walls(rows, scale_y=40.0, ground_y=GROUND_Y):
+    """
+    Reduce packed wall rows to what the game actually builds from them: only
+    horizontal runs of MIN_RUN or more tiles become platforms, and the ground
+    strip at `ground_y` spans the whole level, replacing whatever the grid has
+    in the rows it covers. The ground starts at the first row boundary at or
+    below its top, so heights measured from it err on the high side.
+    """
+    # Bits that start a run of MIN_RUN set bits, then every bit those runs cover
+    starts = rows.copy()
+    for k in range(1, MIN_RUN):
+        starts &= rows >> k
+    runs = starts.copy()
+    for k in range(1, MIN_RUN):
+        runs |= starts << k
+    runs &= FULL_ROW
+    ground_row = min(GRID_SIZE, math.ceil(ground_y / scale_y))
+    runs[:, ground_row:] = FULL_ROW
+    return runs
+
+def _dilate_columns(rows, radius):
+    """
+    Horizontal dilation of packed rows by `radius` columns.
+    """
+    out = rows.copy()
+    for k in range(1, radius + 1):
+        out |= (rows << k) | (rows >> k)
+    return out & FULL_ROW
+
+def _spread_rows(rows, lo, hi):
+    """
+    Copy every packed row to all row offsets in [lo, hi] (positive = down).
+    """
+    out = np.zeros_like(rows)
+    for di in range(lo, hi + 1):
+        if di >= GRID_SIZE or -di >= GRID_SIZE:
+            continue
+        if di > 0:
+            out[:, di:] |= rows[:, :-di]
+        elif di < 0:
+            out[:, :di] |= rows[:, -di:]
+        else:
+            out |= rows
+    return out
+
+def _group_by_reach(moves):
+    """
+    Collapse (row_offset, reach) pairs into (reach, lo, hi) row ranges so each
+    distinct reach needs a single dilation per BFS step.
+    """
+    groups = []
+    for di, reach in moves:
+        if groups and groups[-1][0] == reach and groups[-1][2] == di - 1:
+            groups[-1][2] = di
+        else:
+            groups.append([reach, di, di])
+    return tuple(tuple(g) for g in groups)
+
+# --- REACHABILITY ---
+def reachable_cells(solid, scale_x, scale_y=40.0, ground_y=GROUND_Y):
+    """
+    Breadth-first flood of the standing cells reachable from the spawn point.
+
+    `solid` is a (batch, 20, 20) boolean array of wall tiles, reduced with
+    game_walls() to the platforms and ground the game builds. A cell is
+    standable when it is empty and has one of those directly below it. Moves are walking to an
+    adjacent standable cell, walking off a ledge, and jumping (which needs the
+    cell above to be free), using the precomputed envelope for this scale.
+    Rows are handled as packed bitboards so each step is a handful of
+    array-wide shifts. The envelope ignores obstacles mid-arc, so results are slightly optimistic.
+    Returns (reachable, standable), both (batch, 20, 20) boolean arrays.
+    """
+    solid = np.asarray(solid, dtype=bool)
+    batch = solid.shape[0]
+    jump, fall = jump_envelope(float(scale_x), float(scale_y))
+
+    walls = game_walls(pack_rows(solid), scale_y, ground_y)
+    standable = np.zeros_like(walls)
+    standable[:, :-1] = ~walls[:, :-1] & walls[:, 1:] & FULL_ROW
+    headroom = np.full_like(walls, FULL_ROW)
+    headroom[:, 1:] = ~walls[:, :-1] & FULL_ROW
+
+    # Spawn: fall straight down from row 10 in the spawn column
+    start_col = min(GRID_SIZE - 1, int((SPAWN_X + PLAYER_SIZE / 2) / scale_x))
+    column = (standable[:, SPAWN_ROW:] >> start_col) & 1
+    has_floor = column.any(axis=1)
+    start_row = SPAWN_ROW + column.argmax(axis=1)
+    reachable = np.zeros_like(walls)
+    reachable[np.arange(batch)[has_floor], start_row[has_floor]] = 1 << start_col
+
+    while True:
+        # Walk left/right along the same row
+        frontier = _dilate_columns(reachable, 1)
+        # Walk off ledges and jump
+        for source, moves in ((reachable, fall), (reachable & headroom, jump)):
+            for reach, lo, hi in moves:
+                frontier |= _spread_rows(_dilate_columns(source, reach), lo, hi)
+        frontier &= standable
+        frontier |= reachable
+        if np.array_equal(frontier, reachable):
+            return unpack_rows(reachable), unpack_rows(standable)
+        reachable = frontier
+
+def validate_levels(grids, scale_x, scale_y=40.0, flag_x=None, require_coins=True, ground_y=GROUND_Y):
+    """
+    Check a batch of 20x20 grids for completability.
+
+    A level passes when a standable cell at or beyond the flag column is
+    reachable and, if `require_coins` is set, every coin sits on a reachable cell.
+    `grids` may be a list of character grids or a (batch, 20, 20) solid mask.
+    Returns a boolean numpy array with one entry per grid.
+    """
+    if isinstance(grids, np.ndarray):
+        solid, coins = grids.astype(bool), np.zeros(grids.shape, dtype=bool)
+    else:
+        solid, coins = grids_to_arrays(grids)
+    if flag_x is None:
+        flag_x = scale_x * GRID_SIZE - 100
+    flag_col = min(GRID_SIZE - 1, int(flag_x / scale_x))
+
+    reachable, _ = reachable_cells(solid, scale_x, scale_y, ground_y)
+    ok = reachable[:, :, flag_col:].any(axis=(1, 2))
+    if require_coins:
+        ok &= ~(coins & ~reachable).any(axis=(1, 2))
+    return ok
+
+def is_level_playable(grid, scale_x, scale_y=40.0, require_coins=True):
+    """
+    Convenience wrapper for validating a single grid.
+    """
+    return bool(validate_levels([grid], scale_x, scale_y, require_coins=require_coins)[0])
+
+def test_validator(batch_size=1000):
+    """
+    Validate a batch of VAE levels and report acceptance rate and throughput.
+    """
+    from vae_sample import load_vae_model, sample_playable_grids
+    model = load_vae_model()
+    if model is None:
+        return
+    start = time.perf_counter()
+    grids, stats = sample_playable_grids(model, batch_size, level_num=7, batch_size=256)
+    elapsed = time.perf_counter() - start
+    print(f"Accepted {len(grids)} levels from {stats['sampled']} samples "
+          f"(acceptance rate {stats['acceptance_rate']:.1%})")
+    print(f"Validation: {stats['sampled'] / stats['validate_time']:.0f} grids/s, "
+          f"end to end: {len(grids) / elapsed:.0f} accepted levels/s")
+
+def test_phantom_tiles(scale_x=140.0):
+    """
+    A coin on a high ledge whose only stepping stone is a single wall tile must
+    be rejected, since the game builds no platform for a lone tile; widening
+    the stone to two tiles makes the level pass.
+    """
+    def level(stone):
+        grid = [[' '] * GRID_SIZE for _ in range(GRID_SIZE)]
+        grid[19] = ['W'] * GRID_SIZE        # The floor row post_process_level adds
+        for j in range(10, 13):
+            grid[13][j] = 'W'           # Ledge five rows above the ground, out of a single jump's reach
+        grid[12][11] = 'C'
+        for j in stone:
+            grid[16][j] = 'W'           # Stepping stone two rows above the ground
+        return grid
+    assert not is_level_playable(level([8]), scale_x), "a lone tile was accepted as a stepping stone"
+    assert is_level_playable(level([8, 9]), scale_x), "a two-tile stepping stone was rejected"
+    print("phantom tiles: lone stepping stone rejected, two-tile stone accepted")
+
+if __name__ == "__main__":
+    test_phantom_tiles()
+    test_validator()
@@ -1,9 +1,25 @@
 import pygame
 import sys
 import os
+import math
 import random
 import json
+import asyncio
+import threading
+import torch
 from vae_sample import generate_level_with_vae
+from level_compiler import get_compiled_level, has_level_definition
+from profiler import FrameProfiler
+from frame_pacing import FramePacer
+from gc_control import AllocationSampler, GCController
+from services import SERVICE_BUDGET_MS, ServiceHost, telemetry_service
+from audio import AudioEngine, load_pcm, pre_init_mixer
+from assets import AssetLoader, load_manifest, load_sprite_pack
+from navigation import JumpPhysics, NavGraph
+from level_index import LevelIndex
+from animation import AnimationClip, AnimationSet, clear_animation_sets, get_animation_set
+from render_queue import (RenderQueue, LAYER_TERRAIN, LAYER_PROPS, LAYER_ITEMS, LAYER_ENEMIES,
+                          LAYER_PLAYER, LAYER_LIQUID)
 
 # --- CONFIG ---
 SCREEN_WIDTH = 1200
@@ -14,6 +30,10 @@ ENEMY_SIZE = 48
 COIN_SIZE = 32
 BG_COLOR = (135, 206, 235)
 TITLE = "MUSTAFA SUPER BROS"
+# Internal render resolution as a fraction of the window; lower trades sharpness for fill cost
+RENDER_SCALE = float(os.environ.get('MSB_RENDER_SCALE', '1.0'))
+# Let SDL upscale the back buffer (pygame.SCALED) instead of a software scale blit
+HARDWARE_SCALING = os.environ.get('MSB_HARDWARE_SCALING', '0') == '1'
 
 # --- SOUND MAPPING ---
 SOUND_MAP = {
@@ -44,46 +64,245 @@ PLATFORM_TYPES = {
     'wood': 'Sprites/Tiles/Default/bridge_logs.png',
 }
 
+# Terrain tilesets: '<prefix>_horizontal_*' for thin runs, '<prefix>_block_*' for thick ones.
+# Types without a tileset (e.g. wood) repeat their PLATFORM_TYPES sprite.
+PLATFORM_TILESETS = {
+    'grass': 'Sprites/Tiles/Default/terrain_grass',
+    'stone': 'Sprites/Tiles/Default/terrain_stone',
+    'sand': 'Sprites/Tiles/Default/terrain_sand',
+}
+TILE_SIZE = 64
+
+LOCK_COLORS = ['blue', 'green', 'red', 'yellow']
+
 # --- INIT ---
+pre_init_mixer()
 pygame.init()
 pygame.mixer.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption(TITLE)
 clock = pygame.time.Clock()
+# Per-phase frame timings; F3 toggles the overlay, --trace records every frame
+profiler = FrameProfiler()
+# Paces the play loops: fixed tick rate, renders skipped rather than slowing down under load
+pacer = FramePacer(FPS)
+# Keeps cyclic GC out of mid-frame; --alloc-sample N traces allocations on every Nth frame
+gc_control = GCController(profiler)
+alloc_sampler = AllocationSampler(0, profiler)
+# Embeddings of this session's prefetched VAE levels, so the next one is unlike those already played
+seen_levels = LevelIndex()
+seen_levels_lock = threading.Lock()
+
+def end_frame(transition=False):
+    # Shared loop tail: allocation sample, any due GC in the frame's idle time, then wait for the deadline
+    alloc_sampler.end_frame()
+    gc_control.end_frame(pacer.idle_ms(), transition)
+    profiler.phase('wait')
+    pacer.end_tick()
+    profiler.end_frame()
 
 # --- LOAD SOUNDS ---
-sounds = {}
-for key, path in SOUND_MAP.items():
+# Pre-decoded PCM on a pool of reserved voices with per-sound priority and rate limits;
+# the PCM itself is loaded by preload_assets(), or on first play
+sounds = AudioEngine(SOUND_MAP, preload=False)
+
+# --- SPRITE CACHE ---
+_sprite_cache = {}
+
+def render_size(size):
+    # Logical (1200x800-space) size -> pixel size in the internal render buffer
+    return (max(1, math.ceil(size[0] * RENDER_SCALE)), max(1, math.ceil(size[1] * RENDER_SCALE)))
+
+def load_sprite(path, size, fallback_color=(255, 0, 255)):
+    # Decode and scale each (path, size) once; every object using it shares the surface.
+    # `size` is logical; the sprite is scaled to the render resolution, switching from the
+    # Default to the Double asset tier when the Default art would have to be upscaled.
+    key = (path, size)
+    sprite = _sprite_cache.get(key)
+    if sprite is None:
+        sprite = _sprite_cache[key] = decode_sprite(path, render_size(size), fallback_color)
+    return sprite
+
+def decode_sprite(path, pixel_size, fallback_color=(255, 0, 255)):
+    # Uncached decode + smooth scale; touches no shared state, so the asset preloader runs it on worker threads.
+    # The offline bake (assets.py) uses it too, so a baked sprite is pixel-identical to a decoded one
     try:
-        sounds[key] = pygame.mixer.Sound(path)
+        sprite = pygame.image.load(path)
+        if '/Default/' in path and (sprite.get_width() < pixel_size[0] or sprite.get_height() < pixel_size[1]):
+            double_path = path.replace('/Default/', '/Double/')
+            if os.path.exists(double_path):
+                sprite = pygame.image.load(double_path)
+        if sprite.get_bitsize() < 24 or sprite.get_colorkey() is not None:
+            # smoothscale needs 24/32-bit pixels; blitting onto a 32-bit alpha surface turns the colorkey
+            # into transparency and needs no display, unlike convert_alpha()
+            converted = pygame.Surface(sprite.get_size(), pygame.SRCALPHA, 32)
+            converted.blit(sprite, (0, 0))
+            sprite = converted
+        return pygame.transform.smoothscale(sprite, pixel_size)
     except Exception:
-        sounds[key] = None
+        sprite = pygame.Surface(pixel_size)
+        sprite.fill(fallback_color)
+        return sprite
+
+# --- DISPLAY ---
+window = None
+screen = None
+background = None
+
+def init_display(render_scale=None, hardware_scaling=None):
+    # Everything draws to `screen`, a back buffer at the internal render resolution.
+    # present() gets it to the window, either via pygame.SCALED or one scale blit.
+    global window, screen, background, RENDER_SCALE, HARDWARE_SCALING
+    if render_scale is not None:
+        RENDER_SCALE = render_scale
+    if hardware_scaling is not None:
+        HARDWARE_SCALING = hardware_scaling
+    _sprite_cache.clear()
+    clear_animation_sets()
+    size = render_size((SCREEN_WIDTH, SCREEN_HEIGHT))
+    if HARDWARE_SCALING:
+        try:
+            window = screen = pygame.display.set_mode(size, pygame.SCALED)
+        except pygame.error:
+            # No renderer (e.g. the dummy video driver): fall back to the software scale blit
+            HARDWARE_SCALING = False
+    if not HARDWARE_SCALING:
+        window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        screen = window if size == window.get_size() else pygame.Surface(size).convert()
+    # Sprites baked by `python assets.py --bake` need no decoding or scaling at all; installed
+    # before the first load_sprite() so not even the background is scaled at startup
+    _sprite_cache.update(load_sprite_pack(RENDER_SCALE))
+    background = load_sprite('Sprites/Backgrounds/Default/background_color_hills.png', (SCREEN_WIDTH, SCREEN_HEIGHT), BG_COLOR)
+
+def present():
+    if screen is not window:
+        pygame.transform.scale(screen, window.get_size(), window)
+    pygame.display.flip()
+
+def to_screen(x, y):
+    # Logical position -> render buffer pixel position
+    return (int(x * RENDER_SCALE), int(y * RENDER_SCALE))
+
+def to_logical(pos):
+    # Mouse position -> logical position (SCALED reports render buffer pixels)
+    if HARDWARE_SCALING:
+        return (int(pos[0] / RENDER_SCALE), int(pos[1] / RENDER_SCALE))
+    return pos
+
+def ui_font(size, name=None, bold=False):
+    size = max(1, int(size * RENDER_SCALE))
+    return pygame.font.SysFont(name, size, bold=bold) if name else pygame.font.Font(None, size)
 
-# --- LOAD BACKGROUND ---
-try:
-    background = pygame.image.load('Sprites/Backgrounds/Default/background_color_hills.png')
-    background = pygame.transform.scale(background, (SCREEN_WIDTH, SCREEN_HEIGHT))
-except:
-    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-    background.fill(BG_COLOR)
+def ui_surface(size, flags=0):
+    return pygame.Surface(render_size(size), flags)
+
+def blit_centered(surface, y, center_x=SCREEN_WIDTH // 2):
+    x, y = to_screen(center_x, y)
+    screen.blit(surface, (x - surface.get_width() // 2, y))
+
+def text_rect(surface, center):
+    # Logical-space rect of a rendered text surface, for hit testing against the mouse
+    rect = pygame.Rect(0, 0, int(surface.get_width() / RENDER_SCALE), int(surface.get_height() / RENDER_SCALE))
+    rect.center = center
+    return rect
+
+def draw_ui_rect(color, rect, width):
+    x, y = to_screen(rect.x, rect.y)
+    w, h = render_size(rect.size)
+    pygame.draw.rect(screen, color, (x, y, w, h), max(1, int(width * RENDER_SCALE)))
+
+init_display()
 
 # --- PLATFORM CLASS ---
 class Platform:
-    def __init__(self, x, y, width, height, platform_type="grass"):
+    # Drawn as a run of shared square tiles instead of one sprite stretched to the platform size
+    def __init__(self, x, y, width, height, platform_type="grass", sprite_path=None):
         self.x = x
         self.y = y
         self.width = width
         self.height = height
         self.platform_type = platform_type
-        try:
+        if sprite_path is None:
             sprite_path = PLATFORM_TYPES.get(platform_type, PLATFORM_TYPES['grass'])
-            self.sprite = pygame.image.load(sprite_path)
-            self.sprite = pygame.transform.scale(self.sprite, (width, height))
-        except:
-            self.sprite = pygame.Surface((width, height))
-            self.sprite.fill((100, 200, 100))
-    def draw(self, screen, camera_x):
-        screen.blit(self.sprite, (self.x - camera_x, self.y))
+        self.tile = max(1, min(int(height), TILE_SIZE))
+        self.columns = self.build_tile_columns(PLATFORM_TILESETS.get(platform_type), sprite_path)
+    def tile_path(self, tileset, row, col, rows, cols):
+        if rows == 1:
+            if cols == 1:
+                return f'{tileset}_block.png'
+            part = 'left' if col == 0 else 'right' if col == cols - 1 else 'middle'
+            return f'{tileset}_horizontal_{part}.png'
+        side = '_left' if col == 0 and cols > 1 else '_right' if col == cols - 1 and cols > 1 else ''
+        if row == 0:
+            return f'{tileset}_block_top{side}.png'
+        return f'{tileset}_block{side}.png' if side else f'{tileset}_block_center.png'
+    def build_tile_columns(self, tileset, sprite_path):
+        # One list of (surface, dx, dy, area) per tile column; tiles overhanging the platform are clipped
+        tile = self.tile
+        rows = -(-int(self.height) // tile)
+        cols = -(-int(self.width) // tile)
+        columns = []
+        for col in range(cols):
+            column = []
+            for row in range(rows):
+                path = self.tile_path(tileset, row, col, rows, cols) if tileset else sprite_path
+                surface = load_sprite(path, (tile, tile), (100, 200, 100))
+                w = min(tile, int(self.width) - col * tile)
+                h = min(tile, int(self.height) - row * tile)
+                # Keep the right-hand part of a clipped last column so its edge cap stays visible
+                area = None
+                if (w, h) != (tile, tile):
+                    area_x = tile - w if col and col == cols - 1 else 0
+                    area = pygame.Rect(int(area_x * RENDER_SCALE), 0, *render_size((w, h)))
+                column.append((surface, col * tile, row * tile, area))
+            columns.append(column)
+        return columns
+    def draw(self, queue, camera_x):
+        # Only the tile columns inside the screen are queued
+        left = self.x - camera_x
+        first = max(0, int(-left // self.tile))
+        last = min(len(self.columns), int((SCREEN_WIDTH - left) // self.tile) + 1)
+        if first < last:
+            scale = RENDER_SCALE
+            queue.extend(LAYER_TERRAIN, [(surface, (int((left + dx) * scale), int((self.y + dy) * scale)), area)
+                                         for column in self.columns[first:last]
+                                         for surface, dx, dy, area in column])
+
+# --- ANIMATIONS ---
+# Player clips as sprite-name suffixes of the character's '_front.png' path
+PLAYER_CLIPS = {
+    'idle': ('idle',),
+    'walk': ('walk_a', 'walk_b'),
+    'jump': ('jump',),
+}
+PLAYER_STATE_CLIPS = {'idle': 'idle', 'walk': 'walk', 'jump': 'jump', 'fall': 'jump'}
+PLAYER_FRAME_TICKS = 10
+# Enemy clips per type: clip -> (Sprites/Enemies/Default names, ticks per frame). Unknown types use slime
+ENEMY_CLIPS = {
+    'slime': {'walk': (('slime_normal_walk_a', 'slime_normal_walk_b'), 15)},
+    'bee': {'walk': (('bee_a', 'bee_b'), 6)},
+    'snail': {'walk': (('snail_walk_a', 'snail_walk_b'), 20), 'shell': (('snail_shell',), 20)},
+}
+
+def player_animations(char_img_path):
+    # Shared clips for one character; frames missing on disk fall back to the front sprite
+    def build():
+        base_path = char_img_path.replace('_front.png', '')
+        def frames(names):
+            paths = (f'{base_path}_{name}.png' for name in names)
+            return [load_sprite(path if os.path.exists(path) else char_img_path, (PLAYER_SIZE, PLAYER_SIZE))
+                    for path in paths]
+        return AnimationSet({clip: AnimationClip(frames(names), PLAYER_FRAME_TICKS)
+                             for clip, names in PLAYER_CLIPS.items()})
+    return get_animation_set(('player', char_img_path), build)
+
+def enemy_animations(enemy_type):
+    clips = ENEMY_CLIPS.get(enemy_type, ENEMY_CLIPS['slime'])
+    def build():
+        return AnimationSet({clip: AnimationClip([load_sprite(f'Sprites/Enemies/Default/{name}.png',
+                                                              (ENEMY_SIZE, ENEMY_SIZE), (255, 0, 0))
+                                                  for name in names], ticks)
+                             for clip, (names, ticks) in clips.items()})
+    return get_animation_set(('enemy', enemy_type), build)
 
 # --- PLAYER CLASS ---
 class Player:
@@ -99,38 +318,19 @@ class Player:
         self.speed = 5
         self.gravity = 0.8
         self.facing_right = True
-        self.sprites = self.load_character_sprites(char_img_path)
-        self.current_sprite = 0
-        self.animation_timer = 0
+        self.animations = player_animations(char_img_path)
+        self.clip = "idle"
+        self.frame = 0
         self.state = "idle"
-    def load_character_sprites(self, char_img_path):
-        sprites = []
-        char_name = char_img_path.split('/')[-1].replace('_front.png', '')
-        base_path = char_img_path.replace('_front.png', '')
-        sprite_files = [
-            f'{base_path}_idle.png',
-            f'{base_path}_walk_a.png',
-            f'{base_path}_walk_b.png',
-            f'{base_path}_jump.png'
-        ]
-        for sprite_file in sprite_files:
-            try:
-                img = pygame.image.load(sprite_file)
-                img = pygame.transform.scale(img, (PLAYER_SIZE, PLAYER_SIZE))
-                sprites.append(img)
-            except:
-                img = pygame.image.load(char_img_path)
-                img = pygame.transform.scale(img, (PLAYER_SIZE, PLAYER_SIZE))
-                sprites.append(img)
-        return sprites
-    def update(self, platforms):
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+    def update(self, platforms, controls=None):
+        # `controls` is (left, right, jump); None reads the keyboard
+        left, right, jump = read_controls() if controls is None else controls
+        if left:
             self.vel_x = -self.speed
             self.facing_right = False
             if self.on_ground:
                 self.state = "walk"
-        elif keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        elif right:
             self.vel_x = self.speed
             self.facing_right = True
             if self.on_ground:
@@ -139,12 +339,11 @@ class Player:
             self.vel_x = 0
             if self.on_ground:
                 self.state = "idle"
-        if (keys[pygame.K_UP] or keys[pygame.K_w] or keys[pygame.K_SPACE]) and self.on_ground:
+        if jump and self.on_ground:
             self.vel_y = self.jump_power
             self.on_ground = False
             self.state = "jump"
-            if sounds['jump']:
-                sounds['jump'].play()
+            sounds.play('jump')
         if not self.on_ground:
             self.vel_y += self.gravity
             if self.vel_y > 0:
@@ -162,10 +361,12 @@ class Player:
                 elif self.vel_y < 0:  # Jumping up
                     self.y = platform.y + platform.height
                     self.vel_y = 0
-        self.animation_timer += 1
-        if self.animation_timer >= 10:
-            self.animation_timer = 0
-            self.current_sprite = (self.current_sprite + 1) % 2 + 1 if self.state == "walk" else 0
+        clip = PLAYER_STATE_CLIPS[self.state]
+        if clip != self.clip:
+            self.clip = clip
+            self.frame = 0
+        else:
+            self.frame += 1
         if self.y > SCREEN_HEIGHT:
             return False
         return True
@@ -174,18 +375,10 @@ class Player:
                 self.x + self.width > obj.x and
                 self.y < obj.y + obj.height and
                 self.y + self.height > obj.y)
-    def draw(self, screen, camera_x):
-        if self.state == "idle":
-            sprite = self.sprites[0]
-        elif self.state == "walk":
-            sprite = self.sprites[self.current_sprite]
-        elif self.state == "jump" or self.state == "fall":
-            sprite = self.sprites[3]
-        else:
-            sprite = self.sprites[0]
-        if not self.facing_right:
-            sprite = pygame.transform.flip(sprite, True, False)
-        screen.blit(sprite, (self.x - camera_x, self.y))
+    def draw(self, queue, camera_x):
+        # Character art faces right; the left-facing frames are pre-flipped in the clip
+        sprite = self.animations.frame(self.clip, self.frame, not self.facing_right)
+        queue.add(LAYER_PLAYER, sprite, to_screen(self.x - camera_x, self.y))
 
 # --- ENEMY CLASS ---
 class Enemy:
@@ -198,19 +391,11 @@ class Enemy:
         self.vel_y = 0
         self.gravity = 0.8
         self.enemy_type = enemy_type
-        try:
-            if enemy_type == 'slime':
-                sprite_path = 'Sprites/Enemies/Default/slime_normal_rest.png'
-            elif enemy_type == 'bee':
-                sprite_path = 'Sprites/Enemies/Default/bee_rest.png'
-            else:
-                sprite_path = 'Sprites/Enemies/Default/slime_normal_rest.png'
-            self.sprite = pygame.image.load(sprite_path)
-            self.sprite = pygame.transform.scale(self.sprite, (ENEMY_SIZE, ENEMY_SIZE))
-        except:
-            self.sprite = pygame.Surface((ENEMY_SIZE, ENEMY_SIZE))
-            self.sprite.fill((255, 0, 0))
+        self.animations = enemy_animations(enemy_type)
+        self.clip = 'walk'
+        self.frame = 0
     def update(self, platforms):
+        self.frame += 1
         self.vel_y += self.gravity
         self.x += self.vel_x
         self.y += self.vel_y
@@ -236,8 +421,10 @@ class Enemy:
                 obj.x + obj.width > ex and
                 obj.y < ey + eh and
                 obj.y + obj.height > ey)
-    def draw(self, screen, camera_x):
-        screen.blit(self.sprite, (self.x - camera_x, self.y))
+    def draw(self, queue, camera_x):
+        # Enemy art faces left, so the mirrored frames are used while moving right
+        sprite = self.animations.frame(self.clip, self.frame, self.vel_x > 0)
+        queue.add(LAYER_ENEMIES, sprite, to_screen(self.x - camera_x, self.y))
 
 # --- COIN CLASS ---
 class Coin:
@@ -248,19 +435,14 @@ class Coin:
         self.height = COIN_SIZE
         self.collected = False
         self.animation_timer = 0
-        try:
-            self.sprite = pygame.image.load('Sprites/Tiles/Default/coin_gold.png')
-            self.sprite = pygame.transform.scale(self.sprite, (COIN_SIZE, COIN_SIZE))
-        except:
-            self.sprite = pygame.Surface((COIN_SIZE, COIN_SIZE))
-            self.sprite.fill((255, 255, 0))
+        self.sprite = load_sprite('Sprites/Tiles/Default/coin_gold.png', (COIN_SIZE, COIN_SIZE), (255, 255, 0))
     def update(self):
         self.animation_timer += 1
-    def draw(self, screen, camera_x):
+    def draw(self, queue, camera_x):
         if not self.collected:
             angle = (self.animation_timer * 5) % 360
             rotated = pygame.transform.rotate(self.sprite, angle)
-            screen.blit(rotated, (self.x - camera_x, self.y))
+            queue.add(LAYER_ITEMS, rotated, to_screen(self.x - camera_x, self.y))
     def check_collision(self, player):
         return (not self.collected and
                 player.x < self.x + self.width and
@@ -275,14 +457,9 @@ class Flag:
         self.y = y
         self.width = 64
         self.height = 64
-        try:
-            self.sprite = pygame.image.load('Sprites/Tiles/Default/flag_blue_a.png')
-            self.sprite = pygame.transform.scale(self.sprite, (self.width, self.height))
-        except:
-            self.sprite = pygame.Surface((self.width, self.height))
-            self.sprite.fill((0, 0, 255))
-    def draw(self, screen, camera_x):
-        screen.blit(self.sprite, (self.x - camera_x, self.y))
+        self.sprite = load_sprite('Sprites/Tiles/Default/flag_blue_a.png', (self.width, self.height), (0, 0, 255))
+    def draw(self, queue, camera_x):
+        queue.add(LAYER_PROPS, self.sprite, to_screen(self.x - camera_x, self.y))
 
 # --- COIN BLOCK CLASS ---
 class CoinBlock:
@@ -292,14 +469,8 @@ class CoinBlock:
         self.width = 48
         self.height = 48
         self.has_coin = True
-        try:
-            self.sprite_active = pygame.image.load('Sprites/Tiles/Default/block_coin_active.png')
-            self.sprite_active = pygame.transform.scale(self.sprite_active, (self.width, self.height))
-            self.sprite_empty = pygame.image.load('Sprites/Tiles/Default/block_coin.png')
-            self.sprite_empty = pygame.transform.scale(self.sprite_empty, (self.width, self.height))
-        except:
-            self.sprite_active = pygame.Surface((self.width, self.height)); self.sprite_active.fill((255, 255, 0))
-            self.sprite_empty = pygame.Surface((self.width, self.height)); self.sprite_empty.fill((200, 200, 0))
+        self.sprite_active = load_sprite('Sprites/Tiles/Default/block_coin_active.png', (self.width, self.height), (255, 255, 0))
+        self.sprite_empty = load_sprite('Sprites/Tiles/Default/block_coin.png', (self.width, self.height), (200, 200, 0))
     def check_collision(self, player):
         px, py, pw, ph = player.x, player.y, player.width, player.height
         if (px + pw > self.x and px < self.x + self.width and
@@ -309,9 +480,9 @@ class CoinBlock:
         return False
     def solid_collision(self, obj):
         return (obj.x < self.x + self.width and obj.x + obj.width > self.x and obj.y < self.y + self.height and obj.y + obj.height > self.y)
-    def draw(self, screen, camera_x):
+    def draw(self, queue, camera_x):
         sprite = self.sprite_active if self.has_coin else self.sprite_empty
-        screen.blit(sprite, (self.x - camera_x, self.y))
+        queue.add(LAYER_PROPS, sprite, to_screen(self.x - camera_x, self.y))
 
 # --- LOCK, KEY, EXCLAMATION BLOCK CLASSES ---
 class Lock:
@@ -321,14 +492,8 @@ class Lock:
         self.width = 48
         self.height = 48
         self.lock_type = lock_type
-        try:
-            self.sprite_locked = pygame.image.load(f'Sprites/Tiles/Default/{lock_type}.png')
-            self.sprite_locked = pygame.transform.scale(self.sprite_locked, (self.width, self.height))
-            self.sprite_unlocked = pygame.image.load('Sprites/Tiles/Default/block_plank.png')
-            self.sprite_unlocked = pygame.transform.scale(self.sprite_unlocked, (self.width, self.height))
-        except:
-            self.sprite_locked = pygame.Surface((self.width, self.height)); self.sprite_locked.fill((0, 0, 255))
-            self.sprite_unlocked = pygame.Surface((self.width, self.height)); self.sprite_unlocked.fill((150, 100, 50))
+        self.sprite_locked = load_sprite(f'Sprites/Tiles/Default/{lock_type}.png', (self.width, self.height), (0, 0, 255))
+        self.sprite_unlocked = load_sprite('Sprites/Tiles/Default/block_plank.png', (self.width, self.height), (150, 100, 50))
         self.unlocked = False
     def check_collision(self, player):
         px, py, pw, ph = player.x, player.y, player.width, player.height
@@ -336,9 +501,9 @@ class Lock:
     def solid_collision(self, obj):
         # Solid block collision (AABB)
         return (obj.x < self.x + self.width and obj.x + obj.width > self.x and obj.y < self.y + self.height and obj.y + obj.height > self.y)
-    def draw(self, screen, camera_x):
+    def draw(self, queue, camera_x):
         sprite = self.sprite_unlocked if self.unlocked else self.sprite_locked
-        screen.blit(sprite, (self.x - camera_x, self.y))
+        queue.add(LAYER_PROPS, sprite, to_screen(self.x - camera_x, self.y))
 
 class Key:
     def __init__(self, x, y, key_type):
@@ -347,18 +512,14 @@ class Key:
         self.width = 32
         self.height = 32
         self.key_type = key_type
-        try:
-            self.sprite = pygame.image.load(f'Sprites/Tiles/Default/{key_type}.png')
-            self.sprite = pygame.transform.scale(self.sprite, (self.width, self.height))
-        except:
-            self.sprite = pygame.Surface((self.width, self.height)); self.sprite.fill((255, 255, 0))
+        self.sprite = load_sprite(f'Sprites/Tiles/Default/{key_type}.png', (self.width, self.height), (255, 255, 0))
         self.collected = False
     def check_collision(self, player):
         px, py, pw, ph = player.x, player.y, player.width, player.height
         return (px < self.x + self.width and px + pw > self.x and py < self.y + self.height and py + ph > self.y)
-    def draw(self, screen, camera_x):
+    def draw(self, queue, camera_x):
         if not self.collected:
-            screen.blit(self.sprite, (self.x - camera_x, self.y))
+            queue.add(LAYER_ITEMS, self.sprite, to_screen(self.x - camera_x, self.y))
 
 class ExclamationBlock:
     def __init__(self, x, y, key_type):
@@ -368,14 +529,8 @@ class ExclamationBlock:
         self.height = 48
         self.key_type = key_type
         self.has_key = True
-        try:
-            self.sprite_active = pygame.image.load('Sprites/Tiles/Default/block_exclamation_active.png')
-            self.sprite_active = pygame.transform.scale(self.sprite_active, (self.width, self.height))
-            self.sprite_empty = pygame.image.load('Sprites/Tiles/Default/block_exclamation.png')
-            self.sprite_empty = pygame.transform.scale(self.sprite_empty, (self.width, self.height))
-        except:
-            self.sprite_active = pygame.Surface((self.width, self.height)); self.sprite_active.fill((255, 255, 0))
-            self.sprite_empty = pygame.Surface((self.width, self.height)); self.sprite_empty.fill((200, 200, 0))
+        self.sprite_active = load_sprite('Sprites/Tiles/Default/block_exclamation_active.png', (self.width, self.height), (255, 255, 0))
+        self.sprite_empty = load_sprite('Sprites/Tiles/Default/block_exclamation.png', (self.width, self.height), (200, 200, 0))
         self.key = Key(self.x + 8, self.y - 32, f'key_{key_type.split("_")[-1]}')
     def check_collision(self, player):
         px, py, pw, ph = player.x, player.y, player.width, player.height
@@ -386,66 +541,51 @@ class ExclamationBlock:
         return False
     def solid_collision(self, obj):
         return (obj.x < self.x + self.width and obj.x + obj.width > self.x and obj.y < self.y + self.height and obj.y + obj.height > self.y)
-    def draw(self, screen, camera_x):
+    def draw(self, queue, camera_x):
         sprite = self.sprite_active if self.has_key else self.sprite_empty
-        screen.blit(sprite, (self.x - camera_x, self.y))
+        queue.add(LAYER_PROPS, sprite, to_screen(self.x - camera_x, self.y))
         if not self.has_key:
-            self.key.draw(screen, camera_x)
+            self.key.draw(queue, camera_x)
 
 # --- SNAIL ENEMY CLASS ---
 class Snail(Enemy):
     def __init__(self, x, y):
         super().__init__(x, y, enemy_type='snail')
-        try:
-            self.sprite_walk = pygame.image.load('Sprites/Enemies/Default/snail_walk_a.png')
-            self.sprite_walk = pygame.transform.scale(self.sprite_walk, (ENEMY_SIZE, ENEMY_SIZE))
-            self.sprite_shell = pygame.image.load('Sprites/Enemies/Default/snail_shell.png')
-            self.sprite_shell = pygame.transform.scale(self.sprite_shell, (ENEMY_SIZE, ENEMY_SIZE))
-        except:
-            self.sprite_walk = pygame.Surface((ENEMY_SIZE, ENEMY_SIZE)); self.sprite_walk.fill((150, 75, 0))
-            self.sprite_shell = pygame.Surface((ENEMY_SIZE, ENEMY_SIZE)); self.sprite_shell.fill((200, 200, 200))
         self.in_shell = False
     def update(self, platforms):
+        self.clip = 'shell' if self.in_shell else 'walk'
         if not self.in_shell:
             super().update(platforms)
-    def draw(self, screen, camera_x):
-        sprite = self.sprite_shell if self.in_shell else self.sprite_walk
-        screen.blit(sprite, (self.x - camera_x, self.y))
 
 # --- CHARACTER SELECT ---
 def character_select_screen():
-    font_title = pygame.font.SysFont('Arial', 72, bold=True)
-    font_sub = pygame.font.SysFont('Arial', 36)
-    font_label = pygame.font.SysFont('Arial', 28)
+    font_title = ui_font(72, 'Arial', bold=True)
+    font_sub = ui_font(36, 'Arial')
+    font_label = ui_font(28, 'Arial')
     char_imgs = []
     for name, path in CHARACTER_OPTIONS:
-        try:
-            img = pygame.image.load(path)
-            img = pygame.transform.scale(img, (PLAYER_SIZE, PLAYER_SIZE))
-        except Exception:
-            img = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE))
-            img.fill((200, 200, 200))
+        img = load_sprite(path, (PLAYER_SIZE, PLAYER_SIZE), (200, 200, 200))
         char_imgs.append((name, img))
     selected = None
     while selected is None:
         screen.blit(background, (0, 0))
         title_surf = font_title.render(TITLE, True, (30, 30, 30))
-        screen.blit(title_surf, (SCREEN_WIDTH//2 - title_surf.get_width()//2, 60))
+        blit_centered(title_surf, 60)
         sub_surf = font_sub.render("Choose your character", True, (60, 60, 60))
-        screen.blit(sub_surf, (SCREEN_WIDTH//2 - sub_surf.get_width()//2, 160))
+        blit_centered(sub_surf, 160)
         spacing = 60
         total_width = len(char_imgs) * PLAYER_SIZE + (len(char_imgs)-1) * spacing
         start_x = SCREEN_WIDTH//2 - total_width//2
         y = 300
-        mouse = pygame.mouse.get_pos()
+        mouse = to_logical(pygame.mouse.get_pos())
         for i, (name, img) in enumerate(char_imgs):
             x = start_x + i * (PLAYER_SIZE + spacing)
             rect = pygame.Rect(x, y, PLAYER_SIZE, PLAYER_SIZE)
             if rect.collidepoint(mouse):
-                pygame.draw.rect(screen, (255, 200, 0), rect.inflate(12, 12), 4)
-            screen.blit(img, (x, y))
+                draw_ui_rect((255, 200, 0), rect.inflate(12, 12), 4)
+            screen.blit(img, to_screen(x, y))
             label = font_label.render(name, True, (30, 30, 30))
-            screen.blit(label, (x + PLAYER_SIZE//2 - label.get_width()//2, y + PLAYER_SIZE + 10))
+            blit_centered(label, y + PLAYER_SIZE + 10, x + PLAYER_SIZE//2)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -454,14 +594,56 @@ def character_select_screen():
                 for i, (name, img) in enumerate(char_imgs):
                     x = start_x + i * (PLAYER_SIZE + spacing)
                     rect = pygame.Rect(x, y, PLAYER_SIZE, PLAYER_SIZE)
-                    if rect.collidepoint(event.pos):
+                    if rect.collidepoint(to_logical(event.pos)):
                         selected = i
-                        if sounds['select']:
-                            sounds['select'].play()
-        pygame.display.flip()
+                        sounds.play('select')
+        present()
         clock.tick(FPS)
     return CHARACTER_OPTIONS[selected][1]
 
+# --- ASSET PRELOAD ---
+def preload_assets(workers=None):
+    # Decode everything in assets_manifest.json on worker threads behind a progress bar.
+    # Results are installed into the sprite and sound caches here, on the main thread.
+    try:
+        manifest = load_manifest()
+    except (OSError, ValueError):
+        return None  # No manifest: assets still load lazily on first use
+    loader = AssetLoader(workers) if workers else AssetLoader()
+    # Baked sprites are already in the cache (init_display() installs them); decode the rest
+    for path, size, fallback_color in manifest['sprites']:
+        key = (path, tuple(size))
+        if key not in _sprite_cache:
+            loader.submit(('sprite', key), decode_sprite, path, render_size(key[1]), tuple(fallback_color), path=path)
+    if sounds.voices:
+        for name, path in manifest['sounds'].items():
+            if name not in sounds.sounds:
+                loader.submit(('sound', name), load_pcm, name, path, path=path)
+    font = ui_font(36)
+    bar = pygame.Rect(SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2, 400, 24)
+    while True:
+        for (kind, key), asset in loader.poll():
+            if kind == 'sprite':
+                _sprite_cache[key] = asset
+            else:
+                sounds.sounds[key] = asset
+        if loader.done:
+            break
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+        screen.fill(BG_COLOR)
+        text = font.render(f"Loading... {loader.progress:.0%}", True, (30, 30, 30))
+        blit_centered(text, bar.y - 50)
+        filled = pygame.Rect(bar.x, bar.y, max(1, int(bar.width * loader.progress)), bar.height)
+        pygame.draw.rect(screen, (30, 30, 30), (*to_screen(filled.x, filled.y), *render_size(filled.size)))
+        draw_ui_rect((30, 30, 30), bar, 2)
+        present()
+        clock.tick(FPS)
+    print(loader.report())
+    return loader
+
 # --- KEY OBJECT FOR POP-OUT ---
 class FallingKey:
     def __init__(self, x, y, key_type):
@@ -472,11 +654,7 @@ class FallingKey:
         self.key_type = key_type
         self.vel_y = 0
         self.collected = False
-        try:
-            self.sprite = pygame.image.load(f'Sprites/Tiles/Default/{key_type}.png')
-            self.sprite = pygame.transform.scale(self.sprite, (self.width, self.height))
-        except:
-            self.sprite = pygame.Surface((self.width, self.height)); self.sprite.fill((255, 255, 0))
+        self.sprite = load_sprite(f'Sprites/Tiles/Default/{key_type}.png', (self.width, self.height), (255, 255, 0))
     def update(self, platforms, locks):
         if self.collected:
             return
@@ -488,9 +666,9 @@ class FallingKey:
                 self.y + self.height > obj.y and self.y + self.height - obj.y < 20):
                 self.y = obj.y - self.height
                 self.vel_y = 0
-    def draw(self, screen, camera_x):
+    def draw(self, queue, camera_x):
         if not self.collected:
-            screen.blit(self.sprite, (self.x - camera_x, self.y))
+            queue.add(LAYER_ITEMS, self.sprite, to_screen(self.x - camera_x, self.y))
     def check_collision(self, player):
         return (not self.collected and
                 player.x < self.x + self.width and
@@ -499,527 +677,663 @@ class FallingKey:
                 player.y + player.height > self.y)
 
 # --- LEVEL GENERATION ---
-def generate_level(level_num, player_keys=None):
-    platforms = []
-    enemies = []
-    coins = []
-    decorations = []
-    coin_blocks = []
-    water_tiles = []
-    lava_tiles = []
-    bridges = []
-    locks = []
-    exclamation_blocks = []
-    keys = []
-    BLOCK_GAP = 24
-    BLOCK_SIZE = 48
-    lock_colors = ['blue', 'green', 'red', 'yellow']
+def build_level_objects(level_data, x_offset=0):
+    # Instantiate the game objects for level data in the vae_sample format
+    ground_y = level_data['ground_y']
+    platforms = [Platform(x_offset, ground_y, level_data['ground_length'], 100, "grass")]
+    for x, y, w, h, platform_type in level_data['platforms']:
+        platforms.append(Platform(x + x_offset, y, w, h, platform_type))
+    enemies = [Enemy(x + x_offset, y, enemy_type) for x, y, enemy_type in level_data['enemies']]
+    coins = [Coin(x + x_offset, y) for x, y in level_data['coins']]
+    decorations = [Decoration(x + x_offset, y, sprite_path, w, h) for sprite_path, x, y, w, h in level_data['decorations']]
+    return platforms, enemies, coins, decorations
+
+def instantiate_level(compiled):
+    # Build fresh game objects from a cached CompiledLevel; only lock colours are rolled per load
     lock_type = None
     key_type = None
-    if level_num >= 4:
-        color = random.choice(lock_colors)
+    if compiled.has_lock:
+        color = random.choice(LOCK_COLORS)
         lock_type = f'lock_{color}'
         key_type = f'key_{color}'
-    if level_num == 1:
-        ground_y = SCREEN_HEIGHT - 100
-        ground_length = 1600
-        platforms.append(Platform(0, ground_y, ground_length, 100, "grass"))
-        p1 = Platform(400, ground_y - 120, 150, 40, "wood")
-        p2 = Platform(900, ground_y - 200, 150, 40, "stone")
-        platforms.extend([p1, p2])
-        enemies.append(Enemy(600, ground_y - ENEMY_SIZE, "slime"))
-        coins.extend([Coin(300, ground_y - 60), Coin(800, ground_y - 160), Coin(1200, ground_y - 60)])
-        # decorations only
-        decorations.extend([
-            Decoration(350, ground_y - 48, 'Sprites/Tiles/Default/mushroom_brown.png', 48, 48),
-            Decoration(1200, ground_y - 48, 'Sprites/Tiles/Default/mushroom_red.png', 48, 48),
-        ])
-    elif level_num == 2:
-        ground_y = SCREEN_HEIGHT - 100
-        ground_length = 1800
-        platforms.append(Platform(0, ground_y, ground_length, 100, "grass"))
-        p1 = Platform(300, ground_y - 120, 150, 40, "wood")
-        p2 = Platform(700, ground_y - 200, 150, 40, "stone")
-        p3 = Platform(1200, ground_y - 150, 150, 40, "wood")
-        p4 = Platform(1500, ground_y - 250, 100, 40, "stone")
-        platforms.extend([p1, p2, p3, p4])
-        water_tiles.append((900, ground_y, 120, 40, True))
-        enemies.append(Enemy(600, ground_y - ENEMY_SIZE, "slime"))
-        enemies.append(Enemy(1300, ground_y - ENEMY_SIZE, "snail"))
-        coins.extend([Coin(400, ground_y - 60), Coin(1000, ground_y - 160), Coin(1400, ground_y - 60), Coin(1600, ground_y - 200)])
-        decorations.extend([
-            Decoration(500, ground_y - 48, 'Sprites/Tiles/Default/mushroom_brown.png', 48, 48),
-            Decoration(1400, ground_y - 48, 'Sprites/Tiles/Default/mushroom_red.png', 48, 48),
-        ])
-    elif level_num == 3:
-        ground_y = SCREEN_HEIGHT - 100
-        ground_length = 2000
-        platforms.append(Platform(0, ground_y, ground_length, 100, "grass"))
-        p1 = Platform(400, ground_y - 120, 150, 40, "wood")
-        p2 = Platform(800, ground_y - 200, 150, 40, "stone")
-        p3 = Platform(1200, ground_y - 250, 100, 40, "wood")
-        p4 = Platform(1600, ground_y - 180, 120, 40, "stone")
-        platforms.extend([p1, p2, p3, p4])
-        water_tiles.append((1100, ground_y, 120, 40, True))
-        enemies.append(Enemy(600, ground_y - ENEMY_SIZE, "snail"))
-        enemies.append(Enemy(1300, ground_y - ENEMY_SIZE, "bee"))
-        enemies.append(Enemy(1700, ground_y - ENEMY_SIZE, "slime"))
-        coins.extend([Coin(400, ground_y - 60), Coin(900, ground_y - 160), Coin(1400, ground_y - 60), Coin(1800, ground_y - 200)])
-        decorations.extend([
-            Decoration(500, ground_y - 48, 'Sprites/Tiles/Default/mushroom_brown.png', 48, 48),
-            Decoration(1500, ground_y - 48, 'Sprites/Tiles/Default/mushroom_red.png', 48, 48),
-        ])
-    elif level_num == 4:
-        ground_y = SCREEN_HEIGHT - 100
-        ground_length = 2200
-        platforms.append(Platform(0, ground_y, ground_length, 100, "grass"))
-        platforms.append(Platform(300, ground_y - 120, 120, 40, "wood"))
-        platforms.append(Platform(700, ground_y - 200, 120, 40, "stone"))
-        platforms.append(Platform(1100, ground_y - 250, 100, 40, "wood"))
-        platforms.append(Platform(1500, ground_y - 180, 120, 40, "stone"))
-        platforms.append(Platform(1900, ground_y - 220, 100, 40, "wood"))
-        water_tiles.append((600, ground_y, 120, 40, True))
-        locks.append((1400, ground_y - 100, lock_type))
-        enemies.append(Enemy(900, ground_y - ENEMY_SIZE, "snail"))
-        coins.extend([Coin(350, ground_y - 60), Coin(800, ground_y - 160), Coin(1300, ground_y - 60), Coin(1700, ground_y - 200), Coin(2100, ground_y - 60)])
-        decorations.extend([
-            Decoration(350, ground_y - 48, 'Sprites/Tiles/Default/mushroom_brown.png', 48, 48),
-            Decoration(1200, ground_y - 48, 'Sprites/Tiles/Default/mushroom_red.png', 48, 48),
-        ])
-        # Add more reachable platforms for level 4+
-        platforms.append(Platform(600, 400, 120, 40, "stone"))
-        platforms.append(Platform(1000, 350, 120, 40, "wood"))
-        platforms.append(Platform(1400, 300, 120, 40, "stone"))
-    elif level_num == 5:
-        ground_y = SCREEN_HEIGHT - 100
-        ground_length = 2400
-        platforms.append(Platform(0, ground_y, ground_length, 100, "grass"))
-        platforms.append(Platform(400, ground_y - 120, 150, 40, "wood"))
-        platforms.append(Platform(900, ground_y - 200, 150, 40, "stone"))
-        platforms.append(Platform(1400, ground_y - 250, 100, 40, "wood"))
-        platforms.append(Platform(1800, ground_y - 180, 120, 40, "stone"))
-        platforms.append(Platform(2100, ground_y - 220, 100, 40, "wood"))
-        water_tiles.append((700, ground_y, 120, 40, True))
-        locks.append((1600, ground_y - 100, lock_type))
-        enemies.append(Enemy(600, ground_y - ENEMY_SIZE, "snail"))
-        enemies.append(Enemy(1300, ground_y - ENEMY_SIZE, "bee"))
-        coins.extend([Coin(400, ground_y - 60), Coin(900, ground_y - 160), Coin(1400, ground_y - 60), Coin(1800, ground_y - 200), Coin(2200, ground_y - 60)])
-        decorations.extend([
-            Decoration(500, ground_y - 48, 'Sprites/Tiles/Default/mushroom_brown.png', 48, 48),
-            Decoration(2000, ground_y - 48, 'Sprites/Tiles/Default/mushroom_red.png', 48, 48),
-        ])
-    elif level_num == 6:
-        ground_y = SCREEN_HEIGHT - 100
-        ground_length = 2600
-        platforms.append(Platform(0, ground_y, ground_length, 100, "grass"))
-        platforms.append(Platform(400, ground_y - 120, 150, 40, "wood"))
-        platforms.append(Platform(900, ground_y - 200, 150, 40, "stone"))
-        platforms.append(Platform(1400, ground_y - 250, 100, 40, "wood"))
-        platforms.append(Platform(1800, ground_y - 180, 120, 40, "stone"))
-        platforms.append(Platform(2300, ground_y - 220, 100, 40, "wood"))
-        water_tiles.append((1200, ground_y, 120, 40, True))
-        locks.append((1800, ground_y - 100, lock_type))
-        enemies.append(Enemy(600, ground_y - ENEMY_SIZE, "snail"))
-        enemies.append(Enemy(1300, ground_y - ENEMY_SIZE, "bee"))
-        enemies.append(Enemy(2000, ground_y - ENEMY_SIZE, "slime"))
-        coins.extend([Coin(400, ground_y - 60), Coin(900, ground_y - 160), Coin(1400, ground_y - 60), Coin(1800, ground_y - 200), Coin(2400, ground_y - 60)])
-        decorations.extend([
-            Decoration(500, ground_y - 48, 'Sprites/Tiles/Default/mushroom_brown.png', 48, 48),
-            Decoration(2200, ground_y - 48, 'Sprites/Tiles/Default/mushroom_red.png', 48, 48),
-        ])
-    else:
-        from vae_sample import generate_level_with_vae
-        level_data = generate_level_with_vae(level_num=level_num)
-        ground_y = level_data['ground_y']
-        ground_length = level_data['ground_length']
-        platforms.append(Platform(0, ground_y, ground_length, 100, "grass"))
-        for platform_data in level_data['platforms']:
-            x, y, w, h, platform_type = platform_data
-            platforms.append(Platform(x, y, w, h, platform_type))
-        for enemy_data in level_data['enemies']:
-            x, y, enemy_type = enemy_data
-            enemies.append(Enemy(x, y, enemy_type))
-        for coin_data in level_data['coins']:
-            x, y = coin_data
-            coins.append(Coin(x, y))
-        for decoration_data in level_data['decorations']:
-            sprite_path, x, y, w, h = decoration_data
-            decorations.append(Decoration(x, y, sprite_path, w, h))
-        flag_x, flag_y = level_data['flag']
-        flag = Flag(flag_x, flag_y)
-        return platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys
-    flag = Flag(ground_length - 100, ground_y - 64)
-
-    # After adding water tiles, split any platform that overlaps with water horizontally at the same y
-    new_platforms = []
-    for p in platforms:
-        overlap = False
-        for wx, wy, ww, wh, _ in water_tiles:
-            if p.y == wy and p.x < wx + ww and p.x + p.width > wx:
-                overlap = True
-                # Left segment (if any)
-                if p.x < wx:
-                    new_platforms.append(Platform(p.x, p.y, wx - p.x, p.height, p.platform_type))
-                # Right segment (if any)
-                if p.x + p.width > wx + ww:
-                    new_platforms.append(Platform(wx + ww, p.y, (p.x + p.width) - (wx + ww), p.height, p.platform_type))
-                break
-        if not overlap:
-            new_platforms.append(p)
-    platforms = new_platforms
-
-    # Place blocks above platforms, always centered, never stacked or overlapped
-    block_platforms = [p for p in platforms if p.platform_type in ('stone', 'wood') and p.width >= 48]
-    block_platforms.sort(key=lambda p: (p.y, p.x))  # deterministic order
-    ex_block_placed = False
-    for p in block_platforms:
-        block_y = p.y - 72 - BLOCK_GAP - 8  # Add 8px gap above platform
-        if block_y <= 0:
-            continue
-        if lock_type is not None and not ex_block_placed:
-            # Place both blocks side by side if possible
-            if p.width >= 96:
-                start_x = p.x + p.width // 2 - 48
-                coin_blocks.append((start_x, block_y))
-                exclamation_blocks.append((start_x + BLOCK_SIZE, block_y, key_type))
-                ex_block_placed = True
-                continue
-            else:
-                # Only exclamation block, centered
-                block_x = p.x + p.width // 2 - 24
-                exclamation_blocks.append((block_x, block_y, key_type))
-                ex_block_placed = True
-                continue
-        # Otherwise, only coin block, centered
-        block_x = p.x + p.width // 2 - 24
-        coin_blocks.append((block_x, block_y))
-    return platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys
+    platforms = [Platform(x, y, w, h, platform_type, sprite_path) for x, y, w, h, platform_type, sprite_path in compiled.platforms]
+    enemies = [Enemy(x, y, enemy_type) for x, y, enemy_type in compiled.enemies]
+    coins = [Coin(x, y) for x, y in compiled.coins]
+    decorations = [Decoration(x, y, sprite_path, w, h) for sprite_path, x, y, w, h in compiled.decorations]
+    flag = Flag(*compiled.flag)
+    coin_blocks = list(compiled.coin_blocks)
+    exclamation_blocks = [(x, y, key_type) for x, y in compiled.exclamation_blocks]
+    locks = [(x, y, lock_type) for x, y in compiled.locks]
+    return platforms, enemies, coins, flag, decorations, coin_blocks, list(compiled.water_tiles), list(compiled.lava_tiles), [], locks, exclamation_blocks, []
 
-# --- MAIN GAME LOOP ---
-def main():
-    # Character selection
-    char_img_path = character_select_screen()
-    
-    # Set starting level
-    current_level = 1
-    
-    score = 0
-    coins_collected = 0
-    player_keys = set()
-    platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys = generate_level(current_level, player_keys)
+def generate_level(level_num, player_keys=None):
+    # Hand-built levels come from levels/level_<n>.json, everything else from the VAE
+    if has_level_definition(level_num):
+        return instantiate_level(get_compiled_level(level_num, PLATFORM_TYPES))
+    return vae_level(generate_level_with_vae(level_num=level_num))
+
+def vae_level(level_data):
+    # generate_level() tuple for VAE level data
+    platforms, enemies, coins, decorations = build_level_objects(level_data)
+    flag_x, flag_y = level_data['flag']
+    flag = Flag(flag_x, flag_y)
+    return platforms, enemies, coins, flag, decorations, [], [], [], [], [], [], []
+
+def generate_unseen_level(level_num):
+    # Runs on a service thread; a cancelled prefetch may still be running, hence the lock
+    with seen_levels_lock:
+        return generate_level_with_vae(level_num=level_num, seen=seen_levels)
+
+async def prefetch_level(services, level_num):
+    # Service: sample the next VAE level on a worker thread while this one is played,
+    # then build its objects (sprite loads) on the loop thread within the frame budget
+    level_data = await services.run_in_thread(generate_unseen_level, level_num)
+    await services.checkpoint()
+    return vae_level(level_data)
+
+# --- LEVEL SNAPSHOT ---
+def build_level_state(level_num, char_img_path, player_keys=None, level=None):
+    # Everything main() needs for a fresh level, with block objects built up front so they can be snapshotted.
+    # `level` is a prebuilt generate_level() tuple (e.g. a stress level); by default level_num is generated
+    if level is None:
+        level = generate_level(level_num, player_keys)
+    coin_block_objs = [CoinBlock(x, y) for x, y in level[5]]
+    ex_block_objs = [ExclamationBlock(x, y, ex_type) for x, y, ex_type in level[10]]
     player = Player(100, 400, char_img_path)
-    camera_x = 0
-    running = True
-    game_over = False
-    level_completed = False
-    game_beaten = False  # New state for game completion
-    font = pygame.font.Font(None, 36)
-    instructions_font = pygame.font.Font(None, 24)
-    
-    try:
-        btn_left = pygame.image.load('Sprites/Tiles/Default/sign_left.png')
-        btn_left = pygame.transform.scale(btn_left, (80, 80))
-    except:
-        btn_left = pygame.Surface((80, 80)); btn_left.fill((100, 100, 100))
-    try:
-        btn_right = pygame.image.load('Sprites/Tiles/Default/sign_right.png')
-        btn_right = pygame.transform.scale(btn_right, (80, 80))
-    except:
-        btn_right = pygame.Surface((80, 80)); btn_right.fill((100, 100, 100))
-    try:
-        btn_exit = pygame.image.load('Sprites/Tiles/Default/sign_exit.png')
-        btn_exit = pygame.transform.scale(btn_exit, (80, 80))
-    except:
-        btn_exit = pygame.Surface((80, 80)); btn_exit.fill((100, 100, 100))
-    key_collected_popup_timer = 0
-    key_collected_popup_text = None
-    coin_block_objs = []
-    ex_block_objs = []
-    falling_key_obj = None
-    while running:
+    return level + (coin_block_objs, ex_block_objs, player)
+
+class LevelSnapshot:
+    # Copies the attributes of every object in a level state right after it is built,
+    # so a restart can rewind them in place instead of rebuilding (or re-rolling) the level
+    def __init__(self, state):
+        self.state = state
+        self.records = []
+        seen = set()
+        for part in state:
+            for obj in (part if isinstance(part, list) else [part]):
+                self._capture(obj, seen)
+    def _capture(self, obj, seen):
+        if not hasattr(obj, '__dict__') or id(obj) in seen:
+            return
+        seen.add(id(obj))
+        self.records.append((obj, obj.__dict__.copy()))
+        # Nested entities such as ExclamationBlock.key
+        for value in list(obj.__dict__.values()):
+            self._capture(value, seen)
+    def restore(self):
+        for obj, attrs in self.records:
+            obj.__dict__.clear()
+            obj.__dict__.update(attrs)
+        # Fresh list objects, since the game loop filters some of them in place
+        return tuple(list(part) if isinstance(part, list) else part for part in self.state)
+
+# --- INPUT ---
+def read_controls():
+    # Keyboard state as the (left, right, jump) tuple Player.update takes
+    keys = pygame.key.get_pressed()
+    return (bool(keys[pygame.K_LEFT] or keys[pygame.K_a]),
+            bool(keys[pygame.K_RIGHT] or keys[pygame.K_d]),
+            bool(keys[pygame.K_UP] or keys[pygame.K_w] or keys[pygame.K_SPACE]))
+
+def seed_everything(seed):
+    # Lock colours, VAE sampling and VAE post-processing are the only sources of randomness
+    random.seed(seed)
+    torch.manual_seed(seed)
+
+class TickInput:
+    # Everything main() reads from the player in one tick
+    def __init__(self, quit=False, keydowns=(), controls=(False, False, False), mouse_pos=(0, 0), mouse_down=False):
+        self.quit = quit
+        self.keydowns = keydowns
+        self.controls = controls
+        self.mouse_pos = mouse_pos
+        self.mouse_down = mouse_down
+
+class LiveInput:
+    # Polls the real keyboard and mouse; replay.py provides recording and replaying sources
+    def poll(self):
+        quit = False
+        keydowns = []
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                running = False
+                quit = True
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_r and game_over:
-                    # FULL RESET of current level state
-                    coins_collected = 0
-                    player_keys = set()
-                    platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys = generate_level(current_level, player_keys)
-                    player = Player(100, 400, char_img_path)
-                    camera_x = 0
-                    game_over = False
-                    level_completed = False
-                    game_beaten = False
-                    coin_block_objs = []
-                    ex_block_objs = []
-                    falling_key_obj = None
-                    key_collected_popup_timer = 0
-                    key_collected_popup_text = None
-                elif not game_over and not level_completed and not game_beaten:
-                    if event.key == pygame.K_0 or (pygame.K_1 <= event.key <= pygame.K_9):
-                        coin_block_objs = []
-                        ex_block_objs = []
-                        falling_key_obj = None
-        if not game_over and not level_completed and not game_beaten:
-            if not coin_block_objs:
-                coin_block_objs = [CoinBlock(x, y) for x, y in coin_blocks]
-            if not ex_block_objs:
-                ex_block_objs = [ExclamationBlock(x, y, ex_type) for x, y, ex_type in exclamation_blocks]
-            # Coin block state change
-            for cb in coin_block_objs:
-                if cb.has_coin and cb.check_collision(player):
-                    cb.has_coin = False
-                    score += 100
-                    coins_collected += 1
-                    if sounds['coin']:
-                        sounds['coin'].play()
-            # Coin collection
-            for coin in coins:
-                if coin.check_collision(player):
-                    coin.collected = True
-                    score += 100
-                    coins_collected += 1
-                    if sounds['coin']:
-                        sounds['coin'].play()
-            # Exclamation block state change
-            for ex in ex_block_objs:
-                if ex.has_key and ex.check_collision(player):
-                    ex.has_key = False
-                    # Spawn falling key above exclamation block
-                    if falling_key_obj is None:
-                        falling_key_obj = FallingKey(ex.x + ex.width//2 - 16, ex.y - 32, ex.key_type)
-            # Update falling key
-            if falling_key_obj:
-                lock_objs = [Lock(x, y, lock_type) for x, y, lock_type in locks]
-                falling_key_obj.update(platforms, lock_objs)
-                if falling_key_obj.check_collision(player):
-                    falling_key_obj.collected = True
-                    player_keys.add(falling_key_obj.key_type)
-                    key_collected_popup_timer = 60
-                    key_collected_popup_text = 'Key collected!'
-            # Key collection from exclamation block (legacy, for safety)
-            for ex in ex_block_objs:
-                if not ex.has_key and not ex.key.collected and ex.key.check_collision(player):
-                    ex.key.collected = True
-                    player_keys.add(ex.key.key_type)
-                    key_collected_popup_timer = 60
-                    key_collected_popup_text = 'Key collected!'
-            alive = player.update(platforms)
-            for enemy in enemies:
-                enemy.update(platforms)
-            for coin in coins:
-                coin.update()
-            for enemy in enemies:
-                if player.check_collision(enemy):
-                    game_over = True
-                    if sounds['hurt']:
-                        sounds['hurt'].play()
-            coins = [c for c in coins if not c.collected]
-            camera_x = max(0, player.x - SCREEN_WIDTH // 2)
-            if player.check_collision(flag):
-                level_completed = True
-                # Check if this was level 10 (game completion)
-                if current_level == 10:
-                    game_beaten = True
-            # Game over if player falls off the map (even after flag)
-            if not alive or player.y > SCREEN_HEIGHT:
-                game_over = True
-                if sounds['hurt']:
-                    sounds['hurt'].play()
-        screen.blit(background, (0, 0))
-        for platform in platforms:
-            platform.draw(screen, camera_x)
-        for coin in coins:
-            coin.draw(screen, camera_x)
-        for enemy in enemies:
-            enemy.draw(screen, camera_x)
-        player.draw(screen, camera_x)
-        flag.draw(screen, camera_x)
-        for decoration in decorations:
-            decoration.draw(screen, camera_x)
+                keydowns.append(event.key)
+        return TickInput(quit, keydowns, read_controls(), to_logical(pygame.mouse.get_pos()),
+                         bool(pygame.mouse.get_pressed()[0]))
+    def select_character(self):
+        return character_select_screen()
+    def after_tick(self, world):
+        pass
+
+# --- GAME WORLD ---
+
+class GameWorld:
+    # One level's simulation state plus the per-tick game rules, independent of the window.
+    # main() drives it from the keyboard; game_sim.GameSim drives it headless from actions.
+    def __init__(self, level_num, char_img_path, player_keys=None, score=0, level=None):
+        self.level_num = level_num
+        self.char_img_path = char_img_path
+        self.player_keys = set() if player_keys is None else player_keys
+        self.score = score
+        state = build_level_state(level_num, char_img_path, self.player_keys, level)
+        self.snapshot = LevelSnapshot(state)
+        self.load(state)
+        self._nav = None
+    def load(self, state):
+        (self.platforms, self.enemies, self.coins, self.flag, self.decorations, self.coin_blocks,
+         self.water_tiles, self.lava_tiles, self.bridges, self.locks, self.exclamation_blocks, self.keys,
+         self.coin_block_objs, self.ex_block_objs, self.player) = state
+        self.camera_x = 0
+        self.coins_collected = 0
+        self.game_over = False
+        self.level_completed = False
+        self.game_beaten = False
+        self.falling_key_obj = None
+        self.key_collected_popup_timer = 0
+        self.key_collected_popup_text = None
+    def restart(self):
+        # FULL RESET of current level state: rewind to the snapshot taken when it was built
+        self.player_keys = set()
+        self.load(self.snapshot.restore())
+    @property
+    def nav(self):
+        # Built on first use (the F4 route overlay); platforms never move, so it is kept across restarts
+        if self._nav is None:
+            self._nav = NavGraph.build(self.platforms, JumpPhysics.from_player(self.player))
+        return self._nav
+    def route_to_flag(self):
+        # World points from the player along the cheapest platform route to the flag; [] if there is none
+        player, flag = self.player, self.flag
+        start = self.nav.node_below(player.x, player.y, player.height)
+        goal = self.nav.node_below(flag.x, flag.y, flag.height)
+        if start is None or goal is None:
+            return []
+        path = self.nav.path(start, goal)
+        if not path:
+            return []
+        points = [(player.x + player.width / 2, player.y + player.height)]
+        for node in path[1:]:
+            points.append((float(self.nav.left[node] + self.nav.right[node] + player.width) / 2,
+                           float(self.nav.top[node])))
+        points.append((flag.x + flag.width / 2, flag.y + flag.height))
+        return points
+    def reset_blocks(self):
+        self.coin_block_objs = []
+        self.ex_block_objs = []
+        self.falling_key_obj = None
+    @property
+    def playing(self):
+        return not self.game_over and not self.level_completed and not self.game_beaten
+    def tick(self, controls=None):
+        # Advance one frame; `controls` is (left, right, jump), None reads the keyboard
+        if not self.playing:
+            return
+        player = self.player
+        profiler.phase('collisions')
+        if not self.coin_block_objs:
+            self.coin_block_objs = [CoinBlock(x, y) for x, y in self.coin_blocks]
+        if not self.ex_block_objs:
+            self.ex_block_objs = [ExclamationBlock(x, y, ex_type) for x, y, ex_type in self.exclamation_blocks]
+        # Coin block state change
+        for cb in self.coin_block_objs:
+            if cb.has_coin and cb.check_collision(player):
+                cb.has_coin = False
+                self.score += 100
+                self.coins_collected += 1
+                sounds.play('coin')
+        # Coin collection
+        for coin in self.coins:
+            if coin.check_collision(player):
+                coin.collected = True
+                self.score += 100
+                self.coins_collected += 1
+                sounds.play('coin')
+        # Exclamation block state change
+        for ex in self.ex_block_objs:
+            if ex.has_key and ex.check_collision(player):
+                ex.has_key = False
+                # Spawn falling key above exclamation block
+                if self.falling_key_obj is None:
+                    self.falling_key_obj = FallingKey(ex.x + ex.width//2 - 16, ex.y - 32, ex.key_type)
+        # Update falling key
+        if self.falling_key_obj:
+            lock_objs = [Lock(x, y, lock_type) for x, y, lock_type in self.locks]
+            self.falling_key_obj.update(self.platforms, lock_objs)
+            if self.falling_key_obj.check_collision(player):
+                self.falling_key_obj.collected = True
+                self.player_keys.add(self.falling_key_obj.key_type)
+                self.key_collected_popup_timer = 60
+                self.key_collected_popup_text = 'Key collected!'
+        # Key collection from exclamation block (legacy, for safety)
+        for ex in self.ex_block_objs:
+            if not ex.has_key and not ex.key.collected and ex.key.check_collision(player):
+                ex.key.collected = True
+                self.player_keys.add(ex.key.key_type)
+                self.key_collected_popup_timer = 60
+                self.key_collected_popup_text = 'Key collected!'
+        profiler.phase('player')
+        alive = player.update(self.platforms, controls)
+        profiler.phase('enemies')
+        for enemy in self.enemies:
+            enemy.update(self.platforms)
+        for enemy in self.enemies:
+            if player.check_collision(enemy):
+                self.game_over = True
+                sounds.play('hurt')
+        # Coins, camera, flag and falling off the map
+        profiler.phase('rules')
+        for coin in self.coins:
+            coin.update()
+        self.coins = [c for c in self.coins if not c.collected]
+        self.camera_x = max(0, player.x - SCREEN_WIDTH // 2)
+        if player.check_collision(self.flag):
+            self.level_completed = True
+            # Check if this was level 10 (game completion)
+            if self.level_num == 10:
+                self.game_beaten = True
+        # Game over if player falls off the map (even after flag)
+        if not alive or player.y > SCREEN_HEIGHT:
+            self.game_over = True
+            sounds.play('hurt')
+    def draw(self, render_queue):
+        # Submit every world sprite; the caller flushes the queue
+        camera_x = self.camera_x
+        for platform in self.platforms:
+            platform.draw(render_queue, camera_x)
+        for coin in self.coins:
+            coin.draw(render_queue, camera_x)
+        for enemy in self.enemies:
+            enemy.draw(render_queue, camera_x)
+        self.player.draw(render_queue, camera_x)
+        self.flag.draw(render_queue, camera_x)
+        for decoration in self.decorations:
+            decoration.draw(render_queue, camera_x)
         # Draw water tiles (fill vertically)
-        for x, y, w, h, top in water_tiles:
+        for x, y, w, h, top in self.water_tiles:
             # Draw top tile
-            try:
-                sprite_top = pygame.image.load('Sprites/Tiles/Default/water_top.png')
-                sprite_top = pygame.transform.scale(sprite_top, (w, h))
-            except:
-                sprite_top = pygame.Surface((w, h)); sprite_top.fill((0, 100, 255))
-            screen.blit(sprite_top, (x - camera_x, y))
+            sprite_top = load_sprite('Sprites/Tiles/Default/water_top.png', (w, h), (0, 100, 255))
+            render_queue.add(LAYER_LIQUID, sprite_top, to_screen(x - camera_x, y))
             # Fill below with water.png
             fill_y = y + h
-            try:
-                sprite_fill = pygame.image.load('Sprites/Tiles/Default/water.png')
-                sprite_fill = pygame.transform.scale(sprite_fill, (w, h))
-            except:
-                sprite_fill = pygame.Surface((w, h)); sprite_fill.fill((0, 100, 255))
+            sprite_fill = load_sprite('Sprites/Tiles/Default/water.png', (w, h), (0, 100, 255))
             while fill_y < SCREEN_HEIGHT:
-                screen.blit(sprite_fill, (x - camera_x, fill_y))
+                render_queue.add(LAYER_LIQUID, sprite_fill, to_screen(x - camera_x, fill_y))
                 fill_y += h
         # Draw lava tiles (fill vertically)
-        for x, y, w, h, top in lava_tiles:
+        for x, y, w, h, top in self.lava_tiles:
             # Draw top tile
-            try:
-                sprite_top = pygame.image.load('Sprites/Tiles/Default/lava_top.png')
-                sprite_top = pygame.transform.scale(sprite_top, (w, h))
-            except:
-                sprite_top = pygame.Surface((w, h)); sprite_top.fill((255, 80, 0))
-            screen.blit(sprite_top, (x - camera_x, y))
+            sprite_top = load_sprite('Sprites/Tiles/Default/lava_top.png', (w, h), (255, 80, 0))
+            render_queue.add(LAYER_LIQUID, sprite_top, to_screen(x - camera_x, y))
             # Fill below with lava.png
             fill_y = y + h
-            try:
-                sprite_fill = pygame.image.load('Sprites/Tiles/Default/lava.png')
-                sprite_fill = pygame.transform.scale(sprite_fill, (w, h))
-            except:
-                sprite_fill = pygame.Surface((w, h)); sprite_fill.fill((255, 80, 0))
+            sprite_fill = load_sprite('Sprites/Tiles/Default/lava.png', (w, h), (255, 80, 0))
             while fill_y < SCREEN_HEIGHT:
-                screen.blit(sprite_fill, (x - camera_x, fill_y))
+                render_queue.add(LAYER_LIQUID, sprite_fill, to_screen(x - camera_x, fill_y))
                 fill_y += h
         # Draw coin blocks
-        for cb in coin_block_objs:
-            cb.draw(screen, camera_x)
+        for cb in self.coin_block_objs:
+            cb.draw(render_queue, camera_x)
         # Draw locks (make solid)
-        lock_objs = [Lock(x, y, lock_type) for x, y, lock_type in locks]
+        lock_objs = [Lock(x, y, lock_type) for x, y, lock_type in self.locks]
         for lock in lock_objs:
-            lock.draw(screen, camera_x)
+            lock.draw(render_queue, camera_x)
         # Draw exclamation blocks
-        for ex in ex_block_objs:
-            ex.draw(screen, camera_x)
+        for ex in self.ex_block_objs:
+            ex.draw(render_queue, camera_x)
         # Draw falling key
-        if falling_key_obj and not falling_key_obj.collected:
-            falling_key_obj.draw(screen, camera_x)
-        # Draw HUD (bottom left)
-        hud_bg = pygame.Surface((320, 110), pygame.SRCALPHA)
-        hud_bg.fill((0, 0, 0, 120))
-        screen.blit(hud_bg, (10, SCREEN_HEIGHT - 120))
-        level_text = font.render(f"LEVEL {current_level}", True, (255,255,255))
-        screen.blit(level_text, (20, SCREEN_HEIGHT - 110))
-        score_text = font.render(f"Score: {score}", True, (255,255,255))
-        screen.blit(score_text, (20, SCREEN_HEIGHT - 80))
-        coins_text = font.render(f"Coins: {coins_collected}", True, (255,255,255))
-        screen.blit(coins_text, (20, SCREEN_HEIGHT - 50))
-        
-        # Draw controls/instructions (bottom right)
-        instructions = [
-            "Arrow Keys or WASD: Move",
-            "Space/Up: Jump",
-            "Collect all coins to win!"
-        ]
-        for i, instruction in enumerate(instructions):
-            text = instructions_font.render(instruction, True, (255,255,255))
-            screen.blit(text, (SCREEN_WIDTH - 320, SCREEN_HEIGHT - 100 + i * 20))
-        if game_over:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        if self.falling_key_obj and not self.falling_key_obj.collected:
+            self.falling_key_obj.draw(render_queue, camera_x)
+    def entity_count(self):
+        return (len(self.platforms) + len(self.enemies) + len(self.coins) + len(self.decorations) +
+                len(self.coin_block_objs) + len(self.ex_block_objs) + len(self.locks) + 2)
+
+# --- MAIN GAME LOOP ---
+def draw_hud(level_num, score, coins_collected, font, instructions_font):
+    # Draw HUD (bottom left)
+    hud_bg = ui_surface((320, 110), pygame.SRCALPHA)
+    hud_bg.fill((0, 0, 0, 120))
+    screen.blit(hud_bg, to_screen(10, SCREEN_HEIGHT - 120))
+    level_text = font.render(f"LEVEL {level_num}", True, (255,255,255))
+    screen.blit(level_text, to_screen(20, SCREEN_HEIGHT - 110))
+    score_text = font.render(f"Score: {score}", True, (255,255,255))
+    screen.blit(score_text, to_screen(20, SCREEN_HEIGHT - 80))
+    coins_text = font.render(f"Coins: {coins_collected}", True, (255,255,255))
+    screen.blit(coins_text, to_screen(20, SCREEN_HEIGHT - 50))
+
+    # Draw controls/instructions (bottom right)
+    instructions = [
+        "Arrow Keys or WASD: Move",
+        "Space/Up: Jump",
+        "Collect all coins to win!"
+    ]
+    for i, instruction in enumerate(instructions):
+        text = instructions_font.render(instruction, True, (255,255,255))
+        screen.blit(text, to_screen(SCREEN_WIDTH - 320, SCREEN_HEIGHT - 100 + i * 20))
+
+def route_points(world):
+    # F4 guidance: the cheapest route to the flag from the level's navigation graph, in screen points
+    # Drawn at the player's mid-height above each surface so the line clears the terrain
+    return [to_screen(x - world.camera_x, y - PLAYER_SIZE // 2) for x, y in world.route_to_flag()]
+
+def draw_route(points):
+    if len(points) > 1:
+        pygame.draw.lines(screen, (255, 255, 0), False, points, max(1, round(3 * RENDER_SCALE)))
+
+# The render thread of the last pipelined main() run, kept for its latency statistics
+frame_pipeline = None
+
+def main(input_source=None, level_num=1, seed=None, frame_limit=True, pipelined=False, telemetry=None):
+    # The game loop runs as an asyncio application so background services share its thread (services.py)
+    return asyncio.run(main_async(input_source, level_num, seed, frame_limit, pipelined, telemetry))
+
+async def main_async(input_source=None, level_num=1, seed=None, frame_limit=True, pipelined=False, telemetry=None):
+    # `input_source` defaults to the live keyboard and mouse; a seed makes level building reproducible.
+    # `pipelined` draws on a render thread one frame behind the simulation (pipeline.py).
+    # `telemetry` appends frame pacing and GC statistics to that JSON-lines file every few seconds
+    global frame_pipeline
+    input_source = input_source or LiveInput()
+    if seed is not None:
+        seed_everything(seed)
+    # Character selection
+    char_img_path = input_source.select_character()
+    
+    # Set starting level
+    world = GameWorld(level_num, char_img_path)
+    running = True
+    render_queue = RenderQueue()
+    font = ui_font(36)
+    instructions_font = ui_font(24)
+    
+    btn_left = load_sprite('Sprites/Tiles/Default/sign_left.png', (80, 80), (100, 100, 100))
+    btn_right = load_sprite('Sprites/Tiles/Default/sign_right.png', (80, 80), (100, 100, 100))
+    btn_exit = load_sprite('Sprites/Tiles/Default/sign_exit.png', (80, 80), (100, 100, 100))
+    profiler_font = ui_font(18, 'monospace')
+    pipeline = None
+    if pipelined:
+        from pipeline import FramePipeline, FrameSnapshot
+        def render(snapshot):
+            # Runs on the render thread; the loop thread does not touch `screen` while a frame is in flight
+            screen.blit(background, (0, 0))
+            snapshot.render_queue.flush(screen)
+            if snapshot.route:
+                draw_route(snapshot.route)
+            draw_hud(*snapshot.hud, font, instructions_font)
+            if snapshot.overlay is not None:
+                screen.blit(snapshot.overlay, (8, 8))
+        pipeline = frame_pipeline = FramePipeline(render)
+    services = ServiceHost()
+    if telemetry:
+        services.spawn(telemetry_service(services, telemetry, lambda: dict(pacer.stats(), **gc_control.stats())))
+    pacer.reset(FPS if frame_limit else 0)
+    gc_control.start()
+    loaded_world = None
+    show_route = False
+    while running:
+        if world is not loaded_world:
+            # A new level is built: collect its garbage once and freeze what survives
+            gc_control.level_loaded()
+            # Work started for the previous level is no longer wanted
+            services.cancel_scope('level')
+            if seed is None and not has_level_definition(world.level_num + 1):
+                # Seeded runs (replays) skip this: sampling the VAE early would change the random sequence
+                services.spawn(prefetch_level(services, world.level_num + 1), 'level', ('level', world.level_num + 1))
+            loaded_world = world
+        pacer.begin_tick()
+        profiler.begin_frame()
+        alloc_sampler.begin_frame()
+        profiler.phase('input')
+        tick_input = input_source.poll()
+        if tick_input.quit:
+            running = False
+        for key in tick_input.keydowns:
+            if key == pygame.K_F3:
+                profiler.toggle_overlay()
+            elif key == pygame.K_F4:
+                show_route = not show_route
+            elif key == pygame.K_r and world.game_over:
+                world.restart()
+            elif world.playing:
+                if key == pygame.K_0 or (pygame.K_1 <= key <= pygame.K_9):
+                    world.reset_blocks()
+        world.tick(tick_input.controls)
+        input_source.after_tick(world)
+        # Background services get their share of the frame between update and present
+        profiler.phase('services')
+        await services.frame_yield(SERVICE_BUDGET_MS if pacer.should_render() else 0)
+        # Behind schedule: simulate only. Menus and popups handle clicks while drawing, so they always draw
+        if world.playing and not pacer.should_render():
+            end_frame()
+            continue
+        if pipeline is not None:
+            if world.playing:
+                # Hand this frame to the render thread and present the one it just drew
+                profiler.phase('draw')
+                frame_queue = pipeline.acquire()
+                world.draw(frame_queue)
+                snapshot = FrameSnapshot(frame_queue, (world.level_num, world.score, world.coins_collected),
+                                         pacer.tick_start, route_points(world) if show_route else None,
+                                         profiler.overlay_surface(profiler_font))
+                profiler.phase('present')
+                pipeline.present(present)
+                pipeline.submit(snapshot)
+                end_frame()
+                continue
+            # Popups take clicks while drawing, so they run on this thread once the frame in flight is out
+            pipeline.present(present)
+        profiler.phase('draw')
+        screen.blit(background, (0, 0))
+        # World sprites go through the render queue, which draws them layer by layer
+        world.draw(render_queue)
+        if profiler.enabled:
+            profiler.count('dropped frames', pacer.dropped)
+            profiler.count('entities', world.entity_count())
+            profiler.count('sprites', sum(len(layer) for layer in render_queue.layers))
+            blit_calls = render_queue.blit_calls
+        render_queue.flush(screen)
+        if profiler.enabled:
+            profiler.count('blit calls', render_queue.blit_calls - blit_calls)
+        if show_route:
+            draw_route(route_points(world))
+        profiler.phase('hud')
+        draw_hud(world.level_num, world.score, world.coins_collected, font, instructions_font)
+        if world.game_over:
+            overlay = ui_surface((SCREEN_WIDTH, SCREEN_HEIGHT))
             overlay.set_alpha(128)
             overlay.fill((0,0,0))
             screen.blit(overlay, (0,0))
-            font_large = pygame.font.Font(None, 96)
-            font_small = pygame.font.Font(None, 36)
+            font_large = ui_font(96)
+            font_small = ui_font(36)
             game_over_text = font_large.render("GAME OVER", True, (255,0,0))
             restart_text = font_small.render("Press R to restart", True, (255,255,255))
-            screen.blit(game_over_text, (SCREEN_WIDTH//2 - game_over_text.get_width()//2, SCREEN_HEIGHT//2 - 60))
-            screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, SCREEN_HEIGHT//2 + 20))
-        elif game_beaten:
+            blit_centered(game_over_text, SCREEN_HEIGHT//2 - 60)
+            blit_centered(restart_text, SCREEN_HEIGHT//2 + 20)
+        elif world.game_beaten:
             # Game completion celebration screen
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            overlay = ui_surface((SCREEN_WIDTH, SCREEN_HEIGHT))
             overlay.set_alpha(200)
             overlay.fill((0,0,0))
             screen.blit(overlay, (0,0))
             
             # Main celebration text
-            font_celebration = pygame.font.Font(None, 80)  # Reduced from 120 to 80
+            font_celebration = ui_font(80)  # Reduced from 120 to 80
             celebration_text = font_celebration.render("YOU BEAT MUSTAFA SUPER BROS", True, (255,0,0))
-            screen.blit(celebration_text, (SCREEN_WIDTH//2 - celebration_text.get_width()//2, SCREEN_HEIGHT//2 - 100))
+            blit_centered(celebration_text, SCREEN_HEIGHT//2 - 100)
             
             # "Play again!!" button
-            font_play_again = pygame.font.Font(None, 48)
+            font_play_again = ui_font(48)
             play_again_text = font_play_again.render("Play again!!", True, (255,255,255))
-            play_again_rect = play_again_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50))
+            play_again_rect = text_rect(play_again_text, (SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50))
             
             # Check for mouse hover and click
-            mouse = pygame.mouse.get_pos()
-            click = pygame.mouse.get_pressed()[0]
+            mouse = tick_input.mouse_pos
+            click = tick_input.mouse_down
             
             if play_again_rect.collidepoint(mouse):
                 # Highlight on hover
-                pygame.draw.rect(screen, (255,255,0), play_again_rect.inflate(20, 10), 3)
+                draw_ui_rect((255,255,0), play_again_rect.inflate(20, 10), 3)
                 if click:
                     # Return to character select
-                    char_img_path = character_select_screen()
-                    current_level = 1
-                    score = 0
-                    coins_collected = 0
-                    player_keys = set()
-                    platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys = generate_level(current_level, player_keys)
-                    player = Player(100, 400, char_img_path)
-                    camera_x = 0
-                    game_over = False
-                    level_completed = False
-                    game_beaten = False
+                    char_img_path = input_source.select_character()
+                    world = GameWorld(1, char_img_path)
             
-            screen.blit(play_again_text, play_again_rect)
-        elif level_completed:
+            screen.blit(play_again_text, to_screen(*play_again_rect.topleft))
+        elif world.level_completed:
             popup_w, popup_h = 400, 260
             popup_x = SCREEN_WIDTH//2 - popup_w//2
             popup_y = SCREEN_HEIGHT//2 - popup_h//2
-            popup = pygame.Surface((popup_w, popup_h), pygame.SRCALPHA)
+            popup = ui_surface((popup_w, popup_h), pygame.SRCALPHA)
             popup.fill((30, 30, 30, 230))
-            screen.blit(popup, (popup_x, popup_y))
-            popup_font = pygame.font.Font(None, 48)
+            screen.blit(popup, to_screen(popup_x, popup_y))
+            popup_font = ui_font(48)
             popup_text = popup_font.render("LEVEL COMPLETED!", True, (255,255,0))
-            screen.blit(popup_text, (SCREEN_WIDTH//2 - popup_text.get_width()//2, popup_y + 30))
+            blit_centered(popup_text, popup_y + 30)
             btn_y = popup_y + 120
             btn_left_rect = pygame.Rect(popup_x + 30, btn_y, 80, 80)
             btn_exit_rect = pygame.Rect(popup_x + popup_w//2 - 40, btn_y, 80, 80)
             btn_right_rect = pygame.Rect(popup_x + popup_w - 110, btn_y, 80, 80)
-            screen.blit(btn_left, btn_left_rect)
-            screen.blit(btn_exit, btn_exit_rect)
-            screen.blit(btn_right, btn_right_rect)
-            mouse = pygame.mouse.get_pos()
-            click = pygame.mouse.get_pressed()[0]
+            screen.blit(btn_left, to_screen(*btn_left_rect.topleft))
+            screen.blit(btn_exit, to_screen(*btn_exit_rect.topleft))
+            screen.blit(btn_right, to_screen(*btn_right_rect.topleft))
+            mouse = tick_input.mouse_pos
+            click = tick_input.mouse_down
             # Left button (previous level)
             if btn_left_rect.collidepoint(mouse):
-                pygame.draw.rect(screen, (255,255,0), btn_left_rect, 3)
-                if click and current_level > 1:
-                    current_level -= 1
-                    coins_collected = 0
-                    platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys = generate_level(current_level, player_keys)
-                    player = Player(100, 400, char_img_path)
-                    camera_x = 0
-                    game_over = False
-                    level_completed = False
-                    game_beaten = False
+                draw_ui_rect((255,255,0), btn_left_rect, 3)
+                if click and world.level_num > 1:
+                    world = GameWorld(world.level_num - 1, char_img_path, world.player_keys, world.score)
             # Right button (next level)
             if btn_right_rect.collidepoint(mouse):
-                pygame.draw.rect(screen, (255,255,0), btn_right_rect, 3)
+                draw_ui_rect((255,255,0), btn_right_rect, 3)
                 if click:
-                    current_level += 1
-                    coins_collected = 0
-                    score += 500
-                    platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys = generate_level(current_level, player_keys)
-                    player = Player(100, 400, char_img_path)
-                    camera_x = 0
-                    game_over = False
-                    level_completed = False
-                    game_beaten = False
+                    world = GameWorld(world.level_num + 1, char_img_path, world.player_keys, world.score + 500,
+                                      services.take(('level', world.level_num + 1)))
             # Exit button (home/character select)
             if btn_exit_rect.collidepoint(mouse):
-                pygame.draw.rect(screen, (255,255,0), btn_exit_rect, 3)
+                draw_ui_rect((255,255,0), btn_exit_rect, 3)
                 if click:
-                    char_img_path = character_select_screen()
-                    current_level = 1
-                    score = 0
-                    coins_collected = 0
-                    player_keys = set()
-                    platforms, enemies, coins, flag, decorations, coin_blocks, water_tiles, lava_tiles, bridges, locks, exclamation_blocks, keys = generate_level(current_level, player_keys)
-                    player = Player(100, 400, char_img_path)
-                    camera_x = 0
-                    game_over = False
-                    level_completed = False
-                    game_beaten = False
-        pygame.display.flip()
-        clock.tick(FPS)
+                    char_img_path = input_source.select_character()
+                    world = GameWorld(1, char_img_path)
+        profiler.draw_overlay(screen, profiler_font)
+        profiler.phase('present')
+        present()
+        end_frame(transition=not world.playing)
+    if pipeline is not None:
+        pipeline.close(present)
+    services.close()
+    gc_control.stop()
+    profiler.close()
+    return world
+
+# --- ENDLESS MODE ---
+def endless_main(char_img_path):
+    from endless import ChunkStream
+    stream = ChunkStream(build_level_objects, view_width=SCREEN_WIDTH)
+    player = Player(100, 400, char_img_path)
+    camera_x = 0
+    score = 0
+    coins_collected = 0
+    best_distance = 0
+    game_over = False
+    running = True
+    render_queue = RenderQueue()
+    font = ui_font(36)
+    profiler_font = ui_font(18, 'monospace')
+    pacer.reset(FPS)
+    gc_control.start()
+    gc_control.level_loaded()
+    while running:
+        pacer.begin_tick()
+        profiler.begin_frame()
+        alloc_sampler.begin_frame()
+        profiler.phase('input')
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle_overlay()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_r and game_over:
+                stream.close()
+                stream = ChunkStream(build_level_objects, view_width=SCREEN_WIDTH)
+                player = Player(100, 400, char_img_path)
+                camera_x = 0
+                score = 0
+                coins_collected = 0
+                best_distance = 0
+                game_over = False
+        if not game_over:
+            # Only the chunks around the camera are live, so this cost stays constant
+            profiler.phase('stream')
+            stream.update(camera_x)
+            profiler.phase('player')
+            alive = player.update(stream.platforms)
+            profiler.phase('enemies')
+            for enemy in stream.enemies:
+                enemy.update(stream.platforms)
+            profiler.phase('collisions')
+            for coin in stream.coins:
+                coin.update()
+                if coin.check_collision(player):
+                    coin.collected = True
+                    score += 100
+                    coins_collected += 1
+                    sounds.play('coin')
+            for enemy in stream.enemies:
+                if player.check_collision(enemy):
+                    game_over = True
+                    sounds.play('hurt')
+            profiler.phase('rules')
+            player.x = max(player.x, camera_x)
+            camera_x = max(camera_x, player.x - SCREEN_WIDTH // 2)
+            best_distance = max(best_distance, int(player.x // 50))
+            if not alive or player.y > SCREEN_HEIGHT:
+                game_over = True
+                sounds.play('hurt')
+        if not pacer.should_render():
+            end_frame()
+            continue
+        profiler.phase('draw')
+        screen.blit(background, (0, 0))
+        for platform in stream.platforms:
+            platform.draw(render_queue, camera_x)
+        for decoration in stream.decorations:
+            decoration.draw(render_queue, camera_x)
+        for coin in stream.coins:
+            coin.draw(render_queue, camera_x)
+        for enemy in stream.enemies:
+            enemy.draw(render_queue, camera_x)
+        player.draw(render_queue, camera_x)
+        if profiler.enabled:
+            profiler.count('dropped frames', pacer.dropped)
+            profiler.count('entities', len(stream.platforms) + len(stream.enemies) + len(stream.coins) +
+                           len(stream.decorations) + 1)
+            profiler.count('sprites', sum(len(layer) for layer in render_queue.layers))
+            profiler.count('chunks', len(stream.active))
+        render_queue.flush(screen)
+        profiler.phase('hud')
+        hud_bg = ui_surface((320, 110), pygame.SRCALPHA)
+        hud_bg.fill((0, 0, 0, 120))
+        screen.blit(hud_bg, to_screen(10, SCREEN_HEIGHT - 120))
+        screen.blit(font.render("ENDLESS", True, (255,255,255)), to_screen(20, SCREEN_HEIGHT - 110))
+        screen.blit(font.render(f"Distance: {best_distance}m", True, (255,255,255)), to_screen(20, SCREEN_HEIGHT - 80))
+        screen.blit(font.render(f"Score: {score}", True, (255,255,255)), to_screen(20, SCREEN_HEIGHT - 50))
+        if game_over:
+            overlay = ui_surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            overlay.set_alpha(128)
+            overlay.fill((0,0,0))
+            screen.blit(overlay, (0,0))
+            font_large = ui_font(96)
+            game_over_text = font_large.render("GAME OVER", True, (255,0,0))
+            restart_text = font.render(f"You ran {best_distance}m - press R to restart", True, (255,255,255))
+            blit_centered(game_over_text, SCREEN_HEIGHT//2 - 60)
+            blit_centered(restart_text, SCREEN_HEIGHT//2 + 20)
+        profiler.draw_overlay(screen, profiler_font)
+        profiler.phase('present')
+        present()
+        end_frame(transition=game_over)
+    gc_control.stop()
+    stream.close()
+    profiler.close()
     pygame.quit()
     sys.exit()
 
@@ -1030,14 +1344,69 @@ class Decoration:
         self.y = y
         self.width = w
         self.height = h
-        try:
-            self.sprite = pygame.image.load(sprite_path)
-            self.sprite = pygame.transform.scale(self.sprite, (w, h))
-        except:
-            self.sprite = pygame.Surface((w, h))
-            self.sprite.fill((0, 255, 0))
-    def draw(self, screen, camera_x):
-        screen.blit(self.sprite, (self.x - camera_x, self.y))
+        self.sprite = load_sprite(sprite_path, (w, h), (0, 255, 0))
+    def draw(self, queue, camera_x):
+        queue.add(LAYER_PROPS, self.sprite, to_screen(self.x - camera_x, self.y))
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument('--endless', action='store_true', help="play the endless streamed mode")
+    parser.add_argument('--render-scale', type=float, default=RENDER_SCALE,
+                        help="internal render resolution as a fraction of the window, e.g. 0.5")
+    parser.add_argument('--hardware-scaling', action='store_true', default=HARDWARE_SCALING,
+                        help="let SDL upscale the render buffer (pygame.SCALED)")
+    parser.add_argument('--profile', action='store_true', help="start with the F3 frame profiler overlay open")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="record per-frame phase timings, written on exit (.csv, else Chrome-trace JSON)")
+    parser.add_argument('--max-frame-skip', type=int, default=pacer.max_skip,
+                        help="renders that may be skipped in a row to keep game speed under load (0 never skips)")
+    parser.add_argument('--frame-stats', action='store_true',
+                        help="print dropped-frame, frame-interval jitter and GC pause statistics on exit")
+    parser.add_argument('--alloc-sample', type=int, default=0, metavar='N',
+                        help="trace allocations with tracemalloc on every Nth frame (report with --frame-stats)")
+    parser.add_argument('--no-gc-control', action='store_true',
+                        help="leave Python's automatic garbage collection on during play")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="draw on a render thread, overlapping it with the next tick (one frame more latency)")
+    parser.add_argument('--telemetry', metavar='PATH',
+                        help="append frame pacing and GC statistics to a JSON-lines file every few seconds")
+    parser.add_argument('--level', type=int, default=1, help="starting level")
+    parser.add_argument('--seed', type=int, default=None, help="seed lock colours and VAE levels")
+    parser.add_argument('--record', metavar='PATH', help="record input and seed to a replay trace")
+    parser.add_argument('--replay', metavar='PATH', help="play back a trace recorded with --record")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    args = parse_args()
+    if (args.render_scale, args.hardware_scaling) != (RENDER_SCALE, HARDWARE_SCALING):
+        init_display(args.render_scale, args.hardware_scaling)
+    if args.profile:
+        profiler.toggle_overlay()
+    if args.trace:
+        profiler.start_trace(args.trace)
+    pacer.max_skip = args.max_frame_skip
+    if args.frame_stats:
+        # Registered at exit because endless mode leaves through sys.exit()
+        import atexit
+        atexit.register(lambda: print('\n'.join((pacer.report(), gc_control.report(), alloc_sampler.report()))))
+    alloc_sampler.every = args.alloc_sample
+    if args.no_gc_control:
+        gc_control.enabled = False
+    preload_assets()
+    if args.endless:
+        endless_main(character_select_screen())
+    elif args.replay:
+        from replay import ReplayInput
+        replay_input = ReplayInput.load(args.replay)
+        main(replay_input, replay_input.level_num, replay_input.seed, pipelined=args.pipelined, telemetry=args.telemetry)
+        replay_input.report()
+    elif args.record:
+        from replay import InputRecorder
+        seed = args.seed if args.seed is not None else random.randrange(2**31)
+        recorder = InputRecorder(LiveInput(), args.level, seed)
+        main(recorder, args.level, seed, pipelined=args.pipelined, telemetry=args.telemetry)
+        recorder.save(args.record)
+    else:
+        main(level_num=args.level, seed=args.seed, pipelined=args.pipelined, telemetry=args.telemetry)
+    pygame.quit()
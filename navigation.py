@@ -0,0 +1,261 @@
+import heapq
+import math
+import time
+from functools import lru_cache
+
+import numpy as np
+
+# --- CONFIG ---
+WALK = 0                  # Edge kinds
+FALL = 1                  # Walk off the edge and drop
+JUMP = 2
+EDGE_NAMES = ('walk', 'fall', 'jump')
+FALL_LIMIT = 800          # Drops deeper than this are not edges (the level is 800px tall)
+WIDE_SPAN = 2000          # Platforms wider than this are paired with every node instead of windowed
+BUILD_CHUNK = 1024        # Source nodes whose candidate pairs are scored together during build
+
+# --- PHYSICS ---
+class JumpPhysics:
+    """
+    The Player's movement constants, taken from a Player instance (or the
+    defaults, which match it), with the airborne arc simulated frame by frame
+    in Player.update's order: vel_y += gravity, clamp, y += vel_y.
+    """
+    def __init__(self, jump_power=-15, gravity=0.8, speed=5, terminal_velocity=20, size=48):
+        self.jump_power = jump_power
+        self.gravity = gravity
+        self.speed = speed
+        self.terminal_velocity = terminal_velocity
+        self.size = size
+    @classmethod
+    def from_player(cls, player):
+        return cls(player.jump_power, player.gravity, player.speed, 20, player.width)
+    def key(self):
+        return (self.jump_power, self.gravity, self.speed, self.terminal_velocity, self.size)
+
+@lru_cache(maxsize=8)
+def landing_frames(physics_key, initial_vel_y, max_drop=FALL_LIMIT):
+    """
+    For an arc starting at `initial_vel_y`, return (apex, frames) where apex is
+    the highest rise in pixels (negative is up) and frames[d] the frame on which
+    the arc, descending, first reaches d pixels below the takeoff height, for
+    every whole d from apex to max_drop. Cached per physics and start velocity.
+    """
+    _, gravity, _, terminal, _ = physics_key
+    vel_y = initial_vel_y
+    y = 0.0
+    apex = 0.0
+    t = 0
+    frames = {}
+    while y < max_drop:
+        t += 1
+        vel_y = min(vel_y + gravity, terminal)
+        prev_y = y
+        y += vel_y
+        apex = min(apex, y)
+        if vel_y <= 0:
+            continue
+        for d in range(math.ceil(prev_y), math.floor(y) + 1):
+            if d >= apex:
+                frames.setdefault(d, t)
+    apex = math.ceil(apex)
+    # Depths the arc skipped over within one frame take the frame of the next depth it did reach
+    out = np.empty(max_drop - apex + 1, dtype=np.int32)
+    carry = frames[max(frames)]
+    for d in range(max_drop, apex - 1, -1):
+        carry = frames.get(d, carry)
+        out[d - apex] = carry
+    return apex, out
+
+# --- NAVIGATION GRAPH ---
+class NavGraph:
+    """
+    Platform-to-platform movement graph for one level, built once at load.
+
+    Nodes are platforms (their top surfaces). An edge i -> j means a player
+    standing on i can reach j by walking (touching surfaces at the same
+    height), by walking off an edge and dropping (FALL), or by a standing jump
+    (JUMP), given the Player's jump arc and air control: the horizontal gap must
+    be coverable at `speed` in the frames it takes the arc to come down to j's
+    height. Like level_validator, arcs ignore obstacles mid-flight, so edges are
+    slightly optimistic. Edge cost is in frames.
+
+    Edges are stored as compact CSR arrays (offsets, targets, costs, kinds).
+    Shortest paths from a node are computed once with Dijkstra and cached, so
+    path() and next_hop() queries are array lookups afterwards.
+    """
+    def __init__(self, left, right, top, offsets, targets, costs, kinds):
+        self.left = left          # Per node: leftmost x the player can stand at
+        self.right = right        # ... and the rightmost
+        self.top = top            # Surface y
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+        self.kinds = kinds
+        self._trees = {}
+        self.build_time = 0.0
+    @property
+    def node_count(self):
+        return len(self.top)
+    @property
+    def edge_count(self):
+        return len(self.targets)
+    @classmethod
+    def build(cls, platforms, physics=None):
+        start = time.perf_counter()
+        physics = physics or JumpPhysics()
+        size = physics.size
+        n = len(platforms)
+        x = np.array([p.x for p in platforms], dtype=np.float64)
+        width = np.array([p.width for p in platforms], dtype=np.float64)
+        top = np.array([p.y for p in platforms], dtype=np.float64)
+        # A player overlapping the surface by at least a pixel stands on it
+        left = x - size + 1
+        right = x + width - 1
+        jump_apex, jump_frames = landing_frames(physics.key(), physics.jump_power)
+        _, fall_frames = landing_frames(physics.key(), 0)
+        max_reach = physics.speed * int(jump_frames[-1])
+        span = right - left
+        wide = span > WIDE_SPAN
+        narrow = np.flatnonzero(~wide)
+        wide = np.flatnonzero(wide)
+        # Narrow candidates come from a window of nodes sorted by left end: a neighbour's left end is
+        # within reach of i's right end, and at most the widest narrow span before i's left end
+        order = narrow[np.argsort(left[narrow], kind='stable')]
+        sorted_left = left[order]
+        widest = span[narrow].max() if len(narrow) else 0.0
+        window_lo = np.searchsorted(sorted_left, left - max_reach - widest, side='left')
+        window_hi = np.searchsorted(sorted_left, right + max_reach, side='right')
+        sources, targets, costs, kinds = [], [], [], []
+        for chunk in range(0, n, BUILD_CHUNK):
+            nodes = np.arange(chunk, min(n, chunk + BUILD_CHUNK))
+            counts = window_hi[nodes] - window_lo[nodes]
+            starts = np.repeat(window_lo[nodes] - np.cumsum(counts) + counts, counts)
+            cand = order[np.arange(counts.sum()) + starts]
+            src = np.repeat(nodes, counts)
+            if len(wide):
+                # Wide platforms (long ground strips) would stretch every window, so pair them with all sources
+                src = np.concatenate([src, np.repeat(nodes, len(wide))])
+                cand = np.concatenate([cand, np.tile(wide, len(nodes))])
+            near = (right[cand] >= left[src] - max_reach) & (left[cand] <= right[src] + max_reach) & (cand != src)
+            src, cand = src[near], cand[near]
+            drop = top[cand] - top[src]                # Positive: the target is lower
+            gap = np.maximum(0.0, np.maximum(left[cand] - right[src], left[src] - right[cand]))
+            touching = (drop == 0) & (gap <= 1)
+            drop_index = np.clip(np.ceil(drop).astype(np.int64), jump_apex, FALL_LIMIT)
+            jump_t = jump_frames[drop_index - jump_apex]
+            can_jump = (drop >= jump_apex) & (drop <= FALL_LIMIT) & (gap <= physics.speed * jump_t)
+            fall_t = fall_frames[np.clip(drop_index, 0, FALL_LIMIT)]
+            # Walking off the edge leaves the player overhanging it by up to its width, then air control
+            can_fall = (drop > 0) & (drop <= FALL_LIMIT) & (gap <= physics.speed * fall_t + size)
+            # Prefer walking, then falling, then jumping; cost is airtime, the gap is crossed during it
+            keep = touching | can_fall | can_jump
+            sources.append(src[keep].astype(np.int32))
+            targets.append(cand[keep].astype(np.int32))
+            costs.append(np.where(touching, np.maximum(1.0, gap / physics.speed),
+                                  np.where(can_fall, fall_t, jump_t))[keep].astype(np.float32))
+            kinds.append(np.where(touching, WALK, np.where(can_fall, FALL, JUMP))[keep].astype(np.uint8))
+        if sources:
+            sources, targets, costs, kinds = (np.concatenate(a) for a in (sources, targets, costs, kinds))
+        else:
+            sources, targets = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+            costs, kinds = np.empty(0, dtype=np.float32), np.empty(0, dtype=np.uint8)
+        order = np.lexsort((targets, sources))
+        offsets = np.searchsorted(sources[order], np.arange(n + 1)).astype(np.int32)
+        graph = cls(left, right, top, offsets, targets[order], costs[order], kinds[order])
+        graph.build_time = time.perf_counter() - start
+        return graph
+    # --- queries ---
+    def neighbors(self, node):
+        lo, hi = self.offsets[node], self.offsets[node + 1]
+        return self.targets[lo:hi], self.costs[lo:hi], self.kinds[lo:hi]
+    def node_at(self, x, y, height, tolerance=2.0):
+        """
+        The node an entity with top-left (x, y) and `height` is standing on,
+        or None if it is airborne.
+        """
+        feet = y + height
+        hits = np.flatnonzero((np.abs(self.top - feet) <= tolerance) & (self.left <= x) & (self.right >= x))
+        return int(hits[0]) if len(hits) else None
+    def node_below(self, x, y, height):
+        # The node an entity at (x, y) stands on or would land on falling straight down, or None
+        feet = y + height
+        below = np.flatnonzero((self.top >= feet - 2.0) & (self.left <= x) & (self.right >= x))
+        return int(below[np.argmin(self.top[below])]) if len(below) else None
+    def _tree(self, source):
+        tree = self._trees.get(source)
+        if tree is not None:
+            return tree
+        n = self.node_count
+        dist = np.full(n, np.inf, dtype=np.float32)
+        prev = np.full(n, -1, dtype=np.int32)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        offsets, targets, costs = self.offsets, self.targets, self.costs
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for k in range(offsets[node], offsets[node + 1]):
+                target = targets[k]
+                nd = d + costs[k]
+                if nd < dist[target]:
+                    dist[target] = nd
+                    prev[target] = node
+                    heapq.heappush(heap, (nd, target))
+        tree = self._trees[source] = (dist, prev)
+        return tree
+    def distance(self, source, target):
+        return float(self._tree(source)[0][target])
+    def path(self, source, target):
+        """
+        Nodes from `source` to `target` along the cheapest route, or [] if
+        `target` cannot be reached.
+        """
+        dist, prev = self._tree(source)
+        if not np.isfinite(dist[target]):
+            return []
+        path = [target]
+        while path[-1] != source:
+            path.append(int(prev[path[-1]]))
+        return path[::-1]
+    def next_hop(self, source, target):
+        # First node to head for on the way from source to target (None if unreachable or already there)
+        path = self.path(source, target)
+        return path[1] if len(path) > 1 else None
+    def reachable(self, source):
+        return np.flatnonzero(np.isfinite(self._tree(source)[0]))
+    def summary(self):
+        counts = np.bincount(self.kinds, minlength=len(EDGE_NAMES))
+        return (f"{self.node_count} platforms, {self.edge_count} edges ("
+                + ', '.join(f"{counts[k]} {name}" for k, name in enumerate(EDGE_NAMES))
+                + f"), built in {self.build_time * 1000:.2f} ms")
+
+def test_navigation(levels=range(1, 7)):
+    """
+    Build the graph for each hand-made level, check the flag is reachable from
+    the spawn platform, and time graph building, the first shortest-path query
+    and cached queries.
+    """
+    from game_sim import load_headless_game
+    game = load_headless_game()
+    char_img_path = game.CHARACTER_OPTIONS[0][1]
+    for level_num in levels:
+        world = game.GameWorld(level_num, char_img_path)
+        graph = NavGraph.build(world.platforms, JumpPhysics.from_player(world.player))
+        player, flag = world.player, world.flag
+        start = graph.node_below(player.x, player.y, player.height)
+        goal = graph.node_below(flag.x, flag.y, flag.height)
+        t0 = time.perf_counter()
+        path = graph.path(start, goal) if goal is not None else []
+        first = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            graph.next_hop(start, goal if goal is not None else start)
+        cached = (time.perf_counter() - t0) / 1000
+        route = f"reachable in {len(path) - 1} hops" if path else "NOT reachable"
+        print(f"level {level_num}: {graph.summary()}; flag {route}, "
+              f"first query {first * 1000:.2f} ms, cached {cached * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    test_navigation()
@@ -0,0 +1,140 @@
+import argparse
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from render_queue import RenderQueue
+
+# --- SNAPSHOTS ---
+class FrameSnapshot:
+    """
+    Everything the render thread needs for one frame, captured on the
+    simulation side: the frame's filled render queue (surfaces and screen
+    positions, camera already applied), the HUD values, and when the tick that
+    produced it sampled its input, plus the debug layers: the F4 route in
+    screen points and the F3 profiler overlay surface (None when off). The
+    simulation never touches it again once submitted.
+    """
+    __slots__ = ('render_queue', 'hud', 'input_time', 'route', 'overlay')
+    def __init__(self, render_queue, hud, input_time, route=None, overlay=None):
+        self.render_queue = render_queue
+        self.hud = hud
+        self.input_time = input_time
+        self.route = route
+        self.overlay = overlay
+
+# --- PIPELINE ---
+class FramePipeline:
+    """
+    Runs the draw stage of the game loop on a render thread, one frame behind
+    the simulation.
+
+    The loop thread acquire()s a free render queue, fills it with world.draw()
+    and submit()s a FrameSnapshot; the render thread calls `render(snapshot)`
+    (background, Surface.blits per layer, route, HUD, overlay), which spends most of its time
+    in pygame's C blitters with the GIL released, while the loop thread runs
+    the next tick. Two render queues form the double buffer: one being drawn,
+    one being filled. present() waits for the frame in flight and flips it
+    from the loop thread, since SDL expects the window's own thread to update
+    it. Input is sampled on the loop thread at the start of each tick.
+    """
+    def __init__(self, render, buffers=2, history=600):
+        self.render = render
+        self.free = queue.SimpleQueue()
+        for _ in range(buffers):
+            self.free.put(RenderQueue())
+        self.pending = queue.SimpleQueue()
+        self.rendered = queue.SimpleQueue()
+        self.in_flight = None
+        self.frames = 0
+        self.latency_ms = deque(maxlen=history)   # Input sample to present, per frame
+        self.render_ms = deque(maxlen=history)
+        self.wait_ms = deque(maxlen=history)      # Loop thread blocked on the render thread
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='render', daemon=True)
+        self.thread.start()
+    def _run(self):
+        while True:
+            snapshot = self.pending.get()
+            if snapshot is None:
+                return
+            start = time.perf_counter()
+            try:
+                self.render(snapshot)
+            except Exception as e:
+                self.error = e
+            self.render_ms.append((time.perf_counter() - start) * 1000)
+            self.rendered.put(snapshot)
+    def acquire(self):
+        return self.free.get()
+    def submit(self, snapshot):
+        self.in_flight = snapshot
+        self.pending.put(snapshot)
+    def present(self, present):
+        """
+        Wait for the frame in flight, then present it with `present()`.
+        Returns False if nothing was in flight.
+        """
+        if self.in_flight is None:
+            return False
+        start = time.perf_counter()
+        snapshot = self.rendered.get()
+        self.wait_ms.append((time.perf_counter() - start) * 1000)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        present()
+        self.latency_ms.append((time.perf_counter() - snapshot.input_time) * 1000)
+        self.free.put(snapshot.render_queue)
+        self.in_flight = None
+        self.frames += 1
+        return True
+    def close(self, present=None):
+        if present is not None:
+            self.present(present)
+        self.pending.put(None)
+        self.thread.join()
+    def report(self):
+        if not self.latency_ms:
+            return "pipeline: no frames"
+        return (f"pipeline: {self.frames} frames, latency p50 {np.percentile(self.latency_ms, 50):.2f} ms, "
+                f"render p50 {np.percentile(self.render_ms, 50):.2f} ms, "
+                f"loop waited p50 {np.percentile(self.wait_ms, 50):.2f} ms for the render thread")
+
+# --- MEASUREMENT ---
+def compare_pipelined(trace_path='traces/level_03.json.gz', repeats=3):
+    """
+    Replay a trace unpaced through main() single-threaded and pipelined and
+    compare throughput (frames per second) and latency from a tick's input
+    sample to the present of its frame. Single-threaded latency is the whole
+    frame; pipelined, a frame is presented after the following tick, so
+    latency grows while throughput can rise if blitting overlaps the tick.
+    """
+    from game_sim import load_headless_game
+    from replay import ReplayInput
+    game = load_headless_game()
+    for pipelined in (False, True):
+        fps, latency = [], []
+        for _ in range(repeats):
+            replay_input = ReplayInput.load(trace_path)
+            start = time.perf_counter()
+            game.main(replay_input, replay_input.level_num, replay_input.seed, frame_limit=False, pipelined=pipelined)
+            elapsed = time.perf_counter() - start
+            assert replay_input.matched, "replay diverged"
+            fps.append(game.pacer.ticks / elapsed)
+            # Unpaced, a single-threaded frame's work time runs from its input sample to its present
+            latency.append(np.percentile(game.frame_pipeline.latency_ms if pipelined else game.pacer.work_ms, 50))
+        print(f"{'pipelined' if pipelined else 'single':>10}: {np.median(fps):8.1f} frames/s, "
+              f"input-to-present p50 {np.median(latency):.2f} ms")
+        if pipelined:
+            print(f"{'':>10}  {game.frame_pipeline.report()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the single-threaded and pipelined game loops")
+    parser.add_argument('trace', nargs='?', default='traces/level_03.json.gz', help="replay trace to run")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    compare_pipelined(args.trace, args.repeats)
@@ -0,0 +1,212 @@
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+# --- CONFIG ---
+HISTORY_FRAMES = 240      # Rolling window for the overlay percentiles (4s at 60 FPS)
+OVERLAY_REFRESH = 15      # Re-render overlay text every N frames; text rendering is not free
+PERCENTILES = (50, 95, 99)
+
+# --- SCOPES ---
+class _NullScope:
+    # Shared no-op context manager returned while profiling is disabled
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SCOPE = _NullScope()
+
+class _Scope:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+# --- FRAME PROFILER ---
+class FrameProfiler:
+    """
+    Per-phase frame timing for the game loop.
+
+    The loop calls begin_frame(), then phase(name) at the start of each phase
+    (input, collisions, player, enemies, rules, draw, present, ...), then end_frame().
+    Each phase runs until the next phase() call; scope(name) times a nested
+    block instead. Counters (entities, sprites, blit calls) are set with count().
+
+    While disabled every call returns immediately, so the instrumentation can
+    stay in the loop. When enabled, rolling p50/p95/p99 per phase feed the F3
+    overlay, and with tracing on every frame is kept for CSV or Chrome-trace export.
+    """
+    def __init__(self, history=HISTORY_FRAMES):
+        self.enabled = False
+        self.overlay = False
+        self.tracing = False
+        self.trace_path = None
+        self.history = history
+        self.samples = {}         # phase -> deque of durations (ms)
+        self.counters = {}        # name -> value for the current frame
+        self.frames = []          # traced frames: (frame_start, [(phase, start, end)], counters)
+        self.frame_index = 0
+        self._events = []
+        self._frame_start = 0.0
+        self._phase = None
+        self._phase_start = 0.0
+        self._scopes = {}
+        self._overlay_surface = None
+    # --- control ---
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.enabled = self.overlay or self.tracing
+    def start_trace(self, path=None):
+        self.tracing = self.enabled = True
+        self.trace_path = path
+        self.frames = []
+    def stop_trace(self):
+        self.tracing = False
+        self.enabled = self.overlay
+        if self.trace_path:
+            self.export(self.trace_path)
+    def close(self):
+        if self.tracing:
+            self.stop_trace()
+    # --- instrumentation ---
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = self._phase_start = time.perf_counter()
+        self._phase = None
+        self._events = []
+        self.counters = {}
+    def phase(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.record(self._phase, self._phase_start, now)
+        self._phase = name
+        self._phase_start = now
+    def scope(self, name):
+        if not self.enabled:
+            return _NULL_SCOPE
+        scope = self._scopes.get(name)
+        if scope is None:
+            scope = self._scopes[name] = _Scope(self, name)
+        return scope
+    def count(self, name, value):
+        if self.enabled:
+            self.counters[name] = value
+    def record(self, name, start, end):
+        self._events.append((name, start, end))
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.history)
+        samples.append((end - start) * 1000)
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.record(self._phase, self._phase_start, now)
+            self._phase = None
+        self.record('frame', self._frame_start, now)
+        if self.tracing:
+            self.frames.append((self._frame_start, self._events, self.counters))
+        self.frame_index += 1
+    # --- reporting ---
+    def percentiles(self):
+        """
+        Return {phase: (p50, p95, p99)} in milliseconds over the rolling window.
+        """
+        return {name: tuple(np.percentile(samples, PERCENTILES)) for name, samples in self.samples.items() if samples}
+    def overlay_lines(self):
+        lines = [f"{'phase':<10}{'p50':>7}{'p95':>7}{'p99':>7}  ms"]
+        for name, (p50, p95, p99) in self.percentiles().items():
+            lines.append(f"{name:<10}{p50:>7.2f}{p95:>7.2f}{p99:>7.2f}")
+        lines.extend(f"{name}: {value}" for name, value in self.counters.items())
+        return lines
+    def draw_overlay(self, surface, font, pos=(8, 8)):
+        overlay = self.overlay_surface(font)
+        if overlay is not None:
+            surface.blit(overlay, pos)
+    def overlay_surface(self, font):
+        # The overlay as a surface (None when hidden); a refresh makes a new one, so a render thread can keep the old
+        if not self.overlay:
+            return None
+        if self._overlay_surface is None or self.frame_index % OVERLAY_REFRESH == 0:
+            rendered = [font.render(line, True, (255, 255, 255)) for line in self.overlay_lines()]
+            line_height = font.get_linesize()
+            width = max(r.get_width() for r in rendered) + 12
+            self._overlay_surface = pygame.Surface((width, line_height * len(rendered) + 12), pygame.SRCALPHA)
+            self._overlay_surface.fill((0, 0, 0, 160))
+            for i, r in enumerate(rendered):
+                self._overlay_surface.blit(r, (6, 6 + i * line_height))
+        return self._overlay_surface
+    # --- export ---
+    def export(self, path):
+        """
+        Write the traced frames to `path`: CSV (one row per frame, one column per
+        phase and counter) when it ends in .csv, otherwise Chrome-trace JSON
+        loadable in chrome://tracing or Perfetto.
+        """
+        if path.endswith('.csv'):
+            self.export_csv(path)
+        else:
+            self.export_chrome_trace(path)
+    def export_csv(self, path):
+        phases = list(dict.fromkeys(name for _, events, _ in self.frames for name, _, _ in events))
+        counters = list(dict.fromkeys(name for _, _, counts in self.frames for name in counts))
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'start_ms'] + [f'{p}_ms' for p in phases] + counters)
+            origin = self.frames[0][0] if self.frames else 0.0
+            for i, (frame_start, events, counts) in enumerate(self.frames):
+                durations = dict.fromkeys(phases, 0.0)
+                for name, start, end in events:
+                    durations[name] += (end - start) * 1000
+                writer.writerow([i, f'{(frame_start - origin) * 1000:.3f}'] +
+                                [f'{durations[p]:.4f}' for p in phases] +
+                                [counts.get(c, '') for c in counters])
+    def export_chrome_trace(self, path):
+        origin = self.frames[0][0] if self.frames else 0.0
+        events = []
+        for i, (frame_start, frame_events, counts) in enumerate(self.frames):
+            for name, start, end in frame_events:
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': round((start - origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1),
+                               'args': {'frame': i}})
+            if counts:
+                events.append({'name': 'counters', 'ph': 'C', 'pid': 0, 'tid': 0,
+                               'ts': round((frame_start - origin) * 1e6, 1), 'args': counts})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+def test_overhead(frames=100000):
+    """
+    Measure the per-frame cost of the instrumentation with profiling disabled and enabled.
+    """
+    profiler = FrameProfiler()
+    phases = ('input', 'collisions', 'player', 'enemies', 'rules', 'draw', 'hud', 'present', 'wait')
+    for enabled in (False, True):
+        profiler.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(frames):
+            profiler.begin_frame()
+            for name in phases:
+                profiler.phase(name)
+            profiler.end_frame()
+        elapsed = time.perf_counter() - start
+        print(f"{'enabled' if enabled else 'disabled'}: {elapsed / frames * 1e6:.2f} us/frame "
+              f"for {len(phases)} phases")
+
+if __name__ == "__main__":
+    test_overhead()
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+
+import pygame
+
+# --- LAYERS (back to front) ---
+LAYER_TERRAIN = 0   # Platforms
+LAYER_PROPS = 1     # Decorations, flag, coin/exclamation blocks, locks
+LAYER_ITEMS = 2     # Coins and keys
+LAYER_ENEMIES = 3
+LAYER_PLAYER = 4
+LAYER_LIQUID = 5    # Water and lava, drawn over the player so falling in looks submerged
+LAYER_COUNT = 6
+
+# Layers whose items are regrouped so blits of the same source surface run back to back,
+# wherever that does not change which of two overlapping sprites ends up on top
+GROUPED_LAYERS = frozenset((LAYER_TERRAIN, LAYER_PROPS, LAYER_LIQUID))
+
+def _group_by_source(items):
+    """
+    Reorder one layer's items so same-surface blits are adjacent, keeping
+    submission order between overlapping sprites of different surfaces.
+
+    Items are split into runs in which no sprite overlaps one from another
+    surface; each run is stably sorted by the order in which its surfaces were
+    first submitted, so the result is the same on every run.
+    """
+    first_seen = {}
+    out = []
+    run, run_rects, run_sources = [], [], []
+    for item in items:
+        surface, pos, area = item
+        source = first_seen.setdefault(id(surface), len(first_seen))
+        rect = pygame.Rect(pos, area.size if area else surface.get_size())
+        if any(run_sources[i] != source for i in rect.collidelistall(run_rects)):
+            run.sort(key=lambda queued: first_seen[id(queued[0])])
+            out.extend(run)
+            run, run_rects, run_sources = [], [], []
+        run.append(item)
+        run_rects.append(rect)
+        run_sources.append(source)
+    run.sort(key=lambda queued: first_seen[id(queued[0])])
+    out.extend(run)
+    return out
+
+# --- RENDER QUEUE ---
+class RenderQueue:
+    """
+    Collects one frame of world sprites and draws them with a single
+    Surface.blits call per layer instead of one blit call per sprite.
+
+    Entities submit (surface, position[, area]) items to a layer from their
+    draw(queue, camera_x) methods; flush() draws the layers back to front and
+    empties the queue for the next frame.
+    """
+    def __init__(self):
+        self.layers = [[] for _ in range(LAYER_COUNT)]
+        self.items_drawn = 0
+        self.blit_calls = 0
+    def add(self, layer, surface, pos, area=None):
+        self.layers[layer].append((surface, pos, area))
+    def extend(self, layer, items):
+        self.layers[layer].extend(items)
+    def flush(self, target):
+        for layer, items in enumerate(self.layers):
+            if not items:
+                continue
+            target.blits(_group_by_source(items) if layer in GROUPED_LAYERS else items, False)
+            self.items_drawn += len(items)
+            self.blit_calls += 1
+            items.clear()
+    def flush_individually(self, target):
+        # Same output as flush() with one blit call per item; kept for benchmarking
+        for items in self.layers:
+            for surface, pos, area in items:
+                target.blit(surface, pos, area)
+                self.blit_calls += 1
+            self.items_drawn += len(items)
+            items.clear()
+
+# --- BENCHMARK ---
+def benchmark_render_queue(frames=300, copies=8, level_num=3):
+    """
+    Draw a busy scene (a level's objects overlaid `copies` times at staggered
+    offsets) and compare per-item blit calls against batched per-layer blits.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import mustafa_super_bros as game
+
+    objects = []
+    for copy in range(copies):
+        state = game.build_level_state(level_num, game.CHARACTER_OPTIONS[0][1], None)
+        for value in state:
+            group = value if isinstance(value, list) else [value]
+            for obj in group:
+                if hasattr(obj, 'draw') and hasattr(obj, 'x'):
+                    obj.x += copy * 37
+                    objects.append(obj)
+
+    queue = RenderQueue()
+    # The 1x1 target clips every blit to almost nothing, isolating per-call overhead from fill cost
+    targets = (('screen', game.screen), ('overhead', game.pygame.Surface((1, 1)).convert()))
+    results = {}
+    for target_name, target in targets:
+        for obj in objects:  # Warm-up frame so neither mode pays first-touch costs
+            obj.draw(queue, 0)
+        queue.flush(target)
+        for mode, flush in (('individual', queue.flush_individually), ('batched', queue.flush)):
+            queue.items_drawn = queue.blit_calls = 0
+            flush_time = 0.0
+            for frame in range(frames):
+                camera_x = (frame * 4) % 1200
+                for obj in objects:
+                    obj.draw(queue, camera_x)
+                start = time.perf_counter()
+                flush(target)
+                flush_time += time.perf_counter() - start
+            results[target_name, mode] = flush_time / frames
+            print(f"{target_name:>8} {mode:>10}: {queue.items_drawn / frames:.0f} sprites in "
+                  f"{queue.blit_calls / frames:.0f} calls, {flush_time / frames * 1000:.3f} ms/frame")
+        print(f"{target_name:>8}: batched is {results[target_name, 'individual'] / results[target_name, 'batched']:.2f}x "
+              f"({len(objects)} objects, {frames} frames)")
+    return results
+
+if __name__ == "__main__":
+    benchmark_render_queue(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
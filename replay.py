@@ -0,0 +1,330 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+from game_sim import ACTIONS, load_headless_game
+
+# --- CONFIG ---
+TRACE_VERSION = 1
+TRACE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces')
+TRACE_LEVELS = range(1, 11)
+TRACE_CHARACTER = 'Sprites/Characters/Default/character_beige_front.png'
+CHECKSUM_INTERVAL = 30    # Ticks between recorded world checksums
+TRAILING_TICKS = 60       # Idle ticks kept after the flag so the level-complete popup is in the benchmark
+
+# --- TRACE FORMAT ---
+# A trace is gzipped JSON: the level and seed main() started with, the controls
+# of every tick as run-length encoded [bits, count] pairs (bit 0 left, 1 right,
+# 2 jump), sparse [tick, kind, ...] events for key presses, mouse changes and
+# character picks, and {tick: crc32} world checksums to verify the replay.
+def encode_controls(controls):
+    left, right, jump = controls
+    return int(left) | int(right) << 1 | int(jump) << 2
+
+def decode_controls(bits):
+    return (bool(bits & 1), bool(bits & 2), bool(bits & 4))
+
+def pack_runs(values):
+    runs = []
+    for value in values:
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+def unpack_runs(runs):
+    values = []
+    for value, count in runs:
+        values.extend([value] * count)
+    return values
+
+def world_checksum(world):
+    # Everything a diverging replay would disturb: player physics, score and enemy positions
+    player = world.player
+    state = (world.level_num, player.x, player.y, player.vel_x, player.vel_y, world.score,
+             world.coins_collected, world.game_over, world.level_completed,
+             [(enemy.x, enemy.y) for enemy in world.enemies])
+    return zlib.crc32(repr(state).encode())
+
+# --- RECORDING ---
+class InputRecorder:
+    """
+    Input source for main() that passes another source through and logs what
+    the game read from it each tick.
+
+    Wrap LiveInput to record a play session, or a scripted source to build
+    benchmark traces; save() writes the trace once main() returns.
+    """
+    def __init__(self, source, level_num, seed):
+        self.source = source
+        self.level_num = level_num
+        self.seed = seed
+        self.tick = 0
+        self.controls = []
+        self.events = []
+        self.checksums = {}
+        self._mouse = None
+    def poll(self):
+        tick_input = self.source.poll()
+        self.controls.append(encode_controls(tick_input.controls))
+        for key in tick_input.keydowns:
+            self.events.append([self.tick, 'key', key])
+        mouse = (tuple(tick_input.mouse_pos), tick_input.mouse_down)
+        if mouse != self._mouse:
+            self.events.append([self.tick, 'mouse', mouse[0][0], mouse[0][1], mouse[1]])
+            self._mouse = mouse
+        if tick_input.quit:
+            self.events.append([self.tick, 'quit'])
+        self.tick += 1
+        return tick_input
+    def select_character(self):
+        char_img_path = self.source.select_character()
+        self.events.append([self.tick, 'character', char_img_path])
+        return char_img_path
+    def after_tick(self, world):
+        self.source.after_tick(world)
+        if self.tick % CHECKSUM_INTERVAL == 0:
+            self.checksums[self.tick] = world_checksum(world)
+    def to_dict(self):
+        return {
+            'version': TRACE_VERSION,
+            'level': self.level_num,
+            'seed': self.seed,
+            'ticks': self.tick,
+            'controls': pack_runs(self.controls),
+            'events': self.events,
+            'checksums': {str(tick): crc for tick, crc in self.checksums.items()},
+        }
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with gzip.open(path, 'wt') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        print(f"Recorded {self.tick} ticks of level {self.level_num} (seed {self.seed}) to {path}")
+
+class ScriptedInput:
+    # Plays a fixed list of controls with no mouse or key events, then quits
+    def __init__(self, controls, char_img_path=TRACE_CHARACTER):
+        self.controls = controls
+        self.char_img_path = char_img_path
+        self.tick = 0
+    def poll(self):
+        game = load_headless_game()
+        controls = self.controls[self.tick] if self.tick < len(self.controls) else (False, False, False)
+        self.tick += 1
+        return game.TickInput(quit=self.tick >= len(self.controls), controls=controls)
+    def select_character(self):
+        return self.char_img_path
+    def after_tick(self, world):
+        pass
+
+# --- REPLAY ---
+class ReplayInput:
+    """
+    Input source for main() that plays a recorded trace back tick for tick.
+
+    The run is identical to the recorded one as long as main() is started with
+    the trace's level and seed; after_tick() checks the world against the
+    recorded checksums and report() prints any divergence.
+    """
+    def __init__(self, trace):
+        if trace.get('version') != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version: {trace.get('version')}")
+        self.level_num = trace['level']
+        self.seed = trace['seed']
+        self.controls = unpack_runs(trace['controls'])
+        self.events = {}
+        self.characters = []
+        for event in trace['events']:
+            if event[1] == 'character':
+                self.characters.append(event[2])
+            else:
+                self.events.setdefault(event[0], []).append(event)
+        self.checksums = {int(tick): crc for tick, crc in trace['checksums'].items()}
+        self.tick = 0
+        self.mouse_pos = (0, 0)
+        self.mouse_down = False
+        self.checked = 0
+        self.mismatches = []
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt') as f:
+            return cls(json.load(f))
+    def poll(self):
+        game = load_headless_game()
+        if self.tick >= len(self.controls):
+            return game.TickInput(quit=True)
+        quit = False
+        keydowns = []
+        for event in self.events.get(self.tick, ()):
+            if event[1] == 'key':
+                keydowns.append(event[2])
+            elif event[1] == 'mouse':
+                self.mouse_pos = (event[2], event[3])
+                self.mouse_down = event[4]
+            elif event[1] == 'quit':
+                quit = True
+        controls = decode_controls(self.controls[self.tick])
+        self.tick += 1
+        return game.TickInput(quit, keydowns, controls, self.mouse_pos, self.mouse_down)
+    def select_character(self):
+        return self.characters.pop(0) if self.characters else TRACE_CHARACTER
+    def after_tick(self, world):
+        expected = self.checksums.get(self.tick)
+        if expected is None:
+            return
+        self.checked += 1
+        if world_checksum(world) != expected:
+            self.mismatches.append(self.tick)
+    @property
+    def matched(self):
+        return not self.mismatches and self.checked == len(self.checksums)
+    def report(self):
+        if self.matched:
+            print(f"Replay matched all {self.checked} checkpoints over {self.tick} ticks")
+        elif self.mismatches:
+            print(f"Replay DIVERGED at tick {self.mismatches[0]} "
+                  f"({len(self.mismatches)}/{self.checked} checkpoints differ)")
+        else:
+            print(f"Replay stopped early: {self.checked}/{len(self.checksums)} checkpoints reached")
+
+# --- ROUTE SEARCH ---
+def _checkpoint(game, world):
+    # Snapshot every mutable object in the world so a search branch can be rewound;
+    # the key set is shared with the level's objects, so it is copied and refilled in place
+    objects = ([world, world.player, world.flag, world.falling_key_obj] + world.platforms + world.enemies +
+               world.coins + world.coin_block_objs + world.ex_block_objs)
+    return game.LevelSnapshot([objects]), set(world.player_keys)
+
+def _rewind(world, checkpoint):
+    snapshot, player_keys = checkpoint
+    snapshot.restore()
+    world.player_keys.clear()
+    world.player_keys.update(player_keys)
+
+def _progress(world):
+    # Closeness to the flag, so routes that overshoot it on a high platform do not look best
+    player = world.player
+    return -abs(world.flag.x - player.x) - abs(world.flag.y - player.y) + 400 * len(world.player_keys)
+
+def find_route(level_num, seed, char_img_path=TRACE_CHARACTER, chunk=12, tries=12, max_rounds=4000, rng_seed=0):
+    """
+    Search for a list of per-tick controls that carries the player from spawn
+    to the flag: try random chunks of actions (biased right and jump-right),
+    keep the surviving one that ends closest to the flag, and back up further
+    each time every try dies. Returns None if no route is found within `max_rounds`.
+    """
+    game = load_headless_game()
+    # Same seeding order as main(), so the route holds when the trace is replayed
+    game.seed_everything(seed)
+    world = game.GameWorld(level_num, char_img_path)
+    rng = np.random.default_rng(rng_seed)
+    weights = [0.02, 0.05, 0.4, 0.08, 0.05, 0.4]
+    plan = []
+    checkpoints = [_checkpoint(game, world)]
+    dead_ends = 0
+    for _ in range(max_rounds):
+        best, best_progress = None, None
+        for _ in range(tries):
+            _rewind(world, checkpoints[-1])
+            controls = [ACTIONS[a] for a in rng.choice(len(ACTIONS), size=chunk, p=weights)]
+            for i, tick_controls in enumerate(controls):
+                world.tick(tick_controls)
+                if world.level_completed and not world.game_over:
+                    return [c for part in plan for c in part] + controls[:i + 1]
+                if world.game_over:
+                    break
+            if not world.game_over and (best is None or _progress(world) > best_progress):
+                best, best_progress = controls, _progress(world)
+        if best is None:
+            # Dead end: rewind, further each time it happens, and try again from there
+            dead_ends += 1
+            for _ in range(min(dead_ends, len(plan))):
+                plan.pop()
+                checkpoints.pop()
+            continue
+        _rewind(world, checkpoints[-1])
+        for tick_controls in best:
+            world.tick(tick_controls)
+        plan.append(best)
+        checkpoints.append(_checkpoint(game, world))
+    return None
+
+def make_traces(levels=TRACE_LEVELS, out_dir=TRACE_DIR):
+    """
+    Build the standing benchmark traces: find a route through each level,
+    then record it through the real main() loop so the trace holds exactly
+    what the game read, checksums included.
+    """
+    game = load_headless_game()
+    for level_num in levels:
+        seed = level_num
+        start = time.perf_counter()
+        route = find_route(level_num, seed)
+        if route is None:
+            print(f"Level {level_num}: no route found, skipped")
+            continue
+        route += [(False, False, False)] * TRAILING_TICKS
+        recorder = InputRecorder(ScriptedInput(route), level_num, seed)
+        world = game.main(recorder, level_num, seed, frame_limit=False)
+        if not world.level_completed:
+            print(f"Level {level_num}: route did not finish in the real loop, skipped")
+            continue
+        recorder.save(os.path.join(out_dir, f'level_{level_num:02d}.json.gz'))
+        print(f"Level {level_num}: {len(route)} ticks, searched in {time.perf_counter() - start:.1f}s")
+
+# --- BENCHMARK ---
+def frame_work_ms(frames):
+    # Per-frame time spent in the game itself: the whole frame minus the clock wait
+    work = []
+    for _, events, _ in frames:
+        durations = {}
+        for name, start, end in events:
+            durations[name] = durations.get(name, 0.0) + (end - start)
+        work.append((durations.get('frame', 0.0) - durations.get('wait', 0.0)) * 1000)
+    return np.array(work)
+
+def benchmark_traces(paths=None):
+    """
+    Replay each trace headless through main() with tracing on and print the
+    frame-time distribution (p50/p95/p99/max, ms) per level and overall.
+    Returns False if any replay diverged from its recording.
+    """
+    game = load_headless_game()
+    paths = paths or sorted(glob.glob(os.path.join(TRACE_DIR, '*.json.gz')))
+    if not paths:
+        print(f"No traces found in {TRACE_DIR}; run `python replay.py --make-traces` first")
+        return False
+    print(f"{'trace':<22}{'ticks':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  ms  replay")
+    all_work = []
+    all_matched = True
+    for path in paths:
+        replay_input = ReplayInput.load(path)
+        game.profiler.start_trace(None)
+        game.main(replay_input, replay_input.level_num, replay_input.seed, frame_limit=False)
+        work = frame_work_ms(game.profiler.frames)
+        all_work.append(work)
+        all_matched = all_matched and replay_input.matched
+        p50, p95, p99 = np.percentile(work, (50, 95, 99))
+        print(f"{os.path.basename(path):<22}{len(work):>7}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}{work.max():>8.2f}"
+              f"      {'ok' if replay_input.matched else 'DIVERGED'}")
+    work = np.concatenate(all_work)
+    p50, p95, p99 = np.percentile(work, (50, 95, 99))
+    print(f"{'all':<22}{len(work):>7}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}{work.max():>8.2f}")
+    return all_matched
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded traces headless and report frame times")
+    parser.add_argument('traces', nargs='*', help="Trace files to replay (default: every trace in traces/)")
+    parser.add_argument('--make-traces', action='store_true', help="Regenerate the level 1-10 benchmark traces")
+    args = parser.parse_args()
+    if args.make_traces:
+        make_traces()
+    else:
+        raise SystemExit(0 if benchmark_traces(args.traces) else 1)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# --- CONFIG ---
+SERVICE_THREADS = min(4, os.cpu_count() or 1)
+SERVICE_BUDGET_MS = 2.0   # Main-thread time per frame for handling finished background work
+TELEMETRY_INTERVAL = 5.0  # Seconds between telemetry records
+
+# --- SERVICE HOST ---
+class ServiceHost:
+    """
+    Background services for the asyncio game loop (main_async).
+
+    spawn(coro, scope) runs a service as a task on the loop. Blocking work goes
+    through run_in_thread() or run_in_process(); the loop thread only handles
+    the results. Tasks belong to a scope ('level', 'scene' or 'session') and
+    cancel_scope() cancels them when the level or scene they were started for
+    ends. Cancelling a task abandons its executor job; a job already running
+    in a worker finishes and its result is dropped.
+
+    The loop thread's share of the work is limited per frame: the game loop
+    awaits frame_yield(budget_ms) once per frame, between update and present,
+    which lets ready services run, and services await checkpoint() before
+    each piece of main-thread work, which defers them to the next frame once
+    the budget is spent. Results stored with spawn(..., key=...) are picked
+    up by the game with take(key).
+    """
+    def __init__(self, threads=SERVICE_THREADS, processes=0):
+        self.thread_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='service')
+        self.processes = processes
+        self.process_pool = None
+        self.scopes = {}          # scope -> set of tasks
+        self.results = {}         # key -> finished result
+        self.frame_deadline = float('inf')
+        self._next_frame = None
+        self.frames = 0
+        self.deferred = 0         # Checkpoints pushed to a later frame by the budget
+        self.errors = 0
+    # --- tasks ---
+    def spawn(self, coro, scope='session', key=None):
+        task = asyncio.get_running_loop().create_task(coro)
+        tasks = self.scopes.setdefault(scope, set())
+        tasks.add(task)
+        def finished(task):
+            tasks.discard(task)
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                self.errors += 1
+                print(f"Background service failed: {task.exception()!r}")
+            elif key is not None:
+                self.results[key] = task.result()
+        task.add_done_callback(finished)
+        return task
+    def cancel_scope(self, scope):
+        for task in self.scopes.pop(scope, ()):
+            task.cancel()
+    def pending(self, scope=None):
+        if scope is not None:
+            return len(self.scopes.get(scope, ()))
+        return sum(len(tasks) for tasks in self.scopes.values())
+    def take(self, key):
+        # The finished result for `key`, or None if it is not ready (the caller then does the work itself)
+        return self.results.pop(key, None)
+    async def run_in_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.thread_pool, fn, *args)
+    async def run_in_process(self, fn, *args):
+        # For CPU-bound pure-Python work; `fn` and its arguments must be picklable
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=self.processes or None)
+        return await asyncio.get_running_loop().run_in_executor(self.process_pool, fn, *args)
+    # --- frame budget ---
+    async def frame_yield(self, budget_ms=SERVICE_BUDGET_MS):
+        """
+        Called by the game loop once per frame. Opens this frame's budget,
+        wakes the services deferred from earlier frames and lets every ready
+        task run until it finishes, blocks or reaches a checkpoint past the
+        budget.
+        """
+        self.frames += 1
+        self.frame_deadline = time.perf_counter() + budget_ms / 1000
+        if self._next_frame is not None:
+            self._next_frame.set_result(None)
+            self._next_frame = None
+        # Two passes: woken checkpoints resume on the first, callbacks they schedule run on the second
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.frame_deadline = 0.0
+    async def checkpoint(self):
+        # Await before main-thread work in a service; returns in a frame that still has budget
+        while time.perf_counter() >= self.frame_deadline:
+            self.deferred += 1
+            if self._next_frame is None:
+                self._next_frame = asyncio.get_running_loop().create_future()
+            await asyncio.shield(self._next_frame)
+    def close(self):
+        for scope in list(self.scopes):
+            self.cancel_scope(scope)
+        self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+    def report(self):
+        return (f"services: {self.frames} frames, {self.pending()} tasks pending, "
+                f"{self.deferred} checkpoints deferred by the frame budget, {self.errors} failed")
+
+# --- SERVICES ---
+def _append_json_line(path, record):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+async def telemetry_service(host, path, collect, interval=TELEMETRY_INTERVAL):
+    """
+    Every `interval` seconds, take collect() (cheap, on the loop thread) and
+    append it as one JSON line to `path` from a worker thread.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await host.checkpoint()
+        record = dict(collect(), time=time.time())
+        await host.run_in_thread(_append_json_line, path, record)
+
+def test_frame_budget(frames=60, jobs=40, job_ms=1.0, budget_ms=SERVICE_BUDGET_MS):
+    """
+    Queue `jobs` services that each do `job_ms` of main-thread work after a
+    checkpoint, run a loop of 60 frames, and show that each frame spends
+    about `budget_ms` on them instead of all of them landing in one frame.
+    """
+    async def run():
+        host = ServiceHost()
+        async def job():
+            await host.run_in_thread(time.sleep, 0.001)
+            await host.checkpoint()
+            end = time.perf_counter() + job_ms / 1000
+            while time.perf_counter() < end:
+                pass
+        for _ in range(jobs):
+            host.spawn(job(), scope='level')
+        spent = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            await host.frame_yield(budget_ms)
+            spent.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.002)
+        busy = [ms for ms in spent if ms > 0.1]
+        print(f"{jobs} jobs of {job_ms} ms with a {budget_ms} ms budget ran over {len(busy)} frames, "
+              f"max {max(spent):.2f} ms in one frame")
+        print(host.report())
+        host.close()
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    test_frame_budget()
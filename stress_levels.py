@@ -0,0 +1,204 @@
+import argparse
+import csv
+import gc
+import math
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from game_sim import load_headless_game
+
+# --- CONFIG ---
+GROUND_Y = 700
+# Share of the total entity count given to each kind when only a total is asked for
+STRESS_MIX = {
+    'platforms': 0.2,
+    'enemies': 0.15,
+    'coins': 0.3,
+    'blocks': 0.1,
+    'liquids': 0.05,
+    'decorations': 0.2,
+}
+PIXELS_PER_ENTITY = 40    # Default level length grows with the entity count at this density
+DECORATION_SPRITES = [
+    'Sprites/Tiles/Default/mushroom_brown.png',
+    'Sprites/Tiles/Default/mushroom_red.png',
+    'Sprites/Tiles/Default/grass.png',
+    'Sprites/Tiles/Default/bush.png',
+]
+DEFAULT_SIZES = (100, 1000, 5000, 20000, 50000)
+FRAME_BUDGET = 2.0        # Seconds of frame timing per size; huge levels stop after fewer frames
+
+# --- GENERATOR ---
+def stress_counts(total):
+    """
+    Split a total entity count into per-kind counts following STRESS_MIX.
+    """
+    return {kind: max(1, int(total * share)) for kind, share in STRESS_MIX.items()}
+
+def generate_stress_level(platforms=100, enemies=100, coins=100, blocks=50, liquids=20, decorations=100,
+                          length=None, seed=0):
+    """
+    Build a synthetic level with the given number of each entity kind, spread
+    uniformly over `length` pixels (by default proportional to the total).
+
+    Returns the same tuple generate_level() does, so it can be handed to
+    GameWorld(level=...) or any other code that consumes levels. Blocks are
+    split between coin and exclamation blocks, liquids between water and lava.
+    """
+    game = load_headless_game()
+    rng = random.Random(seed)
+    total = platforms + enemies + coins + blocks + liquids + decorations
+    length = length or max(2400, total * PIXELS_PER_ENTITY)
+    def spot():
+        return rng.randrange(200, length - 200)
+
+    platform_objs = [game.Platform(0, GROUND_Y, length, 100, "grass")]
+    for _ in range(platforms - 1):
+        platform_objs.append(game.Platform(spot(), rng.randrange(300, 640, 10), rng.randrange(96, 400),
+                                           40, rng.choice(list(game.PLATFORM_TYPES))))
+    enemy_objs = [game.Enemy(spot(), GROUND_Y - game.ENEMY_SIZE, rng.choice(('slime', 'bee')))
+                  for _ in range(enemies)]
+    coin_objs = [game.Coin(spot(), rng.randrange(300, 660)) for _ in range(coins)]
+    decoration_objs = [game.Decoration(spot(), GROUND_Y - 48, rng.choice(DECORATION_SPRITES))
+                       for _ in range(decorations)]
+    coin_blocks = [(spot(), rng.randrange(380, 560)) for _ in range(blocks - blocks // 2)]
+    exclamation_blocks = [(spot(), rng.randrange(380, 560), f'key_{rng.choice(game.LOCK_COLORS)}')
+                          for _ in range(blocks // 2)]
+    water_tiles = [(spot(), GROUND_Y, 64, 40, True) for _ in range(liquids - liquids // 2)]
+    lava_tiles = [(spot(), GROUND_Y, 64, 40, True) for _ in range(liquids // 2)]
+    flag = game.Flag(length - 100, GROUND_Y - 64)
+    return (platform_objs, enemy_objs, coin_objs, flag, decoration_objs, coin_blocks, water_tiles,
+            lava_tiles, [], [], exclamation_blocks, [])
+
+# --- SCALING RUNNER ---
+def measure_size(total, frames=120, frame_budget=FRAME_BUDGET, seed=0):
+    """
+    Load one stress level of `total` entities and measure generation and
+    GameWorld load time, Python heap retained by the world and peak during
+    the load (tracemalloc), then frame time (tick + draw + flush) with the
+    player running right. Frame timing stops early once `frame_budget`
+    seconds are spent.
+    """
+    game = load_headless_game()
+    counts = stress_counts(total)
+    char_img_path = game.CHARACTER_OPTIONS[0][1]
+
+    gc.collect()
+    start = time.perf_counter()
+    level = generate_stress_level(seed=seed, **counts)
+    generate_time = time.perf_counter() - start
+    start = time.perf_counter()
+    world = game.GameWorld(1, char_img_path, level=level)
+    load_time = time.perf_counter() - start
+    del world, level
+
+    # Memory in a second, traced build so tracing overhead stays out of the load time
+    gc.collect()
+    tracemalloc.start()
+    world = game.GameWorld(1, char_img_path, level=generate_stress_level(seed=seed, **counts))
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    render_queue = game.RenderQueue()
+    controls = (False, True, False)
+    frame_times = []
+    budget_start = time.perf_counter()
+    for _ in range(frames):
+        start = time.perf_counter()
+        world.tick(controls)
+        game.screen.blit(game.background, (0, 0))
+        world.draw(render_queue)
+        render_queue.flush(game.screen)
+        frame_times.append((time.perf_counter() - start) * 1000)
+        if not world.playing:
+            world.restart()
+        if time.perf_counter() - budget_start > frame_budget:
+            break
+    frame_times = np.array(frame_times)
+    return {
+        'entities': total,
+        'length': level_length(world),
+        'generate_ms': generate_time * 1000,
+        'load_ms': load_time * 1000,
+        'retained_mb': retained / 2**20,
+        'peak_mb': peak / 2**20,
+        'frames': len(frame_times),
+        'frame_p50_ms': float(np.percentile(frame_times, 50)),
+        'frame_p95_ms': float(np.percentile(frame_times, 95)),
+        'frame_max_ms': float(frame_times.max()),
+    }
+
+def level_length(world):
+    return world.platforms[0].width
+
+def scaling_exponent(rows, key):
+    # Least-squares slope of log(metric) against log(entities): ~1 is linear, ~2 quadratic
+    points = [(math.log(r['entities']), math.log(r[key])) for r in rows if r.get(key)]
+    if len(points) < 2:
+        return None
+    x, y = np.array(points).T
+    return float(np.polyfit(x, y, 1)[0])
+
+def run_scaling(sizes=DEFAULT_SIZES, frames=120, frame_budget=FRAME_BUDGET, csv_path=None, plot_path=None):
+    """
+    Measure every size in `sizes` and print a table of the scaling curves plus
+    their log-log slopes. Optionally writes the rows as CSV and a plot (needs
+    matplotlib).
+    """
+    columns = ('entities', 'length', 'generate_ms', 'load_ms', 'retained_mb', 'peak_mb',
+               'frames', 'frame_p50_ms', 'frame_p95_ms', 'frame_max_ms')
+    print(''.join(f'{c:>14}' for c in columns))
+    rows = []
+    for total in sizes:
+        row = measure_size(total, frames, frame_budget)
+        rows.append(row)
+        print(''.join(f'{row[c]:>14.2f}' if isinstance(row[c], float) else f'{row[c]:>14}' for c in columns))
+    print("log-log slope vs entities: " + ', '.join(
+        f"{key} {slope:.2f}" for key in ('load_ms', 'retained_mb', 'frame_p50_ms')
+        if (slope := scaling_exponent(rows, key)) is not None))
+    if csv_path:
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {csv_path}")
+    if plot_path:
+        plot_scaling(rows, plot_path)
+    return rows
+
+def plot_scaling(rows, path):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping the plot (pip install matplotlib)")
+        return
+    entities = [r['entities'] for r in rows]
+    fig, axes = plt.subplots(1, 3, figsize=(15, 4))
+    for ax, keys, label in ((axes[0], ('generate_ms', 'load_ms'), 'ms'),
+                            (axes[1], ('retained_mb', 'peak_mb'), 'MB'),
+                            (axes[2], ('frame_p50_ms', 'frame_p95_ms'), 'ms per frame')):
+        for key in keys:
+            ax.loglog(entities, [r[key] for r in rows], marker='o', label=key)
+        ax.set_xlabel('entities')
+        ax.set_ylabel(label)
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"Wrote {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure load time, memory and frame time on synthetic stress levels")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="total entity counts to measure")
+    parser.add_argument('--frames', type=int, default=120, help="frames timed per size")
+    parser.add_argument('--frame-budget', type=float, default=FRAME_BUDGET,
+                        help="seconds of frame timing per size before stopping early")
+    parser.add_argument('--csv', default=None, help="write the results as CSV")
+    parser.add_argument('--plot', default=None, help="write log-log scaling plots (PNG, needs matplotlib)")
+    args = parser.parse_args()
+    run_scaling(args.sizes, args.frames, args.frame_budget, args.csv, args.plot)
@@ -0,0 +1,205 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler
+
+from level_index import pack_grids
+from vae_sample import VAE, load_vae_model, sample_level_grids
+
+# --- CONFIG ---
+BATCH_SIZE = 1024         # Large batches keep the CPU matmuls efficient; the model is tiny
+LEARNING_RATE = 1e-3
+CHECKPOINT_EVERY = 500    # Optimizer steps between checkpoints
+GRID_BYTES = 50           # 400 wall bits per packed grid
+
+# --- CORPUS ---
+def read_grid_file(path):
+    # A 20x20 text grid as written by generate_levels.py --format grid, or None if the file is not one
+    with open(path) as f:
+        rows = [line.rstrip('\n') for line in f]
+    while rows and not rows[-1].strip():
+        rows.pop()
+    if len(rows) != 20 or any(len(row) > 20 for row in rows):
+        return None
+    return [list(row.ljust(20)) for row in rows]
+
+def build_corpus(sources, out_path):
+    """
+    Pack training grids into one (n, 50) uint8 .npy file, one bit per wall
+    tile. Sources are grid .txt files, directories of them, or level index
+    directories (their grids.npy is already in this format). Text files that
+    are not 20x20 grids are skipped. Returns (grids packed, files skipped).
+    """
+    parts = []
+    skipped = 0
+    for source in sources:
+        if os.path.isfile(os.path.join(source, 'grids.npy')):
+            parts.append(np.load(os.path.join(source, 'grids.npy')))
+            continue
+        paths = sorted(glob.glob(os.path.join(source, '*.txt'))) if os.path.isdir(source) else [source]
+        grids = [read_grid_file(path) for path in paths]
+        skipped += sum(grid is None for grid in grids)
+        grids = [grid for grid in grids if grid is not None]
+        if grids:
+            parts.append(pack_grids(grids))
+    corpus = np.concatenate(parts) if parts else np.empty((0, GRID_BYTES), dtype=np.uint8)
+    np.save(out_path, corpus)
+    return len(corpus), skipped
+
+def build_sampled_corpus(model, count, out_path, batch_size=4096):
+    # A corpus decoded from an existing model, for benchmarking or distilling it
+    torch.manual_seed(0)
+    corpus = np.concatenate([pack_grids(sample_level_grids(model, min(batch_size, count - i)))
+                             for i in range(0, count, batch_size)])
+    np.save(out_path, corpus)
+    return len(corpus)
+
+class PackedGridDataset(Dataset):
+    """
+    Memory-mapped packed grids. Each item is a whole batch: the sampler hands
+    over a list of indices and the batch is gathered and unpacked with one
+    numpy call, instead of collating `batch_size` single-grid tensors. The
+    file is opened lazily, so each DataLoader worker gets its own mapping
+    and pages are read on demand rather than loading the corpus up front.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = len(np.load(path, mmap_mode='r'))
+        self.grids = None
+    def __len__(self):
+        return self.count
+    def __getitem__(self, indices):
+        if self.grids is None:
+            self.grids = np.load(self.path, mmap_mode='r')
+        # Sorted reads walk the mapping forwards; batch order does not matter to the loss
+        packed = self.grids[np.sort(np.asarray(indices))]
+        return torch.from_numpy(np.unpackbits(packed, axis=1)[:, :400].astype(np.float32))
+
+def make_loader(dataset, batch_size=BATCH_SIZE, workers=0, seed=0):
+    sampler = BatchSampler(RandomSampler(dataset, generator=torch.Generator().manual_seed(seed)),
+                           batch_size, drop_last=False)
+    return DataLoader(dataset, sampler=sampler, batch_size=None, num_workers=workers,
+                      pin_memory=torch.cuda.is_available(), persistent_workers=workers > 0,
+                      prefetch_factor=4 if workers else None)
+
+# --- TRAINING ---
+def vae_loss(recon, x, mu, log_var):
+    # Summed binary cross-entropy plus the KL divergence to the unit Gaussian prior
+    bce = F.binary_cross_entropy(recon, x, reduction='sum')
+    kld = -0.5 * torch.sum(1 + log_var - mu.pow(2) - log_var.exp())
+    return bce + kld
+
+def save_checkpoint(path, model, optimizer, epoch, step):
+    # Written to a temporary file first so an interrupted save never leaves a truncated checkpoint
+    tmp = path + '.tmp'
+    torch.save({'model': model.state_dict(), 'optimizer': optimizer.state_dict(), 'epoch': epoch, 'step': step}, tmp)
+    os.replace(tmp, path)
+
+def train_vae(corpus_path, epochs=10, batch_size=BATCH_SIZE, lr=LEARNING_RATE, workers=0, threads=None,
+              output='vae_model_retrained.pth', checkpoint='.cache/vae_checkpoint.pth', checkpoint_every=CHECKPOINT_EVERY,
+              resume=False, init_model=None, seed=0):
+    """
+    Train the VAE on a packed grid corpus on the CPU (or CUDA if present).
+    Saves a checkpoint (model, optimizer, epoch) every `checkpoint_every`
+    steps and at each epoch end; resuming restarts an interrupted epoch. The
+    final weights go to `output` as a plain state dict that load_vae_model()
+    accepts. Returns per-epoch statistics.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    torch.manual_seed(seed)
+    os.makedirs(os.path.dirname(checkpoint) or '.', exist_ok=True)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = VAE().to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    start_epoch = step = 0
+    if resume and os.path.exists(checkpoint):
+        state = torch.load(checkpoint, map_location=device)
+        model.load_state_dict(state['model'])
+        optimizer.load_state_dict(state['optimizer'])
+        start_epoch, step = state['epoch'], state['step']
+        print(f"Resumed from {checkpoint} at epoch {start_epoch}, step {step}")
+    elif init_model:
+        model.load_state_dict(torch.load(init_model, map_location=device))
+
+    dataset = PackedGridDataset(corpus_path)
+    print(f"Training on {len(dataset)} grids: batch {batch_size}, {workers} loader workers, "
+          f"{torch.get_num_threads()} torch threads, {device}")
+    history = []
+    model.train()
+    for epoch in range(start_epoch, epochs):
+        loader = make_loader(dataset, batch_size, workers, seed + epoch)
+        epoch_start = time.perf_counter()
+        wait_time = 0.0
+        total_loss = 0.0
+        samples = 0
+        fetch_start = time.perf_counter()
+        for x in loader:
+            wait_time += time.perf_counter() - fetch_start
+            x = x.to(device, non_blocking=True)
+            recon, mu, log_var = model(x)
+            loss = vae_loss(recon, x, mu, log_var)
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+            samples += len(x)
+            step += 1
+            if checkpoint_every and step % checkpoint_every == 0:
+                save_checkpoint(checkpoint, model, optimizer, epoch, step)
+            fetch_start = time.perf_counter()
+        elapsed = time.perf_counter() - epoch_start
+        save_checkpoint(checkpoint, model, optimizer, epoch + 1, step)
+        stats = {'epoch': epoch + 1, 'loss': total_loss / max(1, samples), 'time': elapsed,
+                 'samples_per_second': samples / elapsed if elapsed > 0 else 0.0, 'data_wait': wait_time}
+        history.append(stats)
+        print(f"epoch {stats['epoch']}/{epochs}: loss {stats['loss']:.2f}, {elapsed:.2f}s, "
+              f"{stats['samples_per_second']:,.0f} samples/s ({wait_time / elapsed:.0%} waiting for data)")
+    model.eval()
+    torch.save(model.state_dict(), output)
+    print(f"Saved weights to {output}")
+    return history
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the level VAE from a memory-mapped grid corpus.")
+    parser.add_argument('sources', nargs='*',
+                        help="grid .txt files or directories, or level index directories, to pack into --corpus")
+    parser.add_argument('--corpus', default='.cache/level_corpus.npy', help="packed grid corpus (.npy)")
+    parser.add_argument('--sample', type=int, default=0, metavar='N',
+                        help="build the corpus from N grids decoded by --model instead of from sources")
+    parser.add_argument('--model', default='vae_model_final.pth', help="weights for --sample and --finetune")
+    parser.add_argument('--finetune', action='store_true', help="start from --model instead of random weights")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--lr', type=float, default=LEARNING_RATE)
+    parser.add_argument('--workers', type=int, default=min(2, (os.cpu_count() or 1) - 1),
+                        help="DataLoader worker processes (0 loads batches in the training process)")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads (default: torch's choice)")
+    parser.add_argument('--output', default='vae_model_retrained.pth', help="final weights, loadable by the game")
+    parser.add_argument('--checkpoint', default='.cache/vae_checkpoint.pth')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY, help="steps between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="continue from --checkpoint")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.corpus) or '.', exist_ok=True)
+    if args.sample:
+        count = build_sampled_corpus(load_vae_model(args.model, torch.device('cpu')), args.sample, args.corpus)
+        print(f"Packed {count} sampled grids into {args.corpus}")
+    elif args.sources:
+        count, skipped = build_corpus(args.sources, args.corpus)
+        print(f"Packed {count} grids into {args.corpus}")
+        if skipped:
+            print(f"Skipped {skipped} files that are not 20x20 grids")
+    if not os.path.exists(args.corpus):
+        parser.error(f"{args.corpus} does not exist; give grid sources or --sample N to build it")
+    train_vae(args.corpus, args.epochs, args.batch_size, args.lr, args.workers, args.threads, args.output,
+              args.checkpoint, args.checkpoint_every, args.resume, args.model if args.finetune else None, args.seed)
+
+if __name__ == "__main__":
+    main()
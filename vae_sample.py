@@ -5,6 +5,8 @@ import numpy as np
 import json
 import os
 import random
+import time
+from level_validator import validate_levels
 
 # --- VAE ARCHITECTURE (same as training) ---
 class VAE(nn.Module):
@@ -51,15 +53,14 @@ class VAE(nn.Module):
         return self.decode(z), mu, log_var
 
 # --- LEVEL GENERATION ---
-def generate_level_with_vae(model_path='vae_model_final.pth', device=None, level_num=5):
+def load_vae_model(model_path='vae_model_final.pth', device=None):
     """
-    Generate a level using the trained VAE model.
-    Returns level data in the format expected by the game.
+    Load the trained VAE once and return it in eval mode.
+    Returns None if the model file is missing or cannot be loaded.
     """
     if device is None:
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     
-    # Load model
     model = VAE().to(device)
     
     try:
@@ -67,33 +68,98 @@ def generate_level_with_vae(model_path='vae_model_final.pth', device=None, level
         print(f"Loaded VAE model from {model_path}")
     except FileNotFoundError:
         print(f"Model file {model_path} not found. Using fallback generation.")
-        return generate_fallback_level(level_num)
+        return None
     except Exception as e:
         print(f"Error loading model: {e}. Using fallback generation.")
-        return generate_fallback_level(level_num)
+        return None
     
     model.eval()
-    
+    return model
+
+def sample_level_grids(model, count, threshold=0.5, generator=None):
+    """
+    Decode `count` random latent vectors in one batch, drawn from `generator`
+    (a CPU torch.Generator) or the global torch RNG.
+    Returns a (count, 20, 20) boolean numpy array of wall tiles.
+    """
+    device = next(model.parameters()).device
     with torch.no_grad():
-        # Generate a random latent vector
-        z = torch.randn(1, 32).to(device)
-        generated_level = model.decode(z)
-        
-        # Convert to level format
-        level = [[' ' for _ in range(20)] for _ in range(20)]
-        
-        # Apply threshold to determine walls
-        threshold = 0.5
-        for i in range(20):
-            for j in range(20):
-                if generated_level[0][i * 20 + j] > threshold:
-                    level[i][j] = 'W'
-        
+        z = torch.randn(count, 32, generator=generator).to(device)
+        generated = model.decode(z).cpu().numpy()
+    return generated.reshape(count, 20, 20) > threshold
+
+def sample_level_grid(model, threshold=0.5):
+    """
+    Decode one random latent vector into a raw 20x20 grid of 'W' / ' ' tiles.
+    """
+    walls = sample_level_grids(model, 1, threshold)[0]
+    return [['W' if wall else ' ' for wall in row] for row in walls]
+
+def level_base_length(level_num):
+    return 1600 + (level_num - 1) * 200  # Progressive level length
+
+def sample_playable_grids(model, count, level_num=5, batch_size=64, max_batches=50):
+    """
+    Rejection-sample post-processed grids that pass the reachability validator.
+    Grids are decoded and validated `batch_size` at a time.
+    Returns (grids, stats) where stats holds sample counts, acceptance rate and timings.
+    """
+    scale_x = level_base_length(level_num) / 20.0
+    accepted = []
+    sampled = 0
+    decode_time = validate_time = 0.0
+    for _ in range(max_batches):
+        start = time.perf_counter()
+        batch = []
+        for walls in sample_level_grids(model, batch_size):
+            grid = [['W' if wall else ' ' for wall in row] for row in walls]
+            batch.append(post_process_level(grid))
+        decode_time += time.perf_counter() - start
+        start = time.perf_counter()
+        ok = validate_levels(batch, scale_x)
+        validate_time += time.perf_counter() - start
+        sampled += len(batch)
+        accepted.extend(grid for grid, good in zip(batch, ok) if good)
+        if len(accepted) >= count:
+            break
+    stats = {
+        'sampled': sampled,
+        'accepted': len(accepted),
+        'acceptance_rate': len(accepted) / sampled if sampled else 0.0,
+        'decode_time': decode_time,
+        'validate_time': validate_time,
+    }
+    return accepted[:count], stats
+
+def generate_level_with_vae(model_path='vae_model_final.pth', device=None, level_num=5, model=None, seen=None):
+    """
+    Generate a level using the trained VAE model.
+    Pass an already loaded `model` to skip reloading it from disk, and a
+    level_index.LevelIndex as `seen` to prefer a level unlike the ones already
+    in it (the chosen level is then added to it).
+    Returns level data in the format expected by the game.
+    """
+    if model is None:
+        model = load_vae_model(model_path, device)
+        if model is None:
+            return generate_fallback_level(level_num)
+    
+    # Sample a small batch and keep the first grid that is actually completable
+    grids, _ = sample_playable_grids(model, 1 if seen is None else 4, level_num, batch_size=16, max_batches=4)
+    if grids and seen is not None:
+        vectors = seen.embed(model, grids)
+        novel = seen.is_novel(vectors, grids)
+        pick = int(novel.argmax())   # The first novel grid, or the first grid if all are near-duplicates
+        seen.add(vectors[pick:pick + 1], grids[pick:pick + 1])
+        level = grids[pick]
+    elif grids:
+        level = grids[0]
+    else:
         # Post-process the level to ensure playability
-        level = post_process_level(level)
-        
-        # Convert grid back to game format
-        return convert_grid_to_game_format(level, level_num)
+        level = post_process_level(sample_level_grid(model))
+    
+    # Convert grid back to game format
+    return convert_grid_to_game_format(level, level_num)
 
 def convert_grid_to_game_format(grid, level_num):
     """
@@ -101,7 +167,7 @@ def convert_grid_to_game_format(grid, level_num):
     """
     SCREEN_HEIGHT = 800
     ground_y = SCREEN_HEIGHT - 100
-    base_length = 1600 + (level_num - 1) * 200  # Progressive level length
+    base_length = level_base_length(level_num)
     
     # Scale back to game coordinates
     scale_x = base_length / 20.0
@@ -168,9 +234,10 @@ def extract_horizontal_platforms(grid, scale_x, scale_y, ground_y):
             j += 1
     return platforms
 
-def post_process_level(level):
+def post_process_level(level, rng=random):
     """
     Post-process the generated level to ensure it's playable.
+    Random choices come from `rng` (the global random module by default).
     """
     # Ensure there's a ground floor
     for x in range(20):
@@ -182,18 +249,18 @@ def post_process_level(level):
     
     # Add some coins
     coin_positions = []
-    for _ in range(random.randint(3, 8)):
-        x = random.randint(1, 18)
-        y = random.randint(5, 17)
+    for _ in range(rng.randint(3, 8)):
+        x = rng.randint(1, 18)
+        y = rng.randint(5, 17)
         if level[y][x] == ' ' and level[y+1][x] == 'W':  # Coin above a platform
             level[y][x] = 'C'
             coin_positions.append((x, y))
     
     # Add some enemies
     enemy_positions = []
-    for _ in range(random.randint(2, 5)):
-        x = random.randint(1, 18)
-        y = random.randint(5, 17)
+    for _ in range(rng.randint(2, 5)):
+        x = rng.randint(1, 18)
+        y = rng.randint(5, 17)
         if level[y][x] == ' ' and level[y+1][x] == 'W':  # Enemy on a platform
             level[y][x] = 'E'
             enemy_positions.append((x, y))
@@ -202,10 +269,10 @@ def post_process_level(level):
     # Add some platforms if the level is too sparse
     wall_count = sum(row.count('W') for row in level)
     if wall_count < 50:  # Too few walls
-        for _ in range(random.randint(5, 10)):
-            x = random.randint(1, 18)
-            y = random.randint(10, 16)
-            length = random.randint(2, 5)
+        for _ in range(rng.randint(5, 10)):
+            x = rng.randint(1, 18)
+            y = rng.randint(10, 16)
+            length = rng.randint(2, 5)
             for dx in range(length):
                 if x + dx < 19:
                     level[y][x + dx] = 'W'
@@ -218,7 +285,7 @@ def generate_fallback_level(level_num=5):
     """
     SCREEN_HEIGHT = 800
     ground_y = SCREEN_HEIGHT - 100
-    base_length = 1600 + (level_num - 1) * 200
+    base_length = level_base_length(level_num)
     
     platforms = [
         (100, ground_y - 120, 150, 40, "wood"),
@@ -262,10 +329,14 @@ def generate_multiple_levels(num_levels=5, model_path='vae_model_final.pth'):
     Generate multiple levels and save them to files.
     """
     levels = []
+    model = load_vae_model(model_path)
     
     for i in range(num_levels):
         print(f"Generating level {i+1}/{num_levels}...")
-        level_data = generate_level_with_vae(model_path, level_num=i+1)
+        if model is None:
+            level_data = generate_fallback_level(i+1)
+        else:
+            level_data = generate_level_with_vae(level_num=i+1, model=model)
         levels.append(level_data)
         
         # Save individual level